@@ -1,6 +1,32 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+def _is_web_server():
+    """
+    Process phục vụ request? manage.py chỉ khi runserver (process con của
+    autoreloader hoặc --noreload); các lệnh khác (migrate, worker, ...) không.
+    Không qua manage.py -> gunicorn / uwsgi / ... nạp WSGI app.
+    """
+    argv = sys.argv or ['']
+    if os.path.basename(argv[0]) not in ('manage.py', 'django-admin', 'django-admin.py'):
+        return True
+    if len(argv) < 2 or argv[1] != 'runserver':
+        return False
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
+
+
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import tasks  # noqa: F401  (đăng ký job handler)
+
+        from django.conf import settings
+        if getattr(settings, 'VECTOR_INDEX_WARMUP', True) and _is_web_server():
+            from .utils import vector_index
+            vector_index.warm_up()  # thread nền: request chatbot đầu tiên không phải chờ mở index
@@ -0,0 +1,182 @@
+"""
+Async variants của các endpoint chatbot (chạy qua book_web/asgi.py).
+
+Cùng request / response với app/chatbot_view.py nhưng là coroutine view thuần
+Django: trong lúc chờ provider, worker ASGI không giữ thread nào, nên một
+process giữ được hàng trăm completion đang chạy (giới hạn bởi
+LLM_MAX_CONCURRENCY, xem app/utils/llm_async.py). Chạy dưới WSGI vẫn đúng
+nhưng mỗi request tốn một event loop riêng, không có lợi ích gì.
+
+Auth: JWT (Authorization: Bearer ...) như REST_FRAMEWORK mặc định. Giới hạn
+theo user như bản sync (app/throttling.py): vượt -> 429 + Retry-After.
+"""
+import json
+import logging
+import math
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .chatbot_view import CUSTOM_ROLE_MODEL, build_custom_role_messages
+from .throttling import LLMUserThrottle
+from .utils import conversations, llm_async
+from .utils.ai_api import MODEL, default_messages
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------------------------
+# Helpers
+# ----------------------------------------------------------------------------
+def _authenticate(request):
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def _parse_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        data = request.POST.dict()
+    return data if isinstance(data, dict) else {}
+
+
+def _wants_stream(request, data):
+    flag = data.get('stream')
+    if isinstance(flag, str):
+        flag = flag.lower() in ('1', 'true', 'yes')
+    return bool(flag) or 'text/event-stream' in request.META.get('HTTP_ACCEPT', '')
+
+
+def _sse_response(model, messages, on_complete=None):
+    llm_async.admit()  # hàng đợi đầy -> 503 trước khi gửi header
+    response = StreamingHttpResponse(
+        llm_async.event_stream(model, messages, on_complete=on_complete), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _retry_response(error, status, wait):
+    response = JsonResponse({'error': error}, status=status)
+    response['Retry-After'] = str(max(1, math.ceil(wait or 0)))
+    return response
+
+
+def async_chat_view(handler):
+    """POST + JWT + throttle + parse JSON; lỗi provider -> 503 thay vì 500."""
+    @csrf_exempt
+    @require_POST
+    async def view(request):
+        user = await sync_to_async(_authenticate)(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user = user
+        throttle = LLMUserThrottle()
+        if not await sync_to_async(throttle.allow_request)(request, None):
+            return _retry_response('Request was throttled.', 429, throttle.wait())
+        try:
+            return await handler(request, _parse_body(request))
+        except APIException as exc:  # ServiceBusy / LLMUnavailable
+            return _retry_response(str(exc.detail), exc.status_code, getattr(exc, 'wait', None))
+        except Exception as e:
+            logger.warning("Async chatbot error: %s", e)
+            return JsonResponse({'error': 'AI service temporarily unavailable'}, status=503)
+    view.__name__ = handler.__name__
+    view.__doc__ = handler.__doc__
+    return view
+
+
+# ----------------------------------------------------------------------------
+# Views
+# ----------------------------------------------------------------------------
+@async_chat_view
+async def chatbot_async(request, data):
+    """Async bản của ChatbotAPIView.post."""
+    user_input = data.get('message', '')
+    role = data.get('role', 'book advisor')
+    if not user_input:
+        return JsonResponse({'error': 'Message is required'}, status=400)
+
+    messages = await sync_to_async(default_messages)(user_input)  # RAG đọc DB
+    if _wants_stream(request, data):
+        return _sse_response(MODEL, messages)
+
+    ai_response = await llm_async.complete(MODEL, messages)
+    return JsonResponse({
+        'user_message': user_input,
+        'ai_response': ai_response,
+        'role': role,
+        'status': 'success'
+    })
+
+
+@async_chat_view
+async def chatbot_conversation_async(request, data):
+    """Async bản của chatbot_conversation."""
+    user_message = data.get('message', '')
+    custom_role = data.get('role', None)
+    if not user_message:
+        return JsonResponse({'error': 'Message field is required'}, status=400)
+
+    if custom_role:
+        model = CUSTOM_ROLE_MODEL
+        messages = build_custom_role_messages(user_message, custom_role, data.get('context', []))
+    else:
+        model, messages = MODEL, await sync_to_async(default_messages)(user_message)
+    if _wants_stream(request, data):
+        return _sse_response(model, messages)
+
+    ai_response = await llm_async.complete(model, messages)
+    return JsonResponse({
+        'conversation': {
+            'user': user_message,
+            'ai': ai_response,
+            'role': custom_role or 'book advisor',
+            'timestamp': request.META.get('HTTP_DATE', 'unknown')
+        },
+        'status': 'success'
+    })
+
+
+@async_chat_view
+async def multi_turn_chat_async(request, data):
+    """Async bản của multi_turn_chat."""
+    message = data.get('message', '')
+    role = data.get('role', 'helpful assistant')
+    if not message:
+        return JsonResponse({'error': 'Message is required'}, status=400)
+
+    turn = await sync_to_async(conversations.open_turn)(
+        request.user, data.get('conversation_id'), message, role, data.get('history')
+    )
+    if turn is None:
+        return JsonResponse({'error': 'Conversation not found'}, status=404)
+    conversation_id, messages = turn
+    if _wants_stream(request, data):
+        return _sse_response(
+            CUSTOM_ROLE_MODEL, messages,
+            on_complete=lambda reply: conversations.record_turn(conversation_id, message, reply),
+        )
+
+    ai_response = await llm_async.complete(CUSTOM_ROLE_MODEL, messages)
+    await sync_to_async(conversations.record_turn)(conversation_id, message, ai_response)
+    return JsonResponse({
+        'conversation_id': str(conversation_id),
+        'message': {
+            'user': message,
+            'ai': ai_response,
+            'role': role,
+            'user_id': request.user.id,
+            'username': request.user.username
+        },
+        'status': 'success'
+    })
@@ -2,15 +2,28 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .utils.ai_api import ask_mistral
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import APIException
+from .utils.ai_api import ask_mistral, default_messages, role_system_prompt, MODEL
+from .utils import conversations, llm_cache, llm_providers, llm_stream
+from .throttling import LLMUserThrottle
+from .models import Conversation
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, throttle_classes
+from rest_framework.settings import api_settings
+from .renderers import EventStreamRenderer
 import json
 
+# JSON như mặc định + text/event-stream cho chế độ stream
+CHAT_RENDERERS = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+
 class ChatbotAPIView(APIView):
     """
     API for chatbot interaction using external AI service
     """
     permission_classes = [IsAuthenticated]
+    renderer_classes = CHAT_RENDERERS
+    throttle_classes = [LLMUserThrottle]
     
     def post(self, request):
         try:
@@ -22,14 +35,14 @@ class ChatbotAPIView(APIView):
                     'error': 'Message is required'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
+            # stream=true hoặc Accept: text/event-stream -> relay token qua SSE
+            if llm_stream.wants_stream(request):
+                return llm_stream.sse_response(MODEL, default_messages(user_input))
+            
             # Get AI response using your existing function
+            # (mọi provider lỗi -> LLMUnavailable: 503 + Retry-After)
             ai_response = ask_mistral(user_input)
             
-            if ai_response == "Sorry, I could not respond at the moment.":
-                return Response({
-                    'error': 'AI service temporarily unavailable'
-                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-            
             return Response({
                 'user_message': user_input,
                 'ai_response': ai_response,
@@ -37,6 +50,8 @@ class ChatbotAPIView(APIView):
                 'status': 'success'
             }, status=status.HTTP_200_OK)
             
+        except APIException:
+            raise  # ServiceBusy / LLMUnavailable -> 503 + Retry-After
         except Exception as e:
             return Response({
                 'error': f'An error occurred: {str(e)}'
@@ -45,6 +60,8 @@ class ChatbotAPIView(APIView):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(CHAT_RENDERERS)
+@throttle_classes([LLMUserThrottle])
 def chatbot_conversation(request):
     """
     Function-based view for chatbot conversation
@@ -61,6 +78,12 @@ def chatbot_conversation(request):
                 'error': 'Message field is required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        if llm_stream.wants_stream(request):
+            if custom_role:
+                messages = build_custom_role_messages(user_message, custom_role, conversation_context)
+                return llm_stream.sse_response(CUSTOM_ROLE_MODEL, messages)
+            return llm_stream.sse_response(MODEL, default_messages(user_message))
+        
         # If custom role is provided, create a customized function call
         if custom_role:
             ai_response = ask_mistral_with_custom_role(user_message, custom_role, conversation_context)
@@ -78,6 +101,8 @@ def chatbot_conversation(request):
             'status': 'success'
         }, status=status.HTTP_200_OK)
         
+    except APIException:
+        raise  # ServiceBusy / LLMUnavailable -> 503 + Retry-After
     except Exception as e:
         return Response({
             'error': f'Conversation error: {str(e)}',
@@ -85,55 +110,49 @@ def chatbot_conversation(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+CUSTOM_ROLE_MODEL = getattr(settings, 'LLM_CUSTOM_ROLE_MODEL', "mistral-saba-24b")
+CONVERSATION_LIST_LIMIT = 100
+
+
+def build_custom_role_messages(user_input, custom_role, context=None):
+    # Build messages array with custom role
+    messages = [
+        {"role": "system", "content": role_system_prompt(custom_role)}
+    ]
+    
+    # Add conversation context if provided
+    if context and isinstance(context, list):
+        for msg in context[-5:]:  # Limit to last 5 messages for context
+            if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
+                messages.append(msg)
+    
+    # Add current user message
+    messages.append({"role": "user", "content": user_input})
+    return messages
+
+
 def ask_mistral_with_custom_role(user_input, custom_role, context=None):
     """
     Enhanced version of ask_mistral with custom role and context support
     """
-    from openai import OpenAI
-    import os
-    
-    client = OpenAI(
-        api_key=os.getenv("GROQ_API_KEY"),
-        base_url="https://api.groq.com/openai/v1"
-    )
-    
-    try:
-        # Build messages array with custom role
-        messages = [
-            {"role": "system", "content": f"You are a {custom_role}. Be helpful and professional in your responses."}
-        ]
-        
-        # Add conversation context if provided
-        if context and isinstance(context, list):
-            for msg in context[-5:]:  # Limit to last 5 messages for context
-                if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
-                    messages.append(msg)
-        
-        # Add current user message
-        messages.append({"role": "user", "content": user_input})
-        
-        response = client.chat.completions.create(
-            model="mistral-saba-24b",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=2048
-        )
-        
-        reply = response.choices[0].message.content
-        print(f"[✔] Response from {custom_role}:", reply)
-        return reply
-        
-    except Exception as e:
-        print(f"[❌] Error calling AI API with custom role: {str(e)}")
-        return "Sorry, I could not respond at the moment."
+    return ask_with_messages(CUSTOM_ROLE_MODEL, build_custom_role_messages(user_input, custom_role, context))
+
+
+def ask_with_messages(model, messages):
+    """Gọi model với messages đã dựng sẵn (qua llm_cache + registry provider); lỗi -> LLMUnavailable."""
+    # key gồm role + context đã cắt + prompt đã chuẩn hoá (app/utils/llm_cache.py)
+    return llm_cache.get_or_call(model, messages, lambda: llm_providers.complete(model, messages))
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(CHAT_RENDERERS)
+@throttle_classes([LLMUserThrottle])
 def multi_turn_chat(request):
     """
     Multi-turn conversation handler
-    Maintains conversation history for context
+    History is stored server-side (app/utils/conversations.py): the client sends
+    conversation_id + the new message; context is assembled within a token budget
     """
     try:
         data = request.data
@@ -146,23 +165,26 @@ def multi_turn_chat(request):
                 'error': 'Message is required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Here you could implement conversation storage in database
-        # For now, we'll use the conversation history passed from frontend
-        conversation_history = data.get('history', [])
+        # `history` chỉ còn dùng để nhập hội thoại cũ khi chưa có conversation_id
+        turn = conversations.open_turn(request.user, conversation_id, message, role, data.get('history'))
+        if turn is None:
+            return Response({
+                'error': 'Conversation not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        conversation_id, messages = turn
         
-        # Build context from history
-        context_messages = []
-        for hist in conversation_history[-10:]:  # Last 10 messages for context
-            if 'user' in hist:
-                context_messages.append({"role": "user", "content": hist['user']})
-            if 'ai' in hist:
-                context_messages.append({"role": "assistant", "content": hist['ai']})
+        if llm_stream.wants_stream(request):
+            return llm_stream.sse_response(
+                CUSTOM_ROLE_MODEL, messages,
+                on_complete=lambda reply: conversations.record_turn(conversation_id, message, reply),
+            )
         
         # Get AI response with context
-        ai_response = ask_mistral_with_custom_role(message, role, context_messages)
+        ai_response = ask_with_messages(CUSTOM_ROLE_MODEL, messages)
+        conversations.record_turn(conversation_id, message, ai_response)
         
         return Response({
-            'conversation_id': conversation_id or f"conv_{request.user.id}_{hash(message)}",
+            'conversation_id': str(conversation_id),
             'message': {
                 'user': message,
                 'ai': ai_response,
@@ -173,7 +195,36 @@ def multi_turn_chat(request):
             'status': 'success'
         }, status=status.HTTP_200_OK)
         
+    except APIException:
+        raise  # ServiceBusy / LLMUnavailable -> 503 + Retry-After
     except Exception as e:
         return Response({
             'error': f'Multi-turn chat error: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def list_conversations(request):
+    """Hội thoại của user, mới cập nhật trước."""
+    rows = Conversation.objects.filter(user=request.user).order_by('-updated_at').values(
+        'id', 'title', 'role', 'created_at', 'updated_at'
+    )[:CONVERSATION_LIST_LIMIT]
+    return Response({'results': list(rows)})
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def conversation_detail(request, conversation_id):
+    conversation = get_object_or_404(Conversation, pk=conversation_id, user=request.user)
+    if request.method == 'DELETE':
+        conversation.delete()
+        conversations.forget(conversation_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response({
+        'id': conversation.id,
+        'title': conversation.title,
+        'role': conversation.role,
+        'summary': conversation.summary,
+        'messages': list(conversation.messages.order_by('id').values('id', 'role', 'content', 'created_at')),
+    })
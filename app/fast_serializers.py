@@ -0,0 +1,160 @@
+"""
+Fast read path cho các endpoint đọc nhiều (all_books, get_reading_history,
+list_books, list_users).
+
+Thay vì dựng model instance + chạy field machinery của DRF cho từng dòng, ta
+lấy tuple bằng values_list() và build dict bằng một hàm được sinh sẵn cho từng
+"shape" (danh sách field). Output phải giống byte-for-byte với BookSerializer /
+ReadingHistorySerializer — `manage.py bench_serializers` kiểm tra điều đó và đo
+thời gian của hai đường.
+"""
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.encoding import filepath_to_uri, iri_to_uri
+from rest_framework import serializers
+
+from .models import Book
+from .utils.covers import size_map, srcset
+
+
+def enabled():
+    return getattr(settings, 'FAST_READ_SERIALIZERS', False)
+
+
+# ----------------------------------------------------------------------------
+# Media URL
+# ----------------------------------------------------------------------------
+def media_url_builder(storage=None, request=None):
+    """
+    Hàm name -> URL tương đương FieldFile.url (+ request.build_absolute_uri nếu
+    có request), tính trước base_url / scheme+host một lần cho cả response.
+    """
+    storage = storage or default_storage
+    if isinstance(storage, FileSystemStorage):
+        base_url = storage.base_url
+
+        def storage_url(name):
+            return urljoin(base_url, filepath_to_uri(name).lstrip('/'))
+    else:
+        storage_url = storage.url
+
+    if request is None:
+        return storage_url
+
+    scheme_host = request.build_absolute_uri('/')[:-1]
+
+    def absolute_url(name):
+        url = storage_url(name)
+        if url.startswith('/') and not url.startswith('//') and '/./' not in url and '/../' not in url:
+            return iri_to_uri(scheme_host + url)
+        return request.build_absolute_uri(url)
+    return absolute_url
+
+
+# ----------------------------------------------------------------------------
+# Row builders
+# ----------------------------------------------------------------------------
+_compiled = {}
+
+
+def _compile(name, items):
+    """
+    items: [(key, expr)] với expr là biểu thức Python trên `r` (tuple),
+    `url` (media_url_builder), `dt` (DateTimeField.to_representation) và
+    `sizes` / `srcset` (app.utils.covers).
+    """
+    body = ', '.join(f'{key!r}: {expr}' for key, expr in items)
+    src = f'def {name}(r, url, dt):\n    return {{{body}}}\n'
+    namespace = {'sizes': size_map, 'srcset': srcset}
+    exec(compile(src, f'<fast_serializers:{name}>', 'exec'), namespace)
+    return namespace[name]
+
+
+# field của BookSerializer -> (cột values_list, biểu thức theo vị trí cột)
+_BOOK_FIELDS = {
+    'id': (['id'], 'r[{0}]'),
+    'title': (['title'], 'r[{0}]'),
+    'author': (['author'], 'r[{0}]'),
+    'pdf_file': (['pdf_file'], '(url(r[{0}]) if r[{0}] else None)'),
+    'pages': (['pages'], 'r[{0}]'),
+    'cover_image': (['cover_image'], '(url(r[{0}]) if r[{0}] else None)'),
+    'cover_sizes': (['cover_derivatives'], 'sizes(r[{0}], url)'),
+    'cover_srcset': (['cover_derivatives'], 'srcset(r[{0}], url)'),
+    'average_rating': (['rating_sum', 'rating_count'], '(round(r[{0}] / r[{1}], 1) if r[{1}] else 0)'),
+}
+
+
+def book_shape_supported(expand=()):
+    return 'reviews' not in (expand or ())
+
+
+def compile_book_shape(fields=None, expand=()):
+    """(columns, row_fn) cho output của BookSerializer(fields=..., expand=...)."""
+    from .serializers import BookSerializer
+    selected = BookSerializer.selected_fields(fields, expand)
+    keys = [f for f in BookSerializer.Meta.fields if f in selected]
+    cache_key = ('book',) + tuple(keys)
+    if cache_key not in _compiled:
+        columns = ['id']  # cursor pagination luôn cần id
+        items = []
+        for key in keys:
+            cols, expr = _BOOK_FIELDS[key]
+            positions = []
+            for col in cols:
+                if col not in columns:
+                    columns.append(col)
+                positions.append(columns.index(col))
+            items.append((key, expr.format(*positions)))
+        _compiled[cache_key] = (columns, _compile('build_book', items))
+    return _compiled[cache_key]
+
+
+def serialize_books(rows, row_fn, request=None):
+    url = media_url_builder(Book._meta.get_field('pdf_file').storage, request)
+    return [row_fn(r, url, None) for r in rows]
+
+
+_READING_HISTORY_COLUMNS = ['id', 'book_id', 'book__title', 'book__author', 'book__cover_image',
+                            'book__cover_derivatives', 'read_at']
+
+
+def compile_reading_history():
+    if 'reading_history' not in _compiled:
+        items = [
+            ('id', 'r[0]'),
+            ('book_id', 'r[1]'),
+            ('book_title', 'r[2]'),
+            ('book_author', 'r[3]'),
+            ('book_cover', '(url(r[4]) if r[4] else None)'),
+            ('book_cover_sizes', 'sizes(r[5], url)'),
+            ('book_cover_srcset', 'srcset(r[5], url)'),
+            ('read_at', '(dt(r[6]) if r[6] is not None else None)'),
+        ]
+        _compiled['reading_history'] = (_READING_HISTORY_COLUMNS, _compile('build_reading_history', items))
+    return _compiled['reading_history']
+
+
+def serialize_reading_history(queryset, request=None):
+    columns, row_fn = compile_reading_history()
+    url = media_url_builder(Book._meta.get_field('cover_image').storage, request)
+    dt = serializers.DateTimeField().to_representation  # cùng format/timezone với DRF
+    return [row_fn(r, url, dt) for r in queryset.values_list(*columns)]
+
+
+def serialize_admin_books(queryset, request):
+    """Output của list_books (admin): pdf_url là URL tuyệt đối."""
+    url = media_url_builder(Book._meta.get_field('pdf_file').storage, request)
+    return [
+        {'id': pk, 'title': title, 'author': author,
+         'pdf_url': url(pdf) if pdf else None, 'pages': pages}
+        for pk, title, author, pdf, pages in queryset.values_list('id', 'title', 'author', 'pdf_file', 'pages')
+    ]
+
+
+def serialize_admin_users(queryset):
+    return [
+        {'id': pk, 'username': username, 'email': email, 'is_staff': is_staff}
+        for pk, username, email, is_staff in queryset.values_list('id', 'username', 'email', 'is_staff')
+    ]
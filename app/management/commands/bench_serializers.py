@@ -0,0 +1,80 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from app import fast_serializers
+from app.models import Book, ReadingHistory
+from app.serializers import BookSerializer, ReadingHistorySerializer
+
+
+class Command(BaseCommand):
+    help = "So sánh DRF serializer với fast_serializers (thời gian + output giống byte-for-byte)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--fields', default='', help="sparse fieldset cho Book, vd: id,title,cover_image")
+
+    def _time(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, out
+
+    def _compare(self, label, slow, fast, repeat):
+        slow_t, slow_out = self._time(slow, repeat)
+        fast_t, fast_out = self._time(fast, repeat)
+        renderer = JSONRenderer()
+        if renderer.render(slow_out) != renderer.render(fast_out):
+            raise CommandError(f"{label}: fast path output differs from DRF serializer output")
+        self.stdout.write(
+            f"{label:<18} rows={len(slow_out):<6} drf={slow_t * 1000:8.2f}ms "
+            f"fast={fast_t * 1000:8.2f}ms speedup={slow_t / fast_t if fast_t else 0:5.1f}x"
+        )
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        fields = [f for f in options['fields'].split(',') if f] or None
+        request = RequestFactory().get('/')
+
+        ids = list(Book.objects.order_by('-id').values_list('id', flat=True)[:rows])
+        if not ids:
+            raise CommandError("No books to benchmark.")
+
+        def drf_books():
+            qs = BookSerializer.setup_queryset(Book.objects.filter(id__in=ids), fields=fields).order_by('-id')
+            return BookSerializer(qs, many=True, fields=fields).data
+
+        def fast_books():
+            columns, row_fn = fast_serializers.compile_book_shape(fields=fields)
+            qs = Book.objects.filter(id__in=ids).order_by('-id').values_list(*columns)
+            return fast_serializers.serialize_books(qs, row_fn)
+
+        self._compare('books', drf_books, fast_books, repeat)
+
+        user = User.objects.filter(reading_history__isnull=False).first()
+        if user:
+            history = ReadingHistory.objects.filter(user=user).order_by('-read_at')[:rows]
+            self._compare(
+                'reading_history',
+                lambda: ReadingHistorySerializer(history.select_related('book'), many=True).data,
+                lambda: fast_serializers.serialize_reading_history(history),
+                repeat,
+            )
+
+        self._compare(
+            'admin_books',
+            lambda: [{
+                'id': b.id, 'title': b.title, 'author': b.author,
+                'pdf_url': (request.build_absolute_uri(b.pdf_file.url) if b.pdf_file else None),
+                'pages': b.pages,
+            } for b in Book.objects.filter(id__in=ids)],
+            lambda: fast_serializers.serialize_admin_books(Book.objects.filter(id__in=ids), request),
+            repeat,
+        )
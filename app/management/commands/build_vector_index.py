@@ -0,0 +1,74 @@
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.utils import vector_index
+
+
+class Command(BaseCommand):
+    help = ("Dựng lại vector index của catalog (RAG chatbot) từ Book + UserBook đã duyệt; "
+            "--bench N đo độ trễ truy vấn trên N vector tổng hợp (thư mục tạm).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--lists', type=int, default=None, help="Số cụm IVF tối đa (mặc định VECTOR_INDEX_LISTS)")
+        parser.add_argument('--bench', type=int, default=0, help="Số vector tổng hợp để benchmark")
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=10)
+
+    def handle(self, *args, **options):
+        if vector_index.np is None:
+            raise CommandError("numpy is not installed.")
+        if options['bench']:
+            return self._bench(options)
+        started = time.monotonic()
+        meta = vector_index.rebuild(batch_size=options['batch_size'], max_lists=options['lists'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {meta['count']} documents (dim={meta['dim']}, lists={meta['nlist']}) "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
+
+    def _bench(self, options):
+        np = vector_index.np
+        total, d, k = options['bench'], vector_index.dim(), options['k']
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((max(total // 250, 1), d)).astype(np.float32)
+
+        def batches():
+            for start in range(0, total, 65536):
+                n = min(65536, total - start)
+                vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, d)).astype(np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                yield np.arange(start, start + n, dtype=np.int64) * 2, vectors
+
+        with tempfile.TemporaryDirectory() as root:
+            started = time.monotonic()
+            meta = vector_index.build(batches(), root=root, total_hint=total, max_lists=options['lists'])
+            self.stdout.write(f"built {total} vectors (lists={meta['nlist']}) in {time.monotonic() - started:.1f}s")
+
+            arrays = vector_index._open_arrays(root, meta)
+            rows = rng.choice(total, options['queries'], replace=False)
+            queries = np.asarray(arrays['vectors.f32'][rows]) + 0.1 * rng.standard_normal((len(rows), d)).astype(np.float32)
+            vector_index.search(queries[:1], k, root=root)  # nạp reader
+
+            latencies, found = [], []
+            for query in queries:
+                t = time.perf_counter()
+                found.append(vector_index.search(query[None, :], k, root=root)[0])
+                latencies.append(time.perf_counter() - t)
+            latencies.sort()
+
+            t = time.perf_counter()
+            vector_index.search(queries, k, root=root)
+            batch_time = time.perf_counter() - t
+
+            recall = []
+            for query, hits in list(zip(queries, found))[:20]:
+                exact = arrays['keys.i64'][np.argpartition(-(arrays['vectors.f32'][:total] @ query), k)[:k]]
+                recall.append(len(set(exact.tolist()) & {key for key, _ in hits}) / k)
+            self.stdout.write(
+                f"single query p50={latencies[len(latencies) // 2] * 1000:.2f}ms "
+                f"p95={latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms; "
+                f"batch of {len(queries)}: {batch_time * 1000:.1f}ms; recall@{k}={np.mean(recall):.2f}"
+            )
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0
+
+
+async def _post_http(url, body, token):
+    """POST HTTP/1.1 tối giản bằng asyncio stream (không cần thư viện HTTP async)."""
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    payload = json.dumps(body).encode()
+    writer.write((
+        f"POST {parts.path or '/'} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+        f"Authorization: Bearer {token}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n"
+    ).encode() + payload)
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+class Command(BaseCommand):
+    help = ("Load test các endpoint chatbot async. Mặc định chạy in-process qua ASGI handler với "
+            "provider 'fake'; --url để bắn vào server đang chạy (uvicorn book_web.asgi:application).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--path', default='/api/async/chatbot/')
+        parser.add_argument('--url', default='', help="vd http://127.0.0.1:8000 (mặc định: in-process)")
+        parser.add_argument('--username', default='', help="user để ký JWT (mặc định: user đầu tiên)")
+        parser.add_argument('--provider', default='fake', choices=['fake', 'settings'],
+                            help="in-process: 'fake' (LLM_FAKE_PROVIDER) hoặc LLM_PROVIDERS trong settings")
+        parser.add_argument('--latency', type=float, default=None, help="latency (giây) của provider 'fake'")
+        parser.add_argument('--error-rate', type=float, default=None, help="tỉ lệ lỗi của provider 'fake'")
+
+    def handle(self, *args, **options):
+        user = (User.objects.filter(username=options['username']) if options['username']
+                else User.objects.order_by('id')).first()
+        if user is None:
+            raise CommandError("No user to sign a token for.")
+        token = str(RefreshToken.for_user(user).access_token)
+
+        if options['url']:
+            results, elapsed = asyncio.run(self._run(options, token))
+        else:
+            overrides = {'LLM_CACHE_ENABLED': False, 'LLM_THROTTLE_RATE': None}
+            if options['provider'] == 'fake':
+                fake = dict(getattr(settings, 'LLM_FAKE_PROVIDER', {'name': 'fake', 'kind': 'fake'}))
+                if options['latency'] is not None:
+                    fake['latency'] = options['latency']
+                if options['error_rate'] is not None:
+                    fake['error_rate'] = options['error_rate']
+                overrides['LLM_PROVIDERS'] = [fake]
+            with override_settings(**overrides):
+                results, elapsed = asyncio.run(self._run(options, token))
+
+        latencies = [latency for status, latency in results if status == 200]
+        statuses = {}
+        for status, _ in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        self.stdout.write(
+            f"requests={len(results)} concurrency={options['concurrency']} "
+            f"elapsed={elapsed:.2f}s throughput={len(results) / elapsed:.1f} req/s"
+        )
+        self.stdout.write(
+            f"p50={_percentile(latencies, 0.5) * 1000:.0f}ms p95={_percentile(latencies, 0.95) * 1000:.0f}ms "
+            f"max={max(latencies or [0]) * 1000:.0f}ms statuses={statuses} "
+            f"max_concurrency={getattr(settings, 'LLM_MAX_CONCURRENCY', 100)}"
+        )
+
+    async def _run(self, options, token):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def one(i):
+            # prompt khác nhau để không trúng llm_cache
+            body = {'message': f'load test question {i}'}
+            async with semaphore:
+                started = time.monotonic()
+                if options['url']:
+                    status = await _post_http(options['url'].rstrip('/') + options['path'], body, token)
+                else:
+                    response = await client.post(
+                        options['path'], body, content_type='application/json',
+                        headers={'Authorization': f'Bearer {token}'},
+                    )
+                    status = response.status_code
+                return status, time.monotonic() - started
+
+        started = time.monotonic()
+        results = await asyncio.gather(*(one(i) for i in range(options['requests'])))
+        return results, time.monotonic() - started
@@ -0,0 +1,47 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app.models import Book, UserBook
+from app.utils import covers
+
+
+def _generate(model_label, pk, name):
+    # chạy trong process con: chỉ đụng file, không đụng DB
+    from django.core.files.storage import default_storage
+    return model_label, pk, covers.generate(default_storage, name)
+
+
+class Command(BaseCommand):
+    help = "Tạo (lại) ảnh bìa thu nhỏ JPEG/WebP cho Book và UserBook còn thiếu hoặc đã cũ."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Số process (mặc định = số CPU)")
+        parser.add_argument('--force', action='store_true', help="Tạo lại cả những ảnh đã có derivative")
+
+    def handle(self, *args, **options):
+        models = {'book': Book, 'userbook': UserBook}
+        jobs = []
+        for label, model in models.items():
+            for obj in model.objects.exclude(cover_image='').exclude(cover_image__isnull=True).only('id', 'cover_image', 'cover_derivatives'):
+                if options['force'] or covers.is_stale(obj):
+                    jobs.append((label, obj.pk, obj.cover_image.name))
+        if not jobs:
+            self.stdout.write("Nothing to do.")
+            return
+
+        connections.close_all()  # không để process con thừa kế kết nối DB
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [pool.submit(_generate, *job) for job in jobs]
+            for future in as_completed(futures):
+                try:
+                    label, pk, derivatives = future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"  failed: {exc}")
+                    continue
+                if covers.apply(models[label], pk, derivatives):
+                    done += 1
+        self.stdout.write(self.style.SUCCESS(f"Cover derivatives: {done} updated, {failed} failed, {len(jobs)} queued."))
@@ -0,0 +1,67 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app.models import Book, UserBook
+from app.utils import pdf_pages, pdf_text
+from app.utils.pdf_extract import extract_pages
+
+
+class Command(BaseCommand):
+    help = ("Trích + index full-text cho PDF của Book / UserBook chưa được index (song song, "
+            "chạy lại được: sách đã index sẽ bỏ qua).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Số process (mặc định PDF_TEXT_WORKERS)")
+        parser.add_argument('--batch-size', type=int, default=200, help="Số dòng đọc mỗi lần quét")
+        parser.add_argument('--limit', type=int, default=None, help="Dừng sau N sách")
+
+    def handle(self, *args, **options):
+        if not pdf_pages.available():
+            raise CommandError("pypdf is not installed.")
+        workers = options['workers'] or pdf_text.workers()
+        done = failed = 0
+        connections.close_all()
+        pool = pdf_text.process_pool(max_workers=workers)
+        try:
+            for model in (Book, UserBook):
+                last_id = 0
+                while options['limit'] is None or done + failed < options['limit']:
+                    batch = list(model.objects.filter(id__gt=last_id).exclude(pdf_file='')
+                                 .exclude(pdf_file__isnull=True).only('id', 'pdf_file').order_by('id')[:options['batch_size']])
+                    if not batch:
+                        break
+                    last_id = batch[-1].id
+                    ok, bad = self._process(batch, pool, workers)
+                    done += ok
+                    failed += bad
+                    self.stdout.write(f"  {model.__name__} up to id {last_id}: {done} indexed, {failed} failed")
+        finally:
+            pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"PDF text index: {done} indexed, {failed} failed."))
+
+    def _process(self, batch, pool, workers):
+        """Trích song song (tối đa 2*workers file đang chờ), ghi DB ở process cha."""
+        ok = bad = 0
+        pending = {}
+        todo = [obj for obj in batch if pdf_text.needs_index(obj)]
+        while todo or pending:
+            while todo and len(pending) < 2 * workers:
+                obj = todo.pop(0)
+                if pdf_text.copy_from_twin(pdf_pages.kind_of(obj), obj.pk, obj.pdf_file.name):
+                    ok += 1
+                    continue
+                pending[pool.submit(extract_pages, obj.pdf_file.path)] = obj
+            if not pending:
+                continue
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                obj = pending.pop(future)
+                try:
+                    pdf_text.write_index(pdf_pages.kind_of(obj), obj.pk, obj.pdf_file.name, future.result())
+                    ok += 1
+                except Exception as exc:
+                    bad += 1
+                    self.stderr.write(f"  failed {type(obj).__name__} {obj.pk}: {exc}")
+        return ok, bad
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.utils import blobs, response_cache
+
+
+class Command(BaseCommand):
+    help = ("Chuyển file pdf/cover cũ (media/books/, media/user_books/, ... hoặc blobs/ phẳng) "
+            "sang layout blobs/ab/cd/<sha256>; theo batch, chạy lại được, không cần dừng site.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--sleep', type=float, default=0.0, help="Nghỉ giữa các batch (giây) để giảm tải")
+        parser.add_argument('--limit', type=int, default=None, help="Dừng sau N file (chạy lại để tiếp tục)")
+
+    def handle(self, *args, **options):
+        moved = missing = 0
+        after = None
+        while True:
+            names = blobs.pending_names(options['batch_size'], after=after)
+            if not names:
+                break
+            for name in names:
+                if blobs.relocate(name) is None:
+                    missing += 1
+                    self.stderr.write(f"  missing: {name}")
+                else:
+                    moved += 1
+                if options['limit'] is not None and moved + missing >= options['limit']:
+                    break
+            after = names[-1]
+            response_cache.invalidate(response_cache.CATALOG_TAG)  # URL media đã đổi
+            self.stdout.write(f"  {moved} moved, {missing} missing (last: {after})")
+            if options['limit'] is not None and moved + missing >= options['limit']:
+                break
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Media layout migration: {moved} moved, {missing} missing."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.utils import chunked_upload
+
+
+class Command(BaseCommand):
+    help = "Xoá các chunked upload dở dang đã quá UPLOAD_EXPIRY_HOURS (kèm file .part)."
+
+    def handle(self, *args, **options):
+        removed = chunked_upload.purge_expired(stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Purged {removed} uploads."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.utils import search_index
+
+
+class Command(BaseCommand):
+    help = "Dựng lại toàn bộ inverted index tìm kiếm (Book + UserBook đã duyệt)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = search_index.rebuild(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt: {total} documents."))
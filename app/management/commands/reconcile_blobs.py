@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.utils import blobs
+
+
+class Command(BaseCommand):
+    help = "Tính lại refcount của Blob từ các field file của Book / UserBook (sửa lệch)."
+
+    def handle(self, *args, **options):
+        fixed = blobs.reconcile(stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Reconciled blobs: {fixed} fixed."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app.models import Book, Review
+from app.utils import ratings
+
+
+class Command(BaseCommand):
+    help = "Tính lại rating_count / rating_sum / histogram của Book từ bảng Review (sửa lệch)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = ratings.reconcile(Book, Review, batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Reconciled ratings: {fixed} books fixed."))
@@ -0,0 +1,58 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app.utils import jobs
+
+
+class Command(BaseCommand):
+    help = "Worker cho job queue trong DB (duyệt sách, ...). Chạy nhiều process song song được."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help="Số thread worker trong process này")
+        parser.add_argument('--kinds', default='', help="Chỉ chạy các kind này (phân tách bằng dấu phẩy)")
+        parser.add_argument('--once', action='store_true', help="Chạy hết job đang chờ rồi thoát")
+
+    def handle(self, *args, **options):
+        kinds = [k for k in options['kinds'].split(',') if k] or None
+        if options['once']:
+            jobs.requeue_stale()
+            done = jobs.run_pending(kinds)
+            self.stdout.write(self.style.SUCCESS(f"Ran {done} jobs."))
+            return
+
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._loop, args=(kinds, stop), name=f'job-worker-{i}', daemon=True)
+            for i in range(options['threads'])
+        ]
+        for t in threads:
+            t.start()
+        self.stdout.write(f"Job worker started ({options['threads']} threads). Ctrl+C to stop.")
+        try:
+            while True:
+                jobs.requeue_stale()
+                close_old_connections()
+                time.sleep(max(getattr(settings, 'JOB_LOCK_TIMEOUT', 600) / 10, 1))
+        except KeyboardInterrupt:
+            stop.set()
+            for t in threads:
+                t.join()
+
+    def _loop(self, kinds, stop):
+        interval = getattr(settings, 'JOB_POLL_INTERVAL', 1.0)
+        while not stop.is_set():
+            try:
+                job = jobs.claim(kinds)
+                if job is None:
+                    stop.wait(interval)
+                    continue
+                jobs.execute(job)
+            except Exception as exc:  # lỗi DB tạm thời: nghỉ rồi thử lại
+                self.stderr.write(f"  worker error: {exc}")
+                stop.wait(interval)
+            finally:
+                close_old_connections()
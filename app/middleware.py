@@ -0,0 +1,99 @@
+import gzip
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .utils import render_stats
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+DEFAULT_COMPRESSION = {
+    'MIN_SIZE': 1024,          # byte; response nhỏ hơn thì không nén
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'CONTENT_TYPES': ['application/json', 'application/x-msgpack', 'text/'],
+}
+
+
+def _accepted_encodings(header):
+    """'gzip;q=1.0, br, *;q=0' -> {'gzip', 'br'} (bỏ những encoding q=0)."""
+    out = set()
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0
+        if q > 0:
+            out.add(token)
+    return out
+
+
+class ResponseCompressionMiddleware:
+    """
+    Nén response bằng brotli (nếu có + client chấp nhận) hoặc gzip, khi body
+    >= MIN_SIZE. Cấu hình qua settings.RESPONSE_COMPRESSION; số byte tiết kiệm
+    được ghi vào render_stats theo endpoint.
+
+    Hỗ trợ cả sync lẫn async: middleware chỉ-sync sẽ buộc Django chạy view
+    async (app/chatbot_async.py) qua async_to_sync, tuần tự trên một thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = {**DEFAULT_COMPRESSION, **getattr(settings, 'RESPONSE_COMPRESSION', {})}
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _compressible(self, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return False
+        if len(response.content) < self.config['MIN_SIZE']:
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        return any(content_type.startswith(t) for t in self.config['CONTENT_TYPES'])
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._compress(request, await self.get_response(request))
+
+    def _compress(self, request, response):
+        if not self._compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        raw = response.content
+        if brotli is not None and 'br' in accepted:
+            encoding, body = 'br', brotli.compress(raw, quality=self.config['BROTLI_QUALITY'])
+        elif 'gzip' in accepted:
+            encoding, body = 'gzip', gzip.compress(raw, compresslevel=self.config['GZIP_LEVEL'], mtime=0)
+        else:
+            return response
+        if len(body) >= len(raw):
+            return response
+
+        response.content = body
+        response['Content-Length'] = str(len(body))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag  # như GZipMiddleware: body đã khác
+        render_stats.record_compression(render_stats.endpoint_name(request), len(raw), len(body))
+        return response
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:09
+
+from django.db import migrations, models
+
+from app.utils.text import fold
+
+
+def fill_folded_keys(apps, schema_editor):
+    Book = apps.get_model('app', 'Book')
+    batch = []
+    for book in Book.objects.only('id', 'title', 'author').iterator(chunk_size=2000):
+        book.title_folded = fold(book.title)
+        book.author_folded = fold(book.author)
+        batch.append(book)
+        if len(batch) >= 2000:
+            Book.objects.bulk_update(batch, ['title_folded', 'author_folded'])
+            batch = []
+    if batch:
+        Book.objects.bulk_update(batch, ['title_folded', 'author_folded'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='author_folded',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='title_folded',
+            field=models.CharField(blank=True, default='', editable=False, max_length=500),
+        ),
+        migrations.RunPython(fill_folded_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_book_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfPageIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('book', 'Book'), ('user_book', 'UserBook')], max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('file_name', models.CharField(max_length=500)),
+                ('file_size', models.BigIntegerField(default=0)),
+                ('page_count', models.PositiveIntegerField(default=0)),
+                ('page_offsets', models.JSONField(default=list)),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
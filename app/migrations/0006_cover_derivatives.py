@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_pdf_page_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userbook',
+            name='cover_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:22
+
+import app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_chunked_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='cover_image',
+            field=models.ImageField(blank=True, null=True, storage=app.storage.blob_storage, upload_to='book_covers/'),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='pdf_file',
+            field=models.FileField(blank=True, null=True, storage=app.storage.blob_storage, upload_to='books/'),
+        ),
+        migrations.AlterField(
+            model_name='userbook',
+            name='cover_image',
+            field=models.ImageField(blank=True, null=True, storage=app.storage.blob_storage, upload_to='user_book_covers/'),
+        ),
+        migrations.AlterField(
+            model_name='userbook',
+            name='pdf_file',
+            field=models.FileField(blank=True, null=True, storage=app.storage.blob_storage, upload_to='user_books/'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfpageindex',
+            name='text_file_name',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='pdfpageindex',
+            name='text_indexed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PdfTextPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('book', 'Book'), ('user_book', 'UserBook')], max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('page', models.PositiveIntegerField()),
+                ('text', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id', 'page')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PdfTextTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('book', 'Book'), ('user_book', 'UserBook')], max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('term', models.CharField(max_length=64)),
+                ('positions', models.JSONField(default=dict)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id', 'term')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_conversations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userbook',
+            name='published_book',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.book'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_user_book_published_book'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobKind',
+            fields=[
+                ('kind', models.CharField(max_length=64, primary_key=True, serialize=False)),
+            ],
+        ),
+    ]
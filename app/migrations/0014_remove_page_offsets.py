@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_job_kind'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='pdfpageindex',
+            name='page_offsets',
+        ),
+    ]
@@ -0,0 +1,76 @@
+from collections import Counter
+
+from django.db import migrations
+
+from app.utils.text import tokenize
+
+# như search_index.FIELD_WEIGHTS tại thời điểm migration
+FIELD_WEIGHTS = {'title': 3, 'author': 2, 'description': 1}
+BATCH_SIZE = 1000
+
+
+def _terms(obj):
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(getattr(obj, field, None)):
+            counts[token] += weight
+    return counts
+
+
+def build_search_index(apps, schema_editor):
+    """0002 chỉ tạo bảng rỗng -> dựng index cho catalog có sẵn để search chạy ngay."""
+    Book = apps.get_model('app', 'Book')
+    UserBook = apps.get_model('app', 'UserBook')
+    SearchDocument = apps.get_model('app', 'SearchDocument')
+    SearchTerm = apps.get_model('app', 'SearchTerm')
+    SearchPosting = apps.get_model('app', 'SearchPosting')
+
+    # index dựng dở (chỉ những dòng signal đã ghi) -> dựng lại từ đầu
+    SearchPosting.objects.all().delete()
+    SearchDocument.objects.all().delete()
+    SearchTerm.objects.all().delete()
+
+    df = Counter()
+    sources = [
+        ('book', Book.objects.only('id', 'title', 'author')),
+        ('user_book', UserBook.objects.filter(is_approved=True).only('id', 'title', 'author', 'description')),
+    ]
+    for kind, qs in sources:
+        batch = []
+        for obj in qs.order_by('id').iterator(chunk_size=BATCH_SIZE):
+            batch.append((obj.pk, _terms(obj)))
+            if len(batch) >= BATCH_SIZE:
+                _write_batch(SearchDocument, SearchPosting, kind, batch, df)
+                batch = []
+        if batch:
+            _write_batch(SearchDocument, SearchPosting, kind, batch, df)
+
+    terms = list(df.items())
+    for i in range(0, len(terms), BATCH_SIZE):
+        SearchTerm.objects.bulk_create([SearchTerm(term=t, df=n) for t, n in terms[i:i + BATCH_SIZE]])
+
+
+def _write_batch(SearchDocument, SearchPosting, kind, batch, df):
+    SearchDocument.objects.bulk_create([
+        SearchDocument(kind=kind, object_id=pk, length=sum(terms.values())) for pk, terms in batch
+    ])
+    ids = dict(SearchDocument.objects.filter(
+        kind=kind, object_id__in=[pk for pk, _ in batch]
+    ).values_list('object_id', 'id'))
+    postings = []
+    for pk, terms in batch:
+        for term, tf in terms.items():
+            postings.append(SearchPosting(term=term, document_id=ids[pk], tf=tf))
+            df[term] += 1
+    SearchPosting.objects.bulk_create(postings, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_remove_page_offsets'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,41 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .storage import blob_storage
+
 class Book(models.Model):
     title = models.CharField(max_length=500)
     author = models.CharField(max_length=255, null=True, blank=True)
-    pdf_file = models.FileField(upload_to="books/", null=True, blank=True)
+    pdf_file = models.FileField(upload_to="books/", null=True, blank=True, storage=blob_storage)
     pages = models.IntegerField(null=True, blank=True)
-    cover_image = models.ImageField(upload_to="book_covers/", null=True, blank=True)
+    cover_image = models.ImageField(upload_to="book_covers/", null=True, blank=True, storage=blob_storage)
+    # {"source": <cover_image.name>, "sizes": {"320": {"jpeg": name, "webp": name}, ...}} (app/utils/covers.py)
+    cover_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    # khoá đã bỏ dấu + lowercase, điền tự động ở pre_save (dùng cho gợi ý chính tả)
+    title_folded = models.CharField(max_length=500, blank=True, default='', editable=False)
+    author_folded = models.CharField(max_length=255, blank=True, default='', editable=False)
+    # thống kê rating tính sẵn, cập nhật bằng F() trong signal của Review
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
     def __str__(self): return self.title
 
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.rating_count, 1) if self.rating_count else 0
+
+    @property
+    def rating_histogram(self):
+        return {i: getattr(self, f'rating_{i}') for i in range(1, 6)}
+
 
 class UserBook(models.Model):
     # sách do user tự tạo/đăng
@@ -20,11 +47,16 @@ class UserBook(models.Model):
     author = models.CharField(max_length=255, null=True, blank=True)
     description = models.TextField(null=True, blank=True)
 
-    pdf_file = models.FileField(upload_to="user_books/", null=True, blank=True)
+    pdf_file = models.FileField(upload_to="user_books/", null=True, blank=True, storage=blob_storage)
     pages = models.IntegerField(null=True, blank=True)
-    cover_image = models.ImageField(upload_to="user_book_covers/", null=True, blank=True)
+    cover_image = models.ImageField(upload_to="user_book_covers/", null=True, blank=True, storage=blob_storage)
+    cover_derivatives = models.JSONField(default=dict, blank=True, editable=False)
 
     is_approved = models.BooleanField(default=False)  # duyệt bởi admin trước khi public
+    # Book tạo ra khi duyệt (job approve_user_book retry thì dùng lại, không tạo thêm)
+    published_book = models.OneToOneField(
+        Book, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -58,3 +90,205 @@ class ReadingHistory(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='history')
     read_at = models.DateTimeField(auto_now_add=True)
     def __str__(self): return f"{self.user.username} read {self.book.title}"
+
+
+# ===== Full-text search index (xem app/utils/search_index.py) =====
+class SearchDocument(models.Model):
+    KIND_BOOK = 'book'
+    KIND_USER_BOOK = 'user_book'
+    KIND_CHOICES = [(KIND_BOOK, 'Book'), (KIND_USER_BOOK, 'UserBook')]
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    length = models.PositiveIntegerField(default=0)  # tổng tf (đã nhân trọng số field)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self): return f"{self.kind}:{self.object_id}"
+
+
+class SearchTerm(models.Model):
+    term = models.CharField(max_length=64, unique=True)
+    df = models.PositiveIntegerField(default=0)  # số tài liệu chứa term
+
+    def __str__(self): return f"{self.term} ({self.df})"
+
+
+class SearchPosting(models.Model):
+    term = models.CharField(max_length=64)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    tf = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('term', 'document')
+        indexes = [models.Index(fields=['term', '-tf'])]
+
+    def __str__(self): return f"{self.term} -> {self.document_id} ({self.tf})"
+
+
+# ===== PDF page index (xem app/utils/pdf_pages.py) =====
+class PdfPageIndex(models.Model):
+    KIND_BOOK = 'book'
+    KIND_USER_BOOK = 'user_book'
+    KIND_CHOICES = [(KIND_BOOK, 'Book'), (KIND_USER_BOOK, 'UserBook')]
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    file_name = models.CharField(max_length=500)  # pdf_file.name lúc index; khác -> index cũ
+    file_size = models.BigIntegerField(default=0)
+    page_count = models.PositiveIntegerField(default=0)
+    indexed_at = models.DateTimeField(auto_now=True)
+    # full-text (app/utils/pdf_text.py): pdf_file.name lúc trích text; khác file_name -> chưa index
+    text_file_name = models.CharField(max_length=500, blank=True, default='')
+    text_indexed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self): return f"{self.kind}:{self.object_id} ({self.page_count} pages)"
+
+
+# ===== Full-text trong PDF (xem app/utils/pdf_text.py) =====
+class PdfTextPage(models.Model):
+    kind = models.CharField(max_length=16, choices=PdfPageIndex.KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    page = models.PositiveIntegerField()  # 1-based
+    text = models.TextField(blank=True, default='')
+
+    class Meta:
+        unique_together = ('kind', 'object_id', 'page')
+
+    def __str__(self): return f"{self.kind}:{self.object_id} p{self.page}"
+
+
+class PdfTextTerm(models.Model):
+    """Positional index theo từng sách: term -> {"<page>": [vị trí token trong trang, ...]}."""
+    kind = models.CharField(max_length=16, choices=PdfPageIndex.KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    term = models.CharField(max_length=64)
+    positions = models.JSONField(default=dict)
+
+    class Meta:
+        unique_together = ('kind', 'object_id', 'term')
+
+    def __str__(self): return f"{self.kind}:{self.object_id} {self.term}"
+
+
+# ===== Content-addressed media (xem app/storage.py, app/utils/blobs.py) =====
+class Blob(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)  # tên trong storage, vd blobs/<sha256>.pdf
+    size = models.BigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)  # số field Book/UserBook trỏ tới blob
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self): return f"{self.name} (refs={self.refcount})"
+
+
+# ===== Chunked upload (xem app/utils/chunked_upload.py) =====
+class ChunkedUpload(models.Model):
+    STATUS_UPLOADING = 'uploading'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CHOICES = [(STATUS_UPLOADING, 'Uploading'), (STATUS_COMPLETE, 'Complete')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)  # số byte đã nhận liên tục từ đầu file
+    expected_sha256 = models.CharField(max_length=64, blank=True, default='')
+    sha256 = models.CharField(max_length=64, blank=True, default='')  # điền khi complete
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+    # metadata để tạo UserBook khi complete
+    title = models.CharField(max_length=500)
+    description = models.TextField(null=True, blank=True)
+    user_book = models.ForeignKey(UserBook, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'updated_at'])]
+
+    def __str__(self): return f"{self.filename} ({self.offset}/{self.total_size})"
+
+
+# ===== Background jobs (xem app/utils/jobs.py, manage.py run_jobs) =====
+class Job(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'), (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'), (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    # job trùng dedupe_key đang chờ/chạy/xong thì enqueue trả lại job cũ
+    dedupe_key = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=128, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    progress = models.PositiveSmallIntegerField(default=0)  # 0..100
+    message = models.CharField(max_length=255, blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['dedupe_key']),
+        ]
+
+    def __str__(self): return f"{self.kind}#{self.pk} ({self.status})"
+
+
+class JobKind(models.Model):
+    # một dòng / kind: claim() khoá dòng này khi đếm job đang chạy của kind
+    kind = models.CharField(max_length=64, primary_key=True)
+
+    def __str__(self): return self.kind
+
+
+# ===== Chatbot conversations (xem app/utils/conversations.py) =====
+class Conversation(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations')
+    role = models.CharField(max_length=255, default='helpful assistant')
+    title = models.CharField(max_length=255, blank=True, default='')
+    # tóm tắt các lượt cũ (id <= summarized_until) không còn gửi nguyên văn cho model
+    summary = models.TextField(blank=True, default='')
+    summarized_until = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-updated_at'])]
+
+    def __str__(self): return f"{self.user} - {self.title or self.pk}"
+
+
+class ConversationMessage(models.Model):
+    ROLE_USER = 'user'
+    ROLE_ASSISTANT = 'assistant'
+    ROLE_CHOICES = [(ROLE_USER, 'User'), (ROLE_ASSISTANT, 'Assistant')]
+
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
+    role = models.CharField(max_length=16, choices=ROLE_CHOICES)
+    content = models.TextField()
+    tokens = models.PositiveIntegerField(default=0)  # ước lượng, dùng cho token budget
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['conversation', '-id'])]
+
+    def __str__(self): return f"{self.conversation_id} {self.role}: {self.content[:40]}"
@@ -0,0 +1,25 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    Keyset pagination theo id (duy nhất, có index PK) -> thứ tự ổn định và trang
+    sâu tốn chi phí như trang đầu. Cursor là chuỗi base64 opaque do DRF sinh ra.
+    """
+    ordering = '-id'
+    page_size = settings.CATALOG_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.CATALOG_MAX_PAGE_SIZE
+
+
+class ModerationQueuePagination(CatalogCursorPagination):
+    """Hàng đợi duyệt: cũ nhất trước (FIFO), vẫn keyset theo id."""
+    ordering = 'id'
+
+
+def paginate(queryset, request, serializer_class, pagination_class=CatalogCursorPagination, **kwargs):
+    """Dùng cho function view: trả Response {next, previous, results}."""
+    paginator = pagination_class()
+    page = paginator.paginate_queryset(queryset, request)
+    return paginator.get_paginated_response(serializer_class(page, many=True, **kwargs).data)
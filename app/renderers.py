@@ -0,0 +1,87 @@
+"""
+Renderer cho REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].
+
+- FastJSONRenderer: orjson (nếu cài) với output tương đương JSONRenderer của DRF.
+- MsgPackRenderer: Accept: application/x-msgpack (cần package msgpack).
+- EventStreamRenderer: chỉ để negotiation nhận text/event-stream (chatbot SSE).
+Cả hai ghi thời gian encode vào app.utils.render_stats.
+"""
+import json
+import time
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .utils import render_stats
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+_drf_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # datetime, Decimal, lazy str, QuerySet... -> cùng cách DRF encode
+    return _drf_encoder.default(obj)
+
+
+def _record(renderer_context, started, payload):
+    request = (renderer_context or {}).get('request')
+    if request is not None:
+        render_stats.record_encode(
+            render_stats.endpoint_name(request), time.perf_counter() - started, len(payload)
+        )
+    return payload
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return _record(renderer_context, started,
+                           super().render(data, accepted_media_type, renderer_context))
+        if data is None:
+            return b''
+        payload = orjson.dumps(
+            data, default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+        return _record(renderer_context, started, payload)
+
+
+class MsgPackRenderer(BaseRenderer):
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if msgpack is None:
+            raise RuntimeError("MsgPackRenderer requires the 'msgpack' package.")
+        started = time.perf_counter()
+        if data is None:
+            return b''
+        return _record(renderer_context, started, msgpack.packb(data, default=_default, use_bin_type=True))
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Cho phép Accept: text/event-stream qua content negotiation của DRF ở các view
+    chatbot; stream thật là StreamingHttpResponse (app/utils/llm_stream.py), renderer
+    này chỉ dùng cho response thường (vd lỗi 400) -> một event "error".
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return ('event: error\ndata: %s\n\n' % json.dumps(data, cls=JSONEncoder, ensure_ascii=False)).encode('utf-8')
@@ -1,9 +1,91 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from rest_framework.serializers import Serializer, CharField
 
 from .models import (
     Book, Review, FavoriteBook, ReadingHistory, UserBook
 )
+from .utils import covers
+
+def parse_csv_param(value):
+    return [v.strip() for v in (value or '').split(',') if v.strip()]
+
+
+def shape_from_request(request, default_expand=()):
+    """Đọc ?fields=a,b & ?expand=reviews -> kwargs cho serializer / setup_queryset."""
+    expand = parse_csv_param(request.query_params.get('expand')) if 'expand' in request.query_params else list(default_expand)
+    return {
+        'fields': parse_csv_param(request.query_params.get('fields')) or None,
+        'expand': expand,
+    }
+
+
+def _storage_url(serializer, storage):
+    """name -> URL giống FileField của DRF (tuyệt đối nếu context có request)."""
+    request = serializer.context.get('request')
+    def url(name):
+        value = storage.url(name)
+        return request.build_absolute_uri(value) if request is not None else value
+    return url
+
+
+class CoverDerivativesMixin:
+    """cover_sizes / cover_srcset từ cover_derivatives (app/utils/covers.py)."""
+    cover_source = None  # vd 'book' nếu derivative nằm trên obj.book
+
+    def _cover_owner(self, obj):
+        return getattr(obj, self.cover_source) if self.cover_source else obj
+
+    def _cover_url(self, obj):
+        return _storage_url(self, self._cover_owner(obj).cover_image.storage)
+
+    def get_cover_sizes(self, obj):
+        return covers.size_map(self._cover_owner(obj).cover_derivatives, self._cover_url(obj))
+
+    def get_cover_srcset(self, obj):
+        return covers.srcset(self._cover_owner(obj).cover_derivatives, self._cover_url(obj))
+
+
+# ===== Sparse fieldsets / expansion =====
+class DynamicFieldsMixin:
+    """
+    Serializer nhận thêm kwargs fields=[...] (sparse fieldset) và expand=[...].
+    Field trong Meta.expandable_fields chỉ xuất hiện khi được expand.
+
+    Meta.field_sources: field -> các cột model cần load (mặc định chính tên field),
+    Meta.field_prefetches: field -> prefetch_related cần thiết khi field có mặt.
+    setup_queryset() dùng hai bảng này để chỉ only()/prefetch đúng phần được yêu cầu.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None) or ()
+        super().__init__(*args, **kwargs)
+        selected = self.selected_fields(fields, expand)
+        for name in set(self.fields) - selected:
+            self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, fields=None, expand=()):
+        meta = cls.Meta
+        expandable = set(getattr(meta, 'expandable_fields', ()))
+        allowed = [f for f in meta.fields if f not in expandable or f in expand]
+        if fields:
+            allowed = [f for f in allowed if f in fields or f in expandable]
+        return set(allowed)
+
+    @classmethod
+    def setup_queryset(cls, queryset, fields=None, expand=()):
+        meta = cls.Meta
+        sources = getattr(meta, 'field_sources', {})
+        prefetches = getattr(meta, 'field_prefetches', {})
+        columns, related = set(), []
+        for name in cls.selected_fields(fields, expand):
+            columns.update(sources.get(name, [name]))
+            if name in prefetches:
+                related.append(prefetches[name])
+        queryset = queryset.only(*columns) if columns else queryset
+        return queryset.prefetch_related(*related) if related else queryset
+
 
 # ===== Review =====
 class ReviewSerializer(serializers.ModelSerializer):
@@ -13,6 +95,12 @@ class ReviewSerializer(serializers.ModelSerializer):
         model = Review
         fields = ['id', 'book', 'user', 'rating', 'comment', 'created_at']
 
+    def validate_rating(self, value):
+        # histogram trên Book chỉ có 1..5
+        if value is not None and not 1 <= value <= 5:
+            raise serializers.ValidationError("Rating must be between 1 and 5.")
+        return value
+
     def create(self, validated_data):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
@@ -21,9 +109,11 @@ class ReviewSerializer(serializers.ModelSerializer):
 
 
 # ===== Book =====
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(DynamicFieldsMixin, CoverDerivativesMixin, serializers.ModelSerializer):
     reviews = ReviewSerializer(many=True, read_only=True)
     average_rating = serializers.SerializerMethodField()
+    cover_sizes = serializers.SerializerMethodField()
+    cover_srcset = serializers.SerializerMethodField()
     # DRF tự xử lý FileField -> URL nếu dùng DefaultStorage
     pdf_file = serializers.FileField(required=False, allow_null=True)
 
@@ -36,21 +126,32 @@ class BookSerializer(serializers.ModelSerializer):
             'pdf_file',
             'pages',
             'cover_image',
+            'cover_sizes',
+            'cover_srcset',
             'reviews',
             'average_rating',
         ]
+        expandable_fields = ['reviews']
+        field_sources = {
+            'reviews': [],
+            'average_rating': ['rating_sum', 'rating_count'],
+            'cover_sizes': ['cover_image', 'cover_derivatives'],
+            'cover_srcset': ['cover_image', 'cover_derivatives'],
+        }
+        field_prefetches = {
+            'reviews': Prefetch('reviews', queryset=Review.objects.select_related('user')),
+        }
 
     def get_average_rating(self, obj):
-        qs = obj.reviews.all()
-        if not qs:
-            return 0
-        vals = [r.rating for r in qs if r.rating is not None]
-        return round(sum(vals) / len(vals), 1) if vals else 0
+        # đọc từ rating_sum / rating_count tính sẵn, không load Review
+        return obj.average_rating
 
 
 # ===== UserBook (sách do user tạo) =====
-class UserBookSerializer(serializers.ModelSerializer):
+class UserBookSerializer(DynamicFieldsMixin, CoverDerivativesMixin, serializers.ModelSerializer):
     pdf_file = serializers.FileField(required=False, allow_null=True)
+    cover_sizes = serializers.SerializerMethodField()
+    cover_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = UserBook
@@ -64,11 +165,17 @@ class UserBookSerializer(serializers.ModelSerializer):
             'pdf_file',
             'pages',
             'cover_image',
+            'cover_sizes',
+            'cover_srcset',
             'is_approved',
             'created_at',
             'updated_at',
         ]
         read_only_fields = ['is_approved', 'created_at', 'updated_at']
+        field_sources = {
+            'cover_sizes': ['cover_image', 'cover_derivatives'],
+            'cover_srcset': ['cover_image', 'cover_derivatives'],
+        }
 
     def create(self, validated_data):
         # tự gán user hiện tại nếu có request
@@ -79,10 +186,13 @@ class UserBookSerializer(serializers.ModelSerializer):
 
 
 # ===== FavoriteBook =====
-class FavoriteBookBookMiniSerializer(serializers.ModelSerializer):
+class FavoriteBookBookMiniSerializer(CoverDerivativesMixin, serializers.ModelSerializer):
+    cover_sizes = serializers.SerializerMethodField()
+    cover_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Book
-        fields = ['id', 'title', 'author', 'cover_image']
+        fields = ['id', 'title', 'author', 'cover_image', 'cover_sizes', 'cover_srcset']
 
 class FavoriteBookSerializer(serializers.ModelSerializer):
     book = FavoriteBookBookMiniSerializer(read_only=True)
@@ -93,15 +203,19 @@ class FavoriteBookSerializer(serializers.ModelSerializer):
 
 
 # ===== ReadingHistory =====
-class ReadingHistorySerializer(serializers.ModelSerializer):
+class ReadingHistorySerializer(CoverDerivativesMixin, serializers.ModelSerializer):
     book_id = serializers.IntegerField(source='book.id', read_only=True)
     book_title = serializers.CharField(source='book.title', read_only=True)
     book_author = serializers.CharField(source='book.author', read_only=True)
     book_cover = serializers.ImageField(source='book.cover_image', read_only=True)
+    book_cover_sizes = serializers.SerializerMethodField(method_name='get_cover_sizes')
+    book_cover_srcset = serializers.SerializerMethodField(method_name='get_cover_srcset')
+    cover_source = 'book'
 
     class Meta:
         model = ReadingHistory
-        fields = ['id', 'book_id', 'book_title', 'book_author', 'book_cover', 'read_at']
+        fields = ['id', 'book_id', 'book_title', 'book_author', 'book_cover',
+                  'book_cover_sizes', 'book_cover_srcset', 'read_at']
 
 
 # ===== Auth helper serializers (giữ nguyên) =====
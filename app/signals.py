@@ -0,0 +1,212 @@
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Book, UserBook, Review
+from .utils import search_index, suggest_index, spelling, ratings, response_cache, pdf_pages, pdf_text, covers, blobs, vector_index
+from .utils.text import fold
+
+
+# ===== Search index: cập nhật tăng dần khi Book / UserBook thay đổi =====
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=UserBook)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if raw:  # loaddata
+        return
+    transaction.on_commit(lambda: search_index.index_object(instance))
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=UserBook)
+def remove_from_search_index(sender, instance, **kwargs):
+    # như post_save: ghi index sau commit (delete bị rollback thì index không đổi);
+    # chụp pk ngay vì delete() đặt instance.pk = None
+    kind, object_id = search_index.kind_of(instance), instance.pk
+    transaction.on_commit(lambda: search_index.remove_document(kind, object_id))
+
+
+# ===== Vector index (RAG chatbot): upsert khi thêm / sửa / duyệt, xoá khi delete =====
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=UserBook)
+def update_vector_index(sender, instance, created=False, raw=False, **kwargs):
+    if raw or (isinstance(instance, UserBook) and not instance.is_approved and created):
+        return
+    transaction.on_commit(lambda: vector_index.schedule(instance))
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=UserBook)
+def remove_from_vector_index(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: vector_index.schedule_removal(sender, pk))
+
+
+# ===== Typeahead: vá prefix index trong process hiện tại =====
+@receiver(post_save, sender=Book)
+def update_suggest_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: suggest_index.book_saved(instance))
+
+
+@receiver(post_delete, sender=Book)
+def remove_from_suggest_index(sender, instance, **kwargs):
+    book_id = instance.pk
+    transaction.on_commit(lambda: suggest_index.book_deleted(book_id))
+
+
+# ===== Spelling: khoá bỏ dấu lưu sẵn trên Book + vá SpellingIndex =====
+@receiver(pre_save, sender=Book)
+def fill_folded_keys(sender, instance, raw=False, **kwargs):
+    instance._previous_folded = None
+    if instance.pk and not raw:
+        instance._previous_folded = (
+            Book.objects.filter(pk=instance.pk).values_list('title_folded', 'author_folded').first()
+        )
+    instance.title_folded = fold(instance.title)
+    instance.author_folded = fold(instance.author)
+
+
+@receiver(post_save, sender=Book)
+def update_spelling_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_previous_folded', None)
+    new = (instance.title_folded, instance.author_folded)
+    if old != new:
+        transaction.on_commit(lambda: spelling.book_changed(old, new))
+
+
+@receiver(post_delete, sender=Book)
+def remove_from_spelling_index(sender, instance, **kwargs):
+    old = (instance.title_folded, instance.author_folded)
+    transaction.on_commit(lambda: spelling.book_changed(old, None))
+
+
+# ===== Rating aggregates trên Book =====
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if instance.pk and not raw:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list('book_id', 'rating').first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_aggregates(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    with transaction.atomic():
+        old = getattr(instance, '_previous_rating', None)
+        if old and old == (instance.book_id, instance.rating):
+            return
+        if old:
+            ratings.apply_rating(old[0], old[1], -1)
+        ratings.apply_rating(instance.book_id, instance.rating, +1)
+
+
+@receiver(post_delete, sender=Review)
+def remove_rating_aggregates(sender, instance, **kwargs):
+    ratings.apply_rating(instance.book_id, instance.rating, -1)
+
+
+# ===== Response cache: bump tag của những entry bị ảnh hưởng =====
+def _invalidate_on_commit(*tags):
+    transaction.on_commit(lambda: response_cache.invalidate(*tags))
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_responses(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_folded', None)
+    _invalidate_on_commit(
+        response_cache.book_tag(instance.pk), response_cache.CATALOG_TAG,
+        *response_cache.author_change_tags(instance.author),
+        *(response_cache.author_change_tags(previous[1]) if previous else []),
+    )
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_responses(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    book_ids = {instance.book_id, previous[0] if previous else instance.book_id}
+    # danh sách theo tác giả không phụ thuộc CATALOG_TAG -> bump tag tác giả của sách
+    authors = Book.objects.filter(pk__in=book_ids).values_list('author', flat=True)
+    _invalidate_on_commit(
+        response_cache.CATALOG_TAG, *(response_cache.book_tag(b) for b in book_ids),
+        *(tag for author in authors for tag in response_cache.author_change_tags(author)),
+    )
+
+
+@receiver(post_save, sender=UserBook)
+@receiver(post_delete, sender=UserBook)
+def invalidate_user_book_responses(sender, instance, raw=False, **kwargs):
+    if raw or not instance.is_approved:
+        return
+    tags = [response_cache.CATALOG_TAG, *response_cache.author_change_tags(instance.author)]
+    if instance.original_book_id:
+        tags.append(response_cache.book_tag(instance.original_book_id))
+    _invalidate_on_commit(*tags)
+
+
+# ===== PDF page index: ingest sau khi upload / đổi file =====
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=UserBook)
+def ingest_pdf_pages(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pdf_file or getattr(instance, '_media_in_job', False):
+        return
+    transaction.on_commit(
+        lambda: pdf_pages.needs_ingest(instance) and pdf_pages.schedule_ingest(instance)
+    )
+    transaction.on_commit(
+        lambda: pdf_text.needs_index(instance) and pdf_text.schedule(instance)
+    )
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=UserBook)
+def remove_pdf_text(sender, instance, **kwargs):
+    pdf_text.remove(pdf_pages.kind_of(instance), instance.pk)
+
+
+# ===== Cover derivatives: resize JPEG/WebP khi ảnh bìa đổi =====
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=UserBook)
+def generate_cover_derivatives(sender, instance, raw=False, **kwargs):
+    if raw or getattr(instance, '_media_in_job', False) or not covers.is_stale(instance):
+        return
+    transaction.on_commit(lambda: covers.schedule(instance))
+
+
+# ===== Blob refcount: file dùng chung giữa Book / UserBook =====
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=UserBook)
+def remember_previous_files(sender, instance, raw=False, **kwargs):
+    instance._previous_files = [] if raw else blobs.previous_file_names(instance)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=UserBook)
+def update_blob_refcounts(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    blobs.sync(getattr(instance, '_previous_files', []), blobs.file_names(instance))
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=UserBook)
+def release_blobs(sender, instance, **kwargs):
+    blobs.release(blobs.file_names(instance))
+
+
+@receiver(request_finished)
+def release_unclaimed_blobs(sender, **kwargs):
+    # claim() của storage mà dòng không lưu được -> không có post_save để trả phần giữ
+    blobs.release_claims()
@@ -0,0 +1,117 @@
+"""
+Content-addressed media storage.
+
+File được lưu một lần dưới sha256 của nội dung, chia thư mục theo tiền tố
+hash (blobs/ab/cd/<sha256><ext>, độ sâu MEDIA_SHARD_DEPTH) để không thư mục
+nào chứa quá nhiều file; mỗi
+blob có một dòng Blob với refcount = số field Book/UserBook đang trỏ tới nó
+(cập nhật trong app/signals.py qua app/utils/blobs.py). Upload trùng nội dung
+chỉ trả về tên blob có sẵn (giữ chỗ một tham chiếu dưới row lock qua
+blobs.claim() để collect không xoá nó trước khi dòng được lưu); delete() chỉ
+xoá file khi không còn ai tham chiếu.
+
+Hash được tính trong lúc copy stream vào file tạm cạnh thư mục blob (RAM
+không phụ thuộc kích thước file); nội dung có temporary_file_path() (upload
+tạm của Django, chunked upload) được rename thẳng, và nếu nó mang sẵn thuộc
+tính `sha256` thì không cần đọc lại để hash.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+BLOB_DIR = 'blobs'
+HASH_BLOCK_SIZE = 64 * 1024
+SHARD_WIDTH = 2  # số ký tự hex mỗi cấp -> 256 thư mục con mỗi cấp
+
+
+def shard_depth():
+    return getattr(settings, 'MEDIA_SHARD_DEPTH', 2)
+
+
+def blob_name(digest, ext=''):
+    shards = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(shard_depth())]
+    return '/'.join([BLOB_DIR, *shards, f'{digest}{ext}'])
+
+
+def is_sharded(name):
+    """Tên đã theo layout hiện tại (blob_name của chính hash trong tên)?"""
+    stem, ext = os.path.splitext(os.path.basename(name or ''))
+    return len(stem) == 64 and name == blob_name(stem, ext)
+
+
+def hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def _spool(self, content):
+        """Copy content vào file tạm trong MEDIA_ROOT/blobs, hash trên đường đi."""
+        directory = self.path(BLOB_DIR)
+        os.makedirs(directory, exist_ok=True)
+        hasher = hashlib.sha256()
+        fd, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in content.chunks():
+                hasher.update(chunk)
+                out.write(chunk)
+        return path, hasher.hexdigest()
+
+    def _save(self, name, content):
+        from app.models import Blob
+        from app.utils import blobs
+
+        ext = os.path.splitext(name)[1].lower()[:16]
+        if hasattr(content, 'temporary_file_path'):
+            path = content.temporary_file_path()
+            digest = getattr(content, 'sha256', None) or hash_file(path)
+        else:
+            path, digest = self._spool(content)
+
+        with transaction.atomic():
+            # khoá dòng: collect() đang xoá blob này thì chờ, xoá xong thì tạo lại
+            blob = Blob.objects.select_for_update().filter(sha256=digest).first()
+            if blob is not None and self.exists(blob.name):
+                os.remove(path)  # trùng nội dung -> bỏ bản vừa nhận
+                blobs.claim(blob)
+                return blob.name
+
+            target = blob.name if blob is not None else blob_name(digest, ext)
+            full_path = self.path(target)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            size = os.path.getsize(path)
+            file_move_safe(path, full_path, allow_overwrite=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+            if blob is None:
+                blob, _ = Blob.objects.get_or_create(sha256=digest, defaults={'name': target, 'size': size})
+            blobs.claim(blob)
+            return blob.name
+
+    def delete(self, name):
+        from app.utils import blobs
+        if name and blobs.reference_count(name) > 0:
+            return  # còn Book/UserBook khác dùng chung file
+        super().delete(name)
+        blobs.forget(name)
+
+
+_blob_storage = None
+
+
+def blob_storage():
+    """Callable cho FileField(storage=...) -> migration không phải serialize instance."""
+    global _blob_storage
+    if _blob_storage is None:
+        # không truyền location / base_url: đọc MEDIA_ROOT / MEDIA_URL lúc dùng (override_settings trong test)
+        _blob_storage = ContentAddressedStorage()
+    return _blob_storage
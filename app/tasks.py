@@ -0,0 +1,97 @@
+"""
+Job handlers cho app/utils/jobs.py (import trong AppConfig.ready()).
+"""
+from django.db import transaction
+
+from .models import Book, UserBook
+from .utils import blobs, conversations, covers, pdf_pages, pdf_text
+from .utils.jobs import enqueue, register, report
+
+
+# ===== Duyệt sách user đăng =====
+@register('approve_user_book', max_attempts=3)
+def approve_user_book(job):
+    """
+    Idempotent: Book đã tạo được lưu ở UserBook.published_book nên retry (lỗi,
+    requeue_stale) không tạo thêm Book. Trang / text / thumbnail là các job
+    riêng theo book id -> lỗi media không chạy lại bước tạo Book.
+    """
+    user_book_id = job.payload['user_book_id']
+    report(job, 10, 'publishing')
+    with transaction.atomic():
+        ub = UserBook.objects.select_for_update().filter(pk=user_book_id).first()
+        if ub is None:
+            raise UserBook.DoesNotExist(f"UserBook {user_book_id} not found")
+        book = ub.published_book
+        if book is None:
+            # Chỉ copy metadata: Book trỏ tới cùng blob (refcount +1), không copy file
+            book = Book(
+                title=ub.title, author=ub.author, pages=ub.pages,
+                pdf_file=ub.pdf_file.name or None, cover_image=ub.cover_image.name or None,
+                cover_derivatives=ub.cover_derivatives,
+            )
+            book._media_in_job = True  # signal không đẩy sang thread nền, các job bên dưới làm
+            book.save()
+        ub.is_approved = True
+        ub.published_book = book
+        ub.save(update_fields=['is_approved', 'published_book'])
+
+        report(job, 60, 'queueing media processing')
+        media_jobs = {}
+        for kind in ('ingest_book_pages', 'index_book_text', 'process_book_cover'):
+            media_jobs[kind] = enqueue(kind, {'book_id': book.pk}, dedupe_key=f'{kind}:{book.pk}').pk
+    return {'book_id': book.pk, 'user_book_id': user_book_id, 'media_jobs': media_jobs}
+
+
+def _book(job):
+    book = Book.objects.filter(pk=job.payload['book_id']).first()
+    if book is None:
+        raise Book.DoesNotExist(f"Book {job.payload['book_id']} not found")
+    return book
+
+
+@register('ingest_book_pages', max_attempts=3)
+def ingest_book_pages(job):
+    book = _book(job)
+    if pdf_pages.needs_ingest(book):
+        report(job, 10, 'indexing pages')
+        pdf_pages.ingest(book)
+    return {'book_id': book.pk}
+
+
+@register('index_book_text', max_attempts=3)
+def index_book_text(job):
+    book = _book(job)
+    if pdf_text.needs_index(book):
+        report(job, 10, 'indexing text')
+        pdf_text.index_object(book)  # thường chỉ copy index của UserBook (cùng blob)
+    return {'book_id': book.pk}
+
+
+@register('process_book_cover', max_attempts=3)
+def process_book_cover(job):
+    book = _book(job)
+    if covers.is_stale(book):
+        report(job, 10, 'generating cover thumbnails')
+        covers.process(Book, book.pk)
+    return {'book_id': book.pk}
+
+
+# ===== Dọn file không còn tham chiếu (bulk reject, ...) =====
+@register('collect_blobs', max_attempts=5)
+def collect_blobs(job):
+    names = job.payload['names']
+    for start in range(0, len(names), 100):
+        blobs.collect(names[start:start + 100])
+        report(job, 100 * (start + 100) // len(names))
+    return {'checked': len(names)}
+
+
+# ===== Tóm tắt hội thoại chatbot cũ (token budget) =====
+@register('summarize_conversation', max_attempts=3)
+def summarize_conversation(job):
+    conversation_id = job.payload['conversation_id']
+    # job cũ mang sẵn until_id; job mới tính điểm cắt từ tin hiện có lúc chạy
+    until_id = job.payload.get('until_id') or conversations.summary_cut(conversation_id)
+    folded = conversations.fold_into_summary(conversation_id, until_id) if until_id else 0
+    return {'folded_messages': folded}
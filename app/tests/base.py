@@ -0,0 +1,65 @@
+"""Helper dùng chung cho test: MEDIA_ROOT tạm, PDF có text, file upload."""
+import io
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+try:
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+except ImportError:  # optional dependency
+    PdfWriter = None
+
+
+def make_pdf(*pages):
+    """PDF nhỏ, mỗi phần tử của `pages` là text (ASCII) của một trang."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    }))
+    for text in pages:
+        page = writer.add_blank_page(612, 792)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font}),
+        })
+        content = DecodedStreamObject()
+        content.set_data(f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode('latin-1'))
+        page[NameObject('/Contents')] = writer._add_object(content)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def pdf_file(*pages, name='book.pdf'):
+    return ContentFile(make_pdf(*pages), name=name)
+
+
+class MediaTestCase(TestCase):
+    """
+    MEDIA_ROOT / thư mục upload tạm cho cả class, cache sạch cho mỗi test;
+    tắt các phần chạy nền (RAG, warm-up vector index).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls._media_settings = override_settings(
+            MEDIA_ROOT=cls.media_root, UPLOAD_TEMP_DIR=None,
+            RAG_ENABLED=False, VECTOR_INDEX_WARMUP=False,
+        )
+        cls._media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
@@ -0,0 +1,29 @@
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from app.apps import _is_web_server
+
+
+class WarmUpGateTests(SimpleTestCase):
+
+    def _check(self, argv, run_main=None):
+        env = {'RUN_MAIN': run_main} if run_main else {}
+        with mock.patch('sys.argv', argv), mock.patch.dict(os.environ, env, clear=False):
+            if not run_main:
+                os.environ.pop('RUN_MAIN', None)
+            return _is_web_server()
+
+    def test_management_commands_do_not_warm_up(self):
+        self.assertFalse(self._check(['manage.py', 'migrate']))
+        self.assertFalse(self._check(['manage.py', 'run_jobs']))
+        self.assertFalse(self._check(['/usr/bin/django-admin', 'shell']))
+
+    def test_runserver_warms_up_only_in_the_serving_process(self):
+        self.assertFalse(self._check(['manage.py', 'runserver']))  # process autoreloader cha
+        self.assertTrue(self._check(['manage.py', 'runserver'], run_main='true'))
+        self.assertTrue(self._check(['manage.py', 'runserver', '--noreload']))
+
+    def test_wsgi_server_warms_up(self):
+        self.assertTrue(self._check(['/venv/bin/gunicorn', 'book_web.wsgi']))
@@ -0,0 +1,112 @@
+import os
+
+from django.core.files.base import ContentFile
+from django.core.signals import request_finished
+from django.db import transaction
+
+from app.models import Blob, Book
+from app.storage import blob_storage
+from app.utils import blobs
+
+from .base import MediaTestCase
+
+PDF = b'%PDF-1.4 shared content'
+
+
+def _refcount(name):
+    return Blob.objects.get(name=name).refcount
+
+
+def _book(title, name):
+    book = Book(title=title, pdf_file=ContentFile(PDF, name=name))
+    book._media_in_job = True  # không ingest / index nền: nội dung không phải PDF thật
+    book.save()
+    return book
+
+
+
+class BlobClaimTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book = _book('Dune', 'dune.pdf')
+        self.name = self.book.pdf_file.name
+        self.assertEqual(_refcount(self.name), 1)
+
+    def test_saved_row_keeps_only_its_reference(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            _book('Dune (copy)', 'copy.pdf')
+        request_finished.send(sender=None)
+        self.assertEqual(_refcount(self.name), 2)
+
+    def test_committed_claim_without_row_is_released_at_request_end(self):
+        # storage lưu xong (commit) nhưng dòng Book không bao giờ được lưu
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(blob_storage().save('orphan.pdf', ContentFile(PDF)), self.name)
+        self.assertEqual(_refcount(self.name), 2)
+        request_finished.send(sender=None)
+        self.assertEqual(_refcount(self.name), 1)
+        self.assertEqual(blobs._claims(), [])
+
+    def test_rolled_back_claim_is_only_forgotten(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                blob_storage().save('orphan.pdf', ContentFile(PDF))
+                raise RuntimeError('row save failed')
+        self.assertEqual(_refcount(self.name), 1)
+        request_finished.send(sender=None)
+        self.assertEqual(_refcount(self.name), 1)
+        self.assertEqual(blobs._claims(), [])
+
+
+class BlobRefcountTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first = _book('Dune', 'dune.pdf')
+            self.second = _book('Dune (copy)', 'copy.pdf')
+        self.name = self.first.pdf_file.name
+        self.path = self.first.pdf_file.path
+
+    def test_identical_uploads_share_one_blob(self):
+        self.assertEqual(self.second.pdf_file.name, self.name)
+        self.assertEqual(Blob.objects.count(), 1)
+        self.assertEqual(_refcount(self.name), 2)
+
+    def test_blob_survives_until_last_reference_is_deleted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.delete()
+        self.assertEqual(_refcount(self.name), 1)
+        self.assertTrue(os.path.exists(self.path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second.delete()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(Blob.objects.filter(name=self.name).exists())
+
+    def test_replacing_file_moves_the_reference(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second.pdf_file = ContentFile(b'%PDF-1.4 other content', name='other.pdf')
+            self.second.save()
+        other = self.second.pdf_file.name
+        self.assertNotEqual(other, self.name)
+        self.assertEqual(_refcount(self.name), 1)
+        self.assertEqual(_refcount(other), 1)
+
+    def test_collect_keeps_referenced_blob_with_drifted_refcount(self):
+        Blob.objects.filter(name=self.name).update(refcount=0)  # lệch (chưa reconcile)
+        blobs.collect([self.name])
+        self.assertTrue(os.path.exists(self.path))
+
+        blobs.reconcile()
+        self.assertEqual(_refcount(self.name), 2)
+
+    def test_deferred_collection_enqueues_one_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with blobs.deferred_collection() as collection:
+                Book.objects.filter(pk__in=[self.first.pk, self.second.pk]).delete()
+        self.assertEqual(_refcount(self.name), 0)
+        self.assertTrue(os.path.exists(self.path))  # chưa xoá: chờ job collect_blobs
+        self.assertEqual(collection.job.payload, {'names': [self.name]})
@@ -0,0 +1,86 @@
+import hashlib
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from app.models import ChunkedUpload, UserBook
+from app.utils import chunked_upload
+
+from .base import MediaTestCase
+
+DATA = bytes(range(256)) * 40  # 10240 byte
+
+
+@override_settings(UPLOAD_CHUNK_SIZE=4096)
+class ChunkedUploadTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('writer', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _init(self, sha256=None):
+        response = self.client.post('/api/uploads/', {
+            'title': 'Draft', 'filename': 'draft.pdf', 'size': len(DATA),
+            'sha256': sha256 or hashlib.sha256(DATA).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['upload_id']
+
+    def _put(self, upload_id, start, end, body=None):
+        body = DATA[start:end + 1] if body is None else body
+        return self.client.put(
+            f'/api/uploads/{upload_id}/', body, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(DATA)}',
+        )
+
+    def test_resume_after_restart_and_complete(self):
+        upload_id = self._init()
+        self.assertEqual(self._put(upload_id, 0, 4095).json()['offset'], 4096)
+
+        chunked_upload._hashers.clear()  # process khác / restart: hash phải đọc lại từ file .part
+        status = self.client.get(f'/api/uploads/{upload_id}/').json()
+        self.assertEqual(status['offset'], 4096)
+
+        wrong = self._put(upload_id, 8192, 10239)
+        self.assertEqual(wrong.status_code, 409)
+        self.assertEqual(wrong.json()['offset'], 4096)
+
+        incomplete = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(incomplete.status_code, 409)
+
+        self.assertEqual(self._put(upload_id, 4096, 8191).json()['offset'], 8192)
+        self.assertEqual(self._put(upload_id, 8192, 10239).json()['offset'], len(DATA))
+
+        response = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['sha256'], hashlib.sha256(DATA).hexdigest())
+        user_book = UserBook.objects.get(pk=response.json()['book_id'])
+        self.assertFalse(user_book.is_approved)
+        with user_book.pdf_file.open('rb') as fh:
+            self.assertEqual(fh.read(), DATA)
+
+        again = self.client.post(f'/api/uploads/{upload_id}/complete/')  # idempotent
+        self.assertEqual(again.json()['book_id'], user_book.pk)
+        self.assertEqual(UserBook.objects.count(), 1)
+
+    def test_short_body_keeps_offset(self):
+        upload_id = self._init()
+        response = self._put(upload_id, 0, 4095, body=DATA[:1000])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).offset, 0)
+
+    def test_oversized_chunk_is_rejected(self):
+        upload_id = self._init()
+        self.assertEqual(self._put(upload_id, 0, 8191).status_code, 413)
+
+    def test_sha256_mismatch_is_rejected(self):
+        upload_id = self._init(sha256='0' * 64)
+        for start in range(0, len(DATA), 4096):
+            self._put(upload_id, start, min(start + 4095, len(DATA) - 1))
+        response = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()['sha256'], hashlib.sha256(DATA).hexdigest())
+        self.assertFalse(UserBook.objects.exists())
@@ -0,0 +1,53 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from app import tasks  # noqa: F401  (đăng ký handler summarize_conversation)
+from app.models import Conversation, Job
+from app.utils import conversations, jobs
+
+LONG = 'x' * 200  # ~54 token mỗi tin
+
+
+@override_settings(CHAT_CONTEXT_TOKEN_BUDGET=300, CHAT_STATE_MAX_MESSAGES=40, RAG_ENABLED=False)
+class ConversationSummaryJobTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='x')
+        self.conversation_id, _ = conversations.start(self.user, 'librarian')
+
+    def _turns(self, count):
+        for _ in range(count):
+            conversations.record_turn(self.conversation_id, LONG, LONG)
+
+    def _ask(self):
+        return conversations.open_turn(self.user, str(self.conversation_id), LONG, 'librarian')
+
+    def _summary_jobs(self):
+        return Job.objects.filter(kind='summarize_conversation')
+
+    def test_one_queued_job_per_conversation(self):
+        self._turns(4)
+        self._ask()
+        self._turns(1)
+        self._ask()
+        self.assertEqual(self._summary_jobs().count(), 1)
+        self.assertEqual(self._summary_jobs().get().dedupe_key, f'summarize_conversation:{self.conversation_id}')
+
+    def test_cut_is_read_when_the_job_runs(self):
+        self._turns(4)
+        self._ask()
+        self._turns(2)  # tin đến sau khi job được xếp
+        latest = conversations.summary_cut(self.conversation_id)
+        self.assertEqual(jobs.run_pending(['summarize_conversation']), 1)
+        conversation = Conversation.objects.get(pk=self.conversation_id)
+        self.assertEqual(conversation.summarized_until, latest)
+        self.assertTrue(conversation.summary)
+
+    def test_new_job_after_previous_one_finished(self):
+        self._turns(4)
+        self._ask()
+        jobs.run_pending(['summarize_conversation'])
+        self._turns(4)
+        self._ask()
+        self.assertEqual(self._summary_jobs().filter(status=Job.STATUS_QUEUED).count(), 1)
+        self.assertEqual(self._summary_jobs().count(), 2)
@@ -0,0 +1,45 @@
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+
+from app.utils import covers
+
+from .base import MediaTestCase
+
+try:
+    from PIL import Image
+except ImportError:  # optional dependency
+    Image = None
+
+
+def _png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'navy').save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(COVER_WIDTHS=[160, 320])
+class CoverDerivativeTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        if Image is None:
+            self.skipTest("Pillow is not installed")
+
+    def _generate(self, width, height):
+        name = default_storage.save('book_covers/cover.png', _png(width, height))
+        return covers.generate(default_storage, name)['sizes']
+
+    def test_sizes_are_keyed_by_output_width(self):
+        sizes = self._generate(400, 600)
+        self.assertEqual(sorted(sizes, key=int), ['160', '320'])
+        with default_storage.open(sizes['160']['jpeg']) as fh:
+            self.assertEqual(Image.open(fh).width, 160)
+
+    def test_image_narrower_than_smallest_width_keeps_its_width(self):
+        sizes = self._generate(100, 150)
+        self.assertEqual(list(sizes), ['100'])
+        with default_storage.open(sizes['100']['webp']) as fh:
+            self.assertEqual(Image.open(fh).size, (100, 150))
@@ -0,0 +1,114 @@
+import time
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from app.models import Job
+from app.utils import jobs
+
+calls = []
+
+
+@jobs.register('test_echo', max_attempts=2)
+def echo(job):
+    calls.append(job.pk)
+    return {'echo': job.payload.get('value')}
+
+
+@jobs.register('test_flaky', max_attempts=2)
+def flaky(job):
+    raise RuntimeError('boom')
+
+
+@override_settings(JOB_CONCURRENCY={'default': 1}, JOB_RETRY_BASE_DELAY=5, JOB_LOCK_TIMEOUT=600)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_dedupes_until_failed(self):
+        first = jobs.enqueue('test_echo', {'value': 1}, dedupe_key='echo:1')
+        self.assertEqual(jobs.enqueue('test_echo', {'value': 2}, dedupe_key='echo:1').pk, first.pk)
+        Job.objects.filter(pk=first.pk).update(status=Job.STATUS_FAILED)
+        self.assertNotEqual(jobs.enqueue('test_echo', {'value': 2}, dedupe_key='echo:1').pk, first.pk)
+
+    def test_claim_respects_per_kind_concurrency(self):
+        jobs.enqueue('test_echo')
+        jobs.enqueue('test_echo')
+        first = jobs.claim(['test_echo'])
+        self.assertEqual(first.status, Job.STATUS_RUNNING)
+        self.assertEqual(first.attempts, 1)
+        self.assertIsNone(jobs.claim(['test_echo']))  # kind đã đủ 1 job đang chạy
+
+        self.assertTrue(jobs.execute(first))
+        first.refresh_from_db()
+        self.assertEqual(first.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(first.result, {'echo': None})
+        self.assertIsNotNone(jobs.claim(['test_echo']))
+
+    def test_claim_skips_jobs_not_ready(self):
+        jobs.enqueue('test_echo', delay=60)
+        self.assertIsNone(jobs.claim(['test_echo']))
+
+    def test_failure_retries_with_backoff_then_fails(self):
+        job = jobs.enqueue('test_flaky')
+        before = timezone.now()
+        self.assertFalse(jobs.execute(jobs.claim(['test_flaky'])))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=5))
+        self.assertIn('boom', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertFalse(jobs.execute(jobs.claim(['test_flaky'])))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_requeue_stale_requeues_then_fails_after_max_attempts(self):
+        job = jobs.enqueue('test_echo')
+        stale = timezone.now() - timedelta(seconds=601)
+        claimed = jobs.claim(['test_echo'])
+        Job.objects.filter(pk=claimed.pk).update(locked_at=stale)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.STATUS_QUEUED, ''))
+
+        # lần thử cuối cũng làm chết worker -> failed, không requeue mãi
+        claimed = jobs.claim(['test_echo'])
+        self.assertEqual(claimed.attempts, 2)
+        Job.objects.filter(pk=claimed.pk).update(locked_at=stale)
+        self.assertEqual(jobs.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertIsNone(jobs.claim(['test_echo']))
+
+    def test_fresh_running_job_is_not_requeued(self):
+        jobs.enqueue('test_echo')
+        jobs.claim(['test_echo'])
+        self.assertEqual(jobs.requeue_stale(), 0)
+
+
+seen_locked_at = []
+
+
+@jobs.register('test_slow', max_attempts=1)
+def slow(job):
+    time.sleep(0.4)
+    seen_locked_at.append(Job.objects.filter(pk=job.pk).values_list('locked_at', flat=True).first())
+
+
+class JobHeartbeatTests(TransactionTestCase):
+    """TransactionTestCase: thread heartbeat dùng connection riêng, cần thấy dữ liệu đã commit."""
+
+    @override_settings(JOB_HEARTBEAT_INTERVAL=0.1)
+    def test_running_job_refreshes_locked_at(self):
+        job = jobs.enqueue('test_slow')
+        claimed = jobs.claim(['test_slow'])
+        old = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=job.pk).update(locked_at=old)
+        self.assertTrue(jobs.execute(claimed))
+        self.assertGreater(seen_locked_at[-1], old)
+        self.assertEqual(jobs.requeue_stale(), 0)
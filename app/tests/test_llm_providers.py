@@ -0,0 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase
+
+from app.utils.llm_providers import Provider
+
+
+class ProviderCounterTests(SimpleTestCase):
+
+    def test_hedge_counters_are_exact_under_concurrency(self):
+        provider = Provider({'name': 'fake', 'kind': 'fake'})
+
+        def hit(_):
+            for _ in range(1000):
+                provider.record_hedge()
+                provider.record_hedge_win()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(hit, range(8)))
+        stats = provider.stats()
+        self.assertEqual((stats['hedges'], stats['hedge_wins']), (8000, 8000))
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from app.models import UserBook
+
+
+class ModerationQueueTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.author = User.objects.create_user('writer', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _pending(self, n):
+        UserBook.objects.bulk_create([UserBook(user=self.author, title=f'Draft {i}') for i in range(n)])
+
+    def test_huge_or_infinite_hours_are_rejected_with_400(self):
+        for value in ('1e9', 'inf', 'nan', 'abc'):
+            with self.subTest(value=value):
+                response = self.client.get('/api/list-user-books/', {'older_than': value})
+                self.assertEqual(response.status_code, 400)
+                response = self.client.post('/api/reject-user-books/', {'older_than': value}, format='json')
+                self.assertEqual(response.status_code, 400)
+
+    @override_settings(JOB_BULK_MAX_IDS=3, BULK_REJECT_CHUNK_SIZE=2)
+    def test_filter_reject_is_capped_per_call(self):
+        self._pending(5)
+        response = self.client.post('/api/reject-user-books/', {'older_than': '0'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['rejected'], response.data['remaining']), (3, 2))
+        self.assertEqual(UserBook.objects.filter(is_approved=False).count(), 2)
+
+        response = self.client.post('/api/reject-user-books/', {'older_than': '0'}, format='json')
+        self.assertEqual((response.data['rejected'], response.data['remaining']), (2, 0))
+        self.assertFalse(UserBook.objects.exists())
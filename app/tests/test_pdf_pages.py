@@ -0,0 +1,29 @@
+import os
+from unittest import skipIf
+
+from app.models import Book, PdfPageIndex
+from app.utils import pdf_pages
+
+from .base import MediaTestCase, PdfWriter, pdf_file
+
+
+@skipIf(PdfWriter is None, "pypdf is not installed")
+class PdfPagesMissingFileTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.book = Book.objects.create(title='Dune', author='Frank Herbert')
+        self.book.pdf_file.save('dune.pdf', pdf_file('The spice must flow', 'Arrakis desert planet'))
+        pdf_pages.ingest(self.book)
+
+    def test_serves_page(self):
+        response = self.client.get(f'/api/books/{self.book.pk}/pages/2/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Page-Count'], '2')
+
+    def test_missing_file_with_indexed_page_count_is_404(self):
+        # page_count lấy từ PdfPageIndex nên không chạm file; etag / render thì có
+        self.assertTrue(PdfPageIndex.objects.filter(object_id=self.book.pk).exists())
+        os.remove(self.book.pdf_file.path)
+        response = self.client.get(f'/api/books/{self.book.pk}/pages/1/')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,63 @@
+from django.core.files.base import ContentFile
+
+from app.models import Book
+from app.utils import pdf_stream
+
+from .base import MediaTestCase
+
+DATA = b'%PDF-1.4\n' + bytes(range(256)) * 4
+
+
+class PdfStreamRangeTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        book = Book(title='Dune', pdf_file=ContentFile(DATA, name='dune.pdf'))
+        book._media_in_job = True  # không ingest nền: nội dung không phải PDF thật
+        book.save()
+        self.url = f'/api/books/{book.pk}/stream/?token={pdf_stream.make_token(book.pk)}'
+
+    def _get(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def _body(self, response):
+        try:
+            return b''.join(response.streaming_content)
+        finally:
+            response.close()
+
+    def test_full_file_advertises_ranges(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self._body(response), DATA)
+
+    def test_range_returns_206(self):
+        response = self._get(HTTP_RANGE='bytes=9-18')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 9-18/{len(DATA)}')
+        self.assertEqual(self._body(response), DATA[9:19])
+
+    def test_suffix_range(self):
+        response = self._get(HTTP_RANGE='bytes=-16')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._body(response), DATA[-16:])
+
+    def test_range_past_end_is_416(self):
+        response = self._get(HTTP_RANGE=f'bytes={len(DATA)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(DATA)}')
+
+    def test_stale_if_range_returns_full_file(self):
+        response = self._get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), DATA)
+
+    def test_matching_if_range_honours_range(self):
+        etag = self._get()['ETag']
+        response = self._get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_invalid_token_is_403(self):
+        response = self.client.get(self.url.split('?')[0] + '?token=bogus')
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipIf
+
+from app.models import Book, PdfPageIndex, PdfTextPage
+from app.utils import pdf_text
+
+from .base import MediaTestCase, PdfWriter, pdf_file
+
+
+@skipIf(PdfWriter is None, "pypdf is not installed")
+class PdfTextReuploadTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # thread thay cho process pool "spawn": test không phải khởi động process con
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.pool.shutdown)
+
+    def _book_with_pdf(self):
+        book = Book.objects.create(title='Dune', author='Frank Herbert')
+        book.pdf_file.save('dune.pdf', pdf_file('The spice must flow', 'Arrakis desert planet'))
+        return book
+
+    def test_search_finds_text_after_delete_and_reupload(self):
+        first = self._book_with_pdf()
+        self.assertTrue(pdf_text.index_object(first, pool=self.pool))
+        self.assertEqual([r['page'] for r in pdf_text.search(first, 'arrakis')[0]], [2])
+        blob_name = first.pdf_file.name
+
+        first.delete()
+        self.assertFalse(PdfPageIndex.objects.filter(object_id=first.pk, kind=PdfPageIndex.KIND_BOOK).exists())
+
+        second = self._book_with_pdf()
+        self.assertEqual(second.pdf_file.name, blob_name)  # cùng nội dung -> cùng blob
+        self.assertTrue(pdf_text.index_object(second, pool=self.pool))
+        results, total = pdf_text.search(second, 'spice')
+        self.assertEqual(total, 1)
+        self.assertEqual(results[0]['page'], 1)
+
+    def test_twin_without_text_is_not_copied(self):
+        book = self._book_with_pdf()
+        # dòng mồ côi (vd còn lại từ trước bản sửa): có text_file_name nhưng không có trang
+        PdfPageIndex.objects.create(
+            kind=PdfPageIndex.KIND_USER_BOOK, object_id=999, file_name='',
+            text_file_name=book.pdf_file.name, page_count=2,
+        )
+        self.assertFalse(pdf_text.copy_from_twin(PdfPageIndex.KIND_BOOK, book.pk, book.pdf_file.name))
+        self.assertTrue(pdf_text.index_object(book, pool=self.pool))
+        self.assertEqual(PdfTextPage.objects.filter(kind=PdfPageIndex.KIND_BOOK, object_id=book.pk).count(), 2)
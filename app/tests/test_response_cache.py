@@ -0,0 +1,100 @@
+from django.contrib.auth.models import User
+
+from app.models import Book, Review
+from app.utils import response_cache
+
+from .base import MediaTestCase
+
+
+class AuthorListCacheTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('reader', password='x')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dune = Book.objects.create(title='Dune', author='Frank Herbert')
+            self.potter = Book.objects.create(title='Philosopher Stone', author='J. K. Rowling')
+
+    def _titles(self, author):
+        response = self.client.get(f'/api/books/author/{author}/')
+        self.assertEqual(response.status_code, 200)
+        return sorted(item['title'] for item in response.json())
+
+    def _hits(self):
+        return response_cache.stats()['hits']
+
+    def test_review_of_other_author_keeps_entry(self):
+        self._titles('Herbert')
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(book=self.potter, user=self.user, rating=5)
+        hits = self._hits()
+        self._titles('Herbert')
+        self.assertEqual(self._hits(), hits + 1)
+
+    def test_review_of_listed_book_evicts_entry(self):
+        self._titles('Herbert')
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(book=self.dune, user=self.user, rating=4)
+        hits = self._hits()
+        self._titles('Herbert')
+        self.assertEqual(self._hits(), hits)
+
+    def test_new_book_evicts_full_name_and_prefix_lists(self):
+        self.assertEqual(self._titles('Frank Herbert'), ['Dune'])
+        self.assertEqual(self._titles('herb'), ['Dune'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='Dune Messiah', author='Frank Herbert')
+        self.assertEqual(self._titles('Frank Herbert'), ['Dune', 'Dune Messiah'])
+        self.assertEqual(self._titles('herb'), ['Dune', 'Dune Messiah'])
+
+    def test_author_change_evicts_old_and_new_author(self):
+        self.assertEqual(self._titles('Rowling'), ['Philosopher Stone'])
+        self.assertEqual(self._titles('Herbert'), ['Dune'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.potter.author = 'Frank Herbert'
+            self.potter.save()
+        self.assertEqual(self._titles('Rowling'), [])
+        self.assertEqual(self._titles('Herbert'), ['Dune', 'Philosopher Stone'])
+
+
+class ResponseCacheTagTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book = Book.objects.create(title='Dune', author='Frank Herbert')
+        self.url = f'/api/books/{self.book.pk}/'
+
+    def _stats(self):
+        return response_cache.stats()
+
+    def test_repeat_request_is_a_hit(self):
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(self._stats()['hits'], 1)
+
+    def test_conditional_request_gets_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalidating_the_tag_evicts_the_entry(self):
+        self.client.get(self.url)
+        response_cache.invalidate(response_cache.book_tag(self.book.pk))
+        self.client.get(self.url)
+        stats = self._stats()
+        self.assertEqual((stats['hits'], stats['evictions']), (0, 1))
+
+    def test_other_tags_leave_the_entry(self):
+        self.client.get(self.url)
+        response_cache.invalidate(response_cache.book_tag(self.book.pk + 1), 'author:someone')
+        self.client.get(self.url)
+        self.assertEqual(self._stats()['hits'], 1)
+
+    def test_save_serves_fresh_data(self):
+        self.assertEqual(self.client.get(self.url).json()['title'], 'Dune')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.title = 'Dune (1965)'
+            self.book.save()
+        self.assertEqual(self.client.get(self.url).json()['title'], 'Dune (1965)')
@@ -0,0 +1,54 @@
+from django.db import transaction
+
+from app.models import Book, SearchDocument, SearchTerm
+from app.utils import search_index
+
+from .base import MediaTestCase
+
+
+class SearchIndexTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dune = Book.objects.create(title='Dune', author='Frank Herbert')
+            self.messiah = Book.objects.create(title='Dune Messiah', author='Frank Herbert')
+
+    def _found(self, query):
+        hits, _ = search_index.search(query)
+        return {object_id for _, object_id, _ in hits}
+
+    def test_delete_is_applied_on_commit(self):
+        messiah_id = self.messiah.pk
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.messiah.delete()
+        # chưa commit: index vẫn giữ tài liệu (delete còn có thể rollback)
+        self.assertEqual(self._found('messiah'), {messiah_id})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._found('messiah'), set())
+        self.assertEqual(SearchTerm.objects.get(term='dune').df, 1)
+
+    def test_rolled_back_delete_keeps_document(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Book.objects.filter(pk=self.messiah.pk).get().delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self._found('messiah'), {self.messiah.pk})
+
+    def test_rebuild_in_batches_fixes_drift(self):
+        # index lệch: df sai, tài liệu mồ côi, sách chưa được index
+        SearchTerm.objects.filter(term='dune').update(df=7)
+        SearchDocument.objects.create(kind=SearchDocument.KIND_BOOK, object_id=999, length=1)
+        Book.objects.bulk_create([Book(title='Children of Dune', author='Frank Herbert')])
+
+        total = search_index.rebuild(batch_size=1)
+
+        self.assertEqual(total, 3)
+        self.assertFalse(SearchDocument.objects.filter(object_id=999).exists())
+        self.assertEqual(SearchTerm.objects.get(term='dune').df, 3)
+        self.assertEqual(SearchTerm.objects.get(term='children').df, 1)
+        self.assertEqual(len(self._found('dune')), 3)
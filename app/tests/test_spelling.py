@@ -0,0 +1,17 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from app.utils import spelling
+
+
+class SpellingReloadTests(SimpleTestCase):
+
+    def test_failed_background_reload_is_logged_and_released(self):
+        spelling._reloading = True
+        with mock.patch.object(spelling, '_build', side_effect=RuntimeError('db down')), \
+                mock.patch.object(spelling, 'close_old_connections') as close, \
+                self.assertLogs('app.utils.spelling', level='ERROR'):
+            spelling._reload()
+        self.assertFalse(spelling._reloading)
+        close.assert_called_once_with()
@@ -0,0 +1,56 @@
+"""
+Giới hạn tần suất gọi chatbot theo user: token bucket lưu trong cache Django
+(Redis khi có REDIS_URL -> mọi worker dùng chung một bucket).
+
+Bucket đầy LLM_THROTTLE_BURST token, nạp lại theo LLM_THROTTLE_RATE
+("20/min", cú pháp như DRF); mỗi request tốn một token. Hết token -> 429 với
+Retry-After = thời gian tới khi có token kế tiếp. LLM_THROTTLE_RATE = None để tắt.
+
+Đọc / ghi bucket không atomic (giống SimpleRateThrottle của DRF): vài request
+đồng thời của cùng một user có thể lọt thêm, không ảnh hưởng mục đích chặn spam.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'20/min' -> token mỗi giây; None nếu tắt."""
+    if not rate:
+        return None
+    num, period = rate.split('/')
+    return int(num) / PERIODS[period[0]]
+
+
+class LLMUserThrottle(BaseThrottle):
+    cache = cache
+    cache_prefix = 'llmthrottle'
+
+    def get_ident_key(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'{self.cache_prefix}:user:{user.pk}'
+        return f'{self.cache_prefix}:ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        self.refill = parse_rate(getattr(settings, 'LLM_THROTTLE_RATE', '20/min'))
+        if self.refill is None:
+            return True
+        burst = getattr(settings, 'LLM_THROTTLE_BURST', 5)
+        key = self.get_ident_key(request)
+        now = time.time()
+        tokens, stamp = self.cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - stamp) * self.refill)
+        self.tokens = tokens
+        if tokens < 1:
+            return False
+        # hết hạn khi bucket đã nạp đầy trở lại -> không giữ key của user không hoạt động
+        self.cache.set(key, (tokens - 1, now), timeout=int(burst / self.refill) + 1)
+        return True
+
+    def wait(self):
+        return (1 - self.tokens) / self.refill
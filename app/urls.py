@@ -1,7 +1,8 @@
 # app/urls.py
 from django.urls import path
 from . import views
-from .chatbot_view import ChatbotAPIView, chatbot_conversation, multi_turn_chat
+from .chatbot_view import ChatbotAPIView, chatbot_conversation, multi_turn_chat, list_conversations, conversation_detail
+from . import chatbot_async
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -16,8 +17,13 @@ urlpatterns = [
     # ===== Book APIs (khớp views hiện tại) =====
     path('api/search-books/', views.search_books, name='search-books'),
     path('api/books/', views.all_books, name='all_books'),
+    path('api/books/suggest/', views.suggest_books, name='suggest_books'),
     path('api/books/<int:book_id>/', views.book_detail_view, name='book_detail_view'),
     path('api/books/<int:book_id>/content/', views.book_content_by_id, name='book_content_by_id'),
+    path('api/books/<int:book_id>/stream/', views.book_pdf_stream, name='book_pdf_stream'),
+    path('api/books/<int:book_id>/search/', views.book_text_search, name='book_text_search'),
+    path('api/books/<int:book_id>/pages/<int:start>/', views.book_pdf_pages, name='book_pdf_pages'),
+    path('api/user-books/<int:user_book_id>/pages/<int:start>/', views.user_book_pdf_pages, name='user_book_pdf_pages'),
     path('api/books/author/<str:author_name>/', views.books_by_author, name='books_by_author'),
 
     # ===== Reviews =====
@@ -28,6 +34,12 @@ urlpatterns = [
     path('api/chatbot/', ChatbotAPIView.as_view(), name='chatbot'),
     path('api/chatbot/conversation/', chatbot_conversation, name='chatbot_conversation'),
     path('api/chatbot/multi-turn/', multi_turn_chat, name='multi_turn_chat'),
+    path('api/chatbot/conversations/', list_conversations, name='list_conversations'),
+    path('api/chatbot/conversations/<uuid:conversation_id>/', conversation_detail, name='conversation_detail'),
+    # async (ASGI) - cùng request/response, app/chatbot_async.py
+    path('api/async/chatbot/', chatbot_async.chatbot_async, name='chatbot_async'),
+    path('api/async/chatbot/conversation/', chatbot_async.chatbot_conversation_async, name='chatbot_conversation_async'),
+    path('api/async/chatbot/multi-turn/', chatbot_async.multi_turn_chat_async, name='multi_turn_chat_async'),
 
     # ===== User profile =====
     path('user/profile/<int:user_id>/', views.get_user_profile, name='get-user-profile'),
@@ -53,6 +65,9 @@ urlpatterns = [
     # ===== Admin lists + CRUD users =====
     path('api/admin/users/', views.list_users, name='list_users'),
     path('api/admin/books/', views.list_books, name='list_books'),
+    path('api/admin/render-stats/', views.render_stats_view, name='render_stats'),
+    path('api/admin/cache-stats/', views.response_cache_stats, name='response_cache_stats'),
+    path('api/admin/llm-cache-stats/', views.llm_cache_stats, name='llm_cache_stats'),
     path('api/admin/users/create/', views.create_user, name='create_user'),
     path('api/admin/users/<int:user_id>/update/', views.update_user, name='update_user'),
     path('api/admin/users/<int:user_id>/delete/', views.delete_user, name='delete_user'),
@@ -63,9 +78,16 @@ urlpatterns = [
 
     # ===== UserBook moderation =====
     path('api/create-user-book/', views.CreateUserBookView.as_view(), name='create_user_book'),
+    path('api/uploads/', views.ChunkedUploadInitView.as_view(), name='chunked_upload_init'),
+    path('api/uploads/<uuid:upload_id>/', views.ChunkedUploadView.as_view(), name='chunked_upload'),
+    path('api/uploads/<uuid:upload_id>/complete/', views.ChunkedUploadCompleteView.as_view(), name='chunked_upload_complete'),
     path('api/list-user-books/', views.ListUserBooksView.as_view(), name='list_user_books'),
     path('api/approve-user-book/<int:user_book_id>/', views.ApproveUserBookView.as_view(), name='approve-user-book'),
+    path('api/approve-user-books/', views.BulkApproveUserBooksView.as_view(), name='bulk-approve-user-books'),
+    path('api/jobs/', views.job_status_many, name='job_status_many'),
+    path('api/jobs/<int:job_id>/', views.job_status, name='job_status'),
     path('api/reject-delete-book/<int:book_id>/', views.RejectAndDeleteBookView.as_view(), name='reject-delete-book'),
+    path('api/reject-user-books/', views.BulkRejectUserBooksView.as_view(), name='bulk-reject-user-books'),
     path('api/list-approved-books/', views.ListApprovedBooksView.as_view(), name='list-approved-books'),
 
     # NOTE: Endpoint import Gutenberg theo genre cũ. View đã remove trong views.py mới.
@@ -1,43 +1,64 @@
-from openai import OpenAI
-import os
-
-# Try to load .env file if python-dotenv is available
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass
-
-# Get API key from environment
-api_key = os.getenv("GROQ_API_KEY")
-if not api_key:
-    print("[❌] Warning: GROQ_API_KEY not found in environment variables")
-    api_key = "dummy_key"  # Prevent OpenAI client from failing
-
-client = OpenAI(
-    api_key=api_key,
-    base_url="https://api.groq.com/openai/v1"
-)
+import logging
+
+from django.conf import settings
+
+from . import llm_cache, llm_providers
+
+logger = logging.getLogger(__name__)
+
+# model logic; mỗi provider có thể đổi tên qua 'models' (settings.LLM_PROVIDERS)
+MODEL = getattr(settings, 'LLM_DEFAULT_MODEL', "llama-3.1-8b-instant")
+SYSTEM_PROMPT = "You are a helpful book advisor who recommends books based on the user's interests, like a personal reading consultant."
+
+if not llm_providers.is_configured():
+    print("[❌] Warning: no LLM provider configured (GROQ_API_KEY not found in environment variables)")
+
+
+def is_configured():
+    return llm_providers.is_configured()
+
+
+def role_system_prompt(role):
+    return f"You are a {role}. Be helpful and professional in your responses."
+
+
+def catalog_context(user_input):
+    """
+    System message liệt kê sách trong catalog gần với câu hỏi nhất (RAG,
+    app/utils/vector_index.py); None nếu index chưa có / không có kết quả.
+    """
+    from . import vector_index
+    try:
+        hits = vector_index.retrieve([user_input])[0]
+    except Exception:
+        logger.exception("Vector index query failed")
+        return None
+    if not hits:
+        return None
+    lines = [f"- {b['title']}" + (f" by {b['author']}" if b['author'] else '') for b in hits]
+    return {"role": "system", "content": (
+        "Books available in our catalog that may match the request:\n" + '\n'.join(lines) +
+        "\nPrefer recommending books from this list; if none fit, say that the catalog has no match "
+        "before suggesting other titles."
+    )}
+
+
+def default_messages(user_input):
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    context = catalog_context(user_input)
+    if context:
+        messages.append(context)
+    messages.append({"role": "user", "content": user_input})
+    return messages
+
 
 def ask_mistral(user_input):
-    if not api_key or api_key == "dummy_key":
+    if not is_configured():
         print("[❌] GROQ_API_KEY not configured properly")
         return "Sorry, the AI service is not configured. Please set your GROQ_API_KEY environment variable."
-    
-    try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            # model="mistral-7b-instruct-v0.1",  # Uncomment if you want to use the smaller model
-            messages=[
-                {"role": "system", "content": "You are a helpful book advisor who recommends books based on the user's interests, like a personal reading consultant."},
-                {"role": "user", "content": user_input}
-            ],
-            temperature=0.7,
-            max_tokens=2048
-        )
-        reply = response.choices[0].message.content
-        print("[✔] Phản hồi từ Groq:", reply)
-        return reply
-    except Exception as e:
-        print("[❌] Lỗi gọi Groq API:", str(e))
-        return "Sorry, I could not respond at the moment."
+
+    messages = default_messages(user_input)
+
+    # câu hỏi gần như trùng nhau ("recommend a fantasy book") dùng lại câu trả lời đã cache;
+    # mọi provider lỗi -> llm_providers.LLMUnavailable (503)
+    return llm_cache.get_or_call(MODEL, messages, lambda: llm_providers.complete(MODEL, messages))
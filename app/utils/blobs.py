@@ -0,0 +1,308 @@
+"""
+Refcount cho blob của ContentAddressedStorage (app/storage.py).
+
+Mỗi field file của Book/UserBook trỏ tới một blob là một tham chiếu. Signal
+gọi acquire()/release() trong cùng transaction với thay đổi của dòng; blob về
+0 được xoá sau commit (kiểm tra lại refcount dưới select_for_update để không
+xoá nhầm blob vừa được tham chiếu lại), cùng các derivative ảnh bìa của nó.
+File cũ chưa nằm trong blobs/ không có dòng Blob -> đếm tham chiếu trực tiếp
+trên Book/UserBook.
+
+Storage trả về một blob có sẵn (dedup) khi dòng Book/UserBook chưa được lưu
+-> blob có thể đang ở refcount 0 và chờ collect. claim() giữ thêm một tham
+chiếu ngay dưới row lock của storage; post_save (sync) trả lại phần giữ đó sau
+khi commit, lúc tham chiếu thật của dòng đã được tính. Lưu dòng thất bại thì
+không có post_save: cuối request release_claims() trả những phần giữ còn sót
+(chỉ những phần đã commit -- rollback đã tự huỷ +1 của nó).
+"""
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from app.models import Blob, Book, UserBook
+from . import covers, response_cache
+
+FILE_FIELDS = ('pdf_file', 'cover_image')
+MODELS = (Book, UserBook)
+
+
+def file_names(obj):
+    return [getattr(obj, f).name for f in FILE_FIELDS if getattr(obj, f)]
+
+
+def previous_file_names(obj):
+    if not obj.pk:
+        return []
+    row = type(obj).objects.filter(pk=obj.pk).values_list(*FILE_FIELDS).first()
+    return [name for name in (row or ()) if name]
+
+
+def _count_field_references(name):
+    return sum(model.objects.filter(Q(pdf_file=name) | Q(cover_image=name)).count() for model in MODELS)
+
+
+def reference_count(name):
+    refcount = Blob.objects.filter(name=name).values_list('refcount', flat=True).first()
+    if refcount is not None:
+        return refcount
+    return _count_field_references(name)
+
+
+def acquire(names):
+    for name in names:
+        Blob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+_deferred = threading.local()
+
+
+class _Claim:
+    __slots__ = ('name', 'committed')
+
+    def __init__(self, name):
+        self.name = name
+        self.committed = False
+
+
+def _claims():
+    if not hasattr(_deferred, 'claims'):
+        _deferred.claims = []
+    return _deferred.claims
+
+
+def claim(blob):
+    """Gọi trong storage._save khi đang giữ select_for_update trên dòng Blob."""
+    Blob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+    entry = _Claim(blob.name)
+    _claims().append(entry)
+    transaction.on_commit(lambda: setattr(entry, 'committed', True))
+
+
+def _drop_claims(names):
+    """Trả phần giữ của claim() sau commit (tham chiếu thật đã được acquire)."""
+    claims = _claims()
+    dropped = []
+    for name in names:
+        entry = next((c for c in claims if c.name == name), None)
+        if entry is not None:
+            claims.remove(entry)
+            dropped.append(name)
+    if dropped:
+        transaction.on_commit(
+            lambda: [Blob.objects.filter(name=n, refcount__gt=0).update(refcount=F('refcount') - 1) for n in dropped]
+        )
+
+
+def release_claims():
+    """
+    Cuối request (signal request_finished): trả phần giữ của các claim() không
+    có post_save đi kèm (lưu dòng lỗi). Claim chưa commit nghĩa là transaction
+    của nó đã rollback -> +1 đã mất cùng, chỉ cần bỏ khỏi danh sách.
+    """
+    claims = _claims()
+    leftover = [c.name for c in claims if c.committed]
+    claims.clear()
+    if leftover:
+        release(leftover)
+
+
+class _DeferredCollection:
+    job = None
+
+
+@contextmanager
+def deferred_collection(user=None):
+    """
+    Trong khối này release() chỉ giảm refcount; file về 0 được gom lại và xoá
+    bởi một job 'collect_blobs' (app/tasks.py) thay vì ngay sau commit. Job
+    được tạo trong transaction hiện tại (nếu có) nên rollback thì mất cùng.
+    Job (nếu có) nằm ở `.job` của object được yield.
+    """
+    from . import jobs
+
+    pending = _deferred.names = []
+    context = _DeferredCollection()
+    try:
+        yield context
+    finally:
+        _deferred.names = None
+        names = list(dict.fromkeys(pending))
+        if names:  # kể cả khi lỗi giữa chừng: các lô đã commit vẫn cần dọn
+            context.job = jobs.enqueue('collect_blobs', {'names': names}, user=user)
+
+
+def release(names):
+    names = [n for n in names if n]
+    for name in names:
+        Blob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+    if not names:
+        return
+    pending = getattr(_deferred, 'names', None)
+    if pending is not None:
+        pending.extend(names)  # collect() kiểm tra lại refcount nên gom thừa cũng an toàn
+    else:
+        transaction.on_commit(lambda: collect(names))
+
+
+def collect(names):
+    """Xoá file + dòng Blob của những blob không còn tham chiếu."""
+    from app.storage import blob_storage
+    storage = blob_storage()
+    for name in names:
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.refcount > 0:
+                continue
+            if _count_field_references(name):
+                continue  # refcount lệch (chưa reconcile) nhưng vẫn còn dòng trỏ tới
+            storage.delete(name)
+            covers.delete_derivatives(name)
+
+
+def forget(name):
+    Blob.objects.filter(name=name, refcount__lte=0).delete()
+
+
+def sync(old_names, new_names):
+    """Điều chỉnh refcount khi một dòng đổi file (tính theo multiset)."""
+    remaining = list(old_names)
+    added = []
+    for name in new_names:
+        if name in remaining:
+            remaining.remove(name)
+        else:
+            added.append(name)
+    acquire(added)
+    _drop_claims(added)
+    release(remaining)
+
+
+def reconcile(stdout=None):
+    """Tính lại refcount của mọi Blob từ Book/UserBook."""
+    counts = {}
+    for model in MODELS:
+        for row in model.objects.values_list(*FILE_FIELDS).iterator():
+            for name in row:
+                if name:
+                    counts[name] = counts.get(name, 0) + 1
+    fixed = 0
+    for blob in Blob.objects.all().iterator():
+        expected = counts.get(blob.name, 0)
+        if blob.refcount != expected:
+            Blob.objects.filter(pk=blob.pk).update(refcount=expected)
+            fixed += 1
+    if stdout:
+        stdout.write(f"  {fixed} blobs fixed")
+    return fixed
+
+
+# ----------------------------------------------------------------------------
+# Chuyển file sang layout blob hiện tại (manage.py migrate_media_layout)
+# ----------------------------------------------------------------------------
+def _link_or_copy(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        return
+    try:
+        os.link(src, dst)  # cùng filesystem: không tốn thêm dung lượng
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _repoint(old_name, new_name):
+    """Đổi mọi tham chiếu old_name -> new_name (update có điều kiện); trả số field đã đổi."""
+    from app.models import PdfPageIndex
+
+    moved = 0
+    for model in MODELS:
+        for field in FILE_FIELDS:
+            if model is Book:
+                book_ids = list(model.objects.filter(**{field: old_name}).values_list('pk', flat=True))
+                if book_ids:
+                    tags = [response_cache.book_tag(pk) for pk in book_ids]
+                    transaction.on_commit(lambda tags=tags: response_cache.invalidate(*tags))
+            moved += model.objects.filter(**{field: old_name}).update(**{field: new_name})
+        # derivative vẫn dùng được: chỉ đổi "source" để covers.is_stale() không tạo lại
+        for pk, derivatives in model.objects.filter(cover_image=new_name).values_list('pk', 'cover_derivatives'):
+            if (derivatives or {}).get('source') == old_name:
+                model.objects.filter(pk=pk, cover_image=new_name).update(
+                    cover_derivatives={**derivatives, 'source': new_name}
+                )
+    PdfPageIndex.objects.filter(file_name=old_name).update(file_name=new_name)
+    return moved
+
+
+def relocate(old_name):
+    """
+    Đưa file `old_name` (upload_to cũ hoặc blob layout cũ) về blob_name().
+    File mới được tạo (hard link) trước, rồi các dòng đang trỏ tới old_name
+    được đổi bằng update có điều kiện (compare-and-swap) trong một transaction,
+    file cũ chỉ bị xoá sau commit khi không còn ai tham chiếu. Site vẫn chạy
+    bình thường trong lúc migrate; chạy lại là an toàn.
+
+    Trả tên mới, hoặc None nếu file không tồn tại.
+    """
+    from app.storage import blob_name, blob_storage, hash_file
+
+    storage = blob_storage()
+    old_path = storage.path(old_name)
+    if not os.path.exists(old_path):
+        return None
+    digest = hash_file(old_path)
+    ext = os.path.splitext(old_name)[1].lower()[:16]
+
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(sha256=digest).first()
+        new_name = blob_name(digest, os.path.splitext(blob.name)[1] if blob else ext)
+        _link_or_copy(old_path, storage.path(new_name))
+
+        sources = [old_name]
+        if blob is not None and blob.name not in (old_name, new_name):
+            sources.append(blob.name)  # blob cùng nội dung ở layout cũ -> gộp luôn
+        added = 0
+        for source in sources:
+            moved = _repoint(source, new_name)
+            if blob is None or source != blob.name:
+                added += moved  # tham chiếu của blob.name đã nằm trong refcount
+
+        if blob is None:
+            Blob.objects.create(sha256=digest, name=new_name, size=os.path.getsize(old_path), refcount=added)
+        else:
+            Blob.objects.filter(pk=blob.pk).update(name=new_name, refcount=F('refcount') + added)
+
+    for source in sources:
+        if source != new_name:
+            transaction.on_commit(lambda source=source: _remove_if_unreferenced(storage, source))
+    return new_name
+
+
+def _remove_if_unreferenced(storage, name):
+    if not Blob.objects.filter(name=name).exists() and not _count_field_references(name):
+        try:
+            os.remove(storage.path(name))
+        except FileNotFoundError:
+            pass
+
+
+def pending_names(batch_size, after=None):
+    """Tối đa batch_size tên file chưa theo layout hiện tại, sắp theo tên (> after)."""
+    from app.storage import is_sharded
+
+    names = set()
+    for model in MODELS:
+        for field in FILE_FIELDS:
+            qs = model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            if after is not None:
+                qs = qs.filter(**{f'{field}__gt': after})
+            found = 0
+            for name in qs.order_by(field).values_list(field, flat=True).distinct().iterator():
+                if not is_sharded(name):
+                    names.add(name)
+                    found += 1
+                    if found >= batch_size:
+                        break
+    return sorted(names)[:batch_size]
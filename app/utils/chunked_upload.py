@@ -0,0 +1,267 @@
+"""
+Resumable chunked uploads (init -> PUT chunk -> complete).
+
+Mỗi chunk được đọc từ request stream theo block COPY_BLOCK_SIZE vào một file
+tạm riêng của request (không mở transaction / giữ row lock trong lúc chờ
+client), rồi trong một transaction ngắn: kiểm tra lại offset, nối vào file .part
+và cập nhật sha256 tăng dần -> RAM mỗi upload bị chặn bởi block size. Chunk phải
+nối tiếp (`start == offset`, hoặc 0 để gửi lại từ đầu); client mất kết nối chỉ
+cần GET status rồi gửi tiếp từ offset. Khi complete, file .part được rename
+(không đọc lại) vào storage qua temporary_file_path() giống TemporaryUploadedFile.
+
+Dedup chỉ xảy ra lúc complete, theo sha256 server tự tính từ byte đã nhận
+(storage trỏ vào Blob có sẵn). sha256 client gửi lúc init chỉ dùng để kiểm tra
+toàn vẹn -> không dò được hash nào đã có, không nhận blob mà không gửi byte.
+
+Trạng thái hash sống trong process; nếu request rơi vào worker khác (hoặc
+worker restart) thì hash được dựng lại bằng cách đọc stream phần đã có.
+"""
+import glob
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from app.models import ChunkedUpload, UserBook
+
+COPY_BLOCK_SIZE = 64 * 1024
+HASHER_CACHE_SIZE = 64
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def chunk_size():
+    return getattr(settings, 'UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+
+
+def max_size():
+    return getattr(settings, 'UPLOAD_MAX_SIZE', 200 * 1024 * 1024)
+
+
+def _upload_dir():
+    path = getattr(settings, 'UPLOAD_TEMP_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'uploads_tmp')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def part_path(upload):
+    return os.path.join(_upload_dir(), f'{upload.pk}.part')
+
+
+# ----------------------------------------------------------------------------
+# Hash state (theo process)
+# ----------------------------------------------------------------------------
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+def _part_lost():
+    return UploadError("Partial file is missing; resend the upload from the start.", status=409, offset=0)
+
+
+def _hasher_for(upload):
+    """sha256 đã cập nhật tới upload.offset."""
+    with _hashers_lock:
+        entry = _hashers.pop(upload.pk, None)
+    if entry is not None and entry[0] == upload.offset:
+        return entry[1]
+    hasher = hashlib.sha256()
+    remaining = upload.offset
+    if remaining:
+        if not os.path.exists(part_path(upload)):
+            raise _part_lost()
+        with open(part_path(upload), 'rb') as fh:
+            while remaining:
+                block = fh.read(min(COPY_BLOCK_SIZE, remaining))
+                if not block:
+                    raise _part_lost()
+                hasher.update(block)
+                remaining -= len(block)
+    return hasher
+
+
+def _remember_hasher(upload, hasher):
+    with _hashers_lock:
+        _hashers[upload.pk] = (upload.offset, hasher)
+        while len(_hashers) > HASHER_CACHE_SIZE:
+            _hashers.popitem(last=False)
+
+
+# ----------------------------------------------------------------------------
+# Protocol
+# ----------------------------------------------------------------------------
+def parse_content_range(header):
+    """'bytes 0-1048575/5242880' -> (start, end, total)."""
+    try:
+        unit, _, spec = (header or '').partition(' ')
+        span, _, total = spec.partition('/')
+        start, _, end = span.partition('-')
+        if unit != 'bytes':
+            raise ValueError
+        start, end, total = int(start), int(end), int(total)
+    except ValueError:
+        raise UploadError("Content-Range header 'bytes <start>-<end>/<total>' is required.")
+    if start < 0 or end < start:
+        raise UploadError("Invalid Content-Range.")
+    return start, end, total
+
+
+def create(user, filename, total_size, title, description=None, expected_sha256=''):
+    if total_size <= 0:
+        raise UploadError("size must be a positive integer.")
+    if total_size > max_size():
+        raise UploadError("File is too large.", status=413, max_size=max_size())
+    expected_sha256 = (expected_sha256 or '').lower()
+    upload = ChunkedUpload.objects.create(
+        user=user, filename=os.path.basename(filename)[:255], total_size=total_size,
+        title=title, description=description, expected_sha256=expected_sha256,
+    )
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def _check_chunk(upload, start, end, total):
+    if upload is None:
+        raise UploadError("Upload not found.", status=404)
+    if upload.status != ChunkedUpload.STATUS_UPLOADING:
+        raise UploadError("Upload is already complete.", status=409, offset=upload.offset)
+    if total != upload.total_size or end >= upload.total_size:
+        raise UploadError("Content-Range does not match the upload size.")
+    if start not in (upload.offset, 0):
+        raise UploadError("Chunk does not start at the current offset.", status=409, offset=upload.offset)
+
+
+def write_chunk(upload_id, user, stream, content_range):
+    """Ghi một chunk; trả upload đã cập nhật offset."""
+    start, end, total = parse_content_range(content_range)
+    length = end - start + 1
+    if length > chunk_size():
+        raise UploadError("Chunk is too large.", status=413, chunk_size=chunk_size())
+    _check_chunk(ChunkedUpload.objects.filter(pk=upload_id, user=user).first(), start, end, total)
+
+    # đọc từ client (có thể chậm) vào file tạm riêng, không giữ transaction / row lock
+    chunk_path = os.path.join(_upload_dir(), f'{upload_id}.{uuid.uuid4().hex}.chunk')
+    try:
+        remaining = length
+        with open(chunk_path, 'wb') as fh:
+            while remaining:
+                block = stream.read(min(COPY_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                fh.write(block)
+                remaining -= len(block)
+        if remaining:
+            # client ngắt giữa chừng: offset giữ nguyên, lần sau gửi lại từ start
+            raise UploadError("Request body is shorter than Content-Range.")
+
+        with transaction.atomic():
+            # khoá dòng chỉ trong lúc nối file cục bộ: request trùng chunk thì request sau nhận 409
+            upload = ChunkedUpload.objects.select_for_update().filter(pk=upload_id, user=user).first()
+            _check_chunk(upload, start, end, total)
+            hasher = hashlib.sha256() if start == 0 else _hasher_for(upload)
+            with open(part_path(upload), 'r+b' if start else 'wb') as out, open(chunk_path, 'rb') as fh:
+                out.seek(start)
+                out.truncate()  # bỏ phần thừa của một lần ghi dở trước đó
+                while True:
+                    block = fh.read(COPY_BLOCK_SIZE)
+                    if not block:
+                        break
+                    out.write(block)
+                    hasher.update(block)
+            upload.offset = end + 1
+            upload.save(update_fields=['offset', 'updated_at'])
+    finally:
+        try:
+            os.remove(chunk_path)
+        except FileNotFoundError:
+            pass
+    _remember_hasher(upload, hasher)
+    return upload
+
+
+class _PartFile(File):
+    """Storage sẽ rename file này (dedup nếu blob đã có) thay vì copy từng chunk."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def complete(upload_id, user, cover_image=None):
+    """Ghép xong upload -> tạo UserBook (chờ duyệt). Trả (upload, user_book)."""
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().filter(pk=upload_id, user=user).first()
+        if upload is None:
+            raise UploadError("Upload not found.", status=404)
+        if upload.status == ChunkedUpload.STATUS_COMPLETE:
+            return upload, upload.user_book
+        if upload.offset != upload.total_size:
+            raise UploadError("Upload is incomplete.", status=409, offset=upload.offset)
+
+        author_name = f"{user.first_name} {user.last_name}".strip() or user.username
+        user_book = UserBook(
+            user=user, title=upload.title, author=author_name,
+            description=upload.description, cover_image=cover_image, is_approved=False,
+        )
+        digest = _hasher_for(upload).hexdigest()
+        if upload.expected_sha256 and upload.expected_sha256 != digest:
+            raise UploadError("sha256 mismatch.", status=422, sha256=digest)
+        path = part_path(upload)
+        if not os.path.exists(path):
+            raise _part_lost()
+        with open(path, 'rb') as fh:
+            part = _PartFile(fh, name=fh.name)
+            part.sha256 = digest  # storage dùng luôn (dedup nếu blob đã có), không hash lại
+            user_book.pdf_file.save(upload.filename, part, save=False)
+        user_book.save()
+
+        upload.sha256 = digest
+        upload.status = ChunkedUpload.STATUS_COMPLETE
+        upload.user_book = user_book
+        upload.save(update_fields=['sha256', 'status', 'user_book', 'updated_at'])
+    with _hashers_lock:
+        _hashers.pop(upload.pk, None)
+    return upload, user_book
+
+
+def status_payload(upload):
+    return {
+        'upload_id': str(upload.pk),
+        'filename': upload.filename,
+        'size': upload.total_size,
+        'offset': upload.offset,
+        'chunk_size': chunk_size(),
+        'status': upload.status,
+        'sha256': upload.sha256 or None,
+        'book_id': upload.user_book_id,
+    }
+
+
+def purge_expired(stdout=None):
+    """Xoá upload dở dang quá UPLOAD_EXPIRY_HOURS (cả file .part)."""
+    hours = getattr(settings, 'UPLOAD_EXPIRY_HOURS', 24)
+    cutoff = timezone.now() - timedelta(hours=hours)
+    stale = ChunkedUpload.objects.filter(status=ChunkedUpload.STATUS_UPLOADING, updated_at__lt=cutoff)
+    removed = 0
+    for upload in stale.iterator():
+        for path in [part_path(upload), *glob.glob(os.path.join(_upload_dir(), f'{upload.pk}.*.chunk'))]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        upload.delete()
+        removed += 1
+    if stdout:
+        stdout.write(f"  removed {removed} expired uploads")
+    return removed
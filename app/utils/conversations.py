@@ -0,0 +1,316 @@
+"""
+Lưu hội thoại chatbot phía server + dựng context theo token budget.
+
+- Conversation có id thật (UUID); client chỉ gửi conversation_id + câu mới,
+  không gửi lại history.
+- State gần đây (role, summary, tối đa CHAT_STATE_MAX_MESSAGES tin chưa tóm tắt)
+  nằm trong cache Django và được ghi lại mỗi lượt (write-through) -> một lượt
+  chỉ tốn một cache lookup; cache miss thì 2 query có index. State mang version
+  của hội thoại (key riêng, tăng sau mỗi lần ghi DB): lượt ghi chỉ cập nhật
+  state khi nó đúng là bản ngay trước version mình vừa tăng, nên hai lượt đồng
+  thời không ghi đè mất tin của nhau; state lệch version bị coi như cache miss.
+- build_messages() lấy tin mới nhất tới khi hết CHAT_CONTEXT_TOKEN_BUDGET. Tin
+  cũ hơn bị bỏ và được gộp vào `summary` bởi job 'summarize_conversation'
+  (app/tasks.py); summary được gửi kèm như một system message.
+
+Token được ước lượng (~4 ký tự / token), đủ cho việc chia budget.
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from app.models import Conversation, ConversationMessage
+from . import ai_api, llm_providers
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_OVERHEAD_TOKENS = 4  # role + phân tách mỗi message
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def estimate_tokens(text):
+    return len(text or '') // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+def parse_id(value):
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+# ----------------------------------------------------------------------------
+# State (cache)
+# ----------------------------------------------------------------------------
+def _state_key(conversation_id):
+    return f'conv:state:{conversation_id}'
+
+
+def _version_key(conversation_id):
+    return f'conv:version:{conversation_id}'
+
+
+def _bump_version(conversation_id):
+    """Tăng version của hội thoại (gọi sau khi commit); trả version mới."""
+    key = _version_key(conversation_id)
+    if cache.add(key, 1, timeout=None):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:  # key vừa bị xoá giữa add và incr
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def _save_state(conversation_id, state, version):
+    limit = _setting('CHAT_STATE_MAX_MESSAGES', 40)
+    if len(state['messages']) > limit:
+        # còn tin cũ hơn (chưa tóm tắt) nằm ngoài state -> build_messages xếp job tóm tắt
+        state['truncated'] = True
+        state['messages'] = state['messages'][-limit:]
+    state['version'] = version
+    cache.set(_state_key(conversation_id), state, timeout=_setting('CHAT_STATE_CACHE_TIMEOUT', 3600))
+
+
+def forget(conversation_id):
+    _bump_version(conversation_id)  # load_state đang đọc DB cùng lúc sẽ không ghi đè bằng bản cũ
+    cache.delete(_state_key(conversation_id))
+
+
+def load_state(conversation_id):
+    """
+    {'user_id', 'role', 'summary', 'messages': [[id, role, content, tokens], ...]}
+    (messages theo thứ tự thời gian, chỉ tin chưa được tóm tắt). None nếu không có.
+    """
+    found = cache.get_many([_state_key(conversation_id), _version_key(conversation_id)])
+    state = found.get(_state_key(conversation_id))
+    version = found.get(_version_key(conversation_id), 0)
+    if state is not None and state.get('version') == version:
+        return state
+    # version đọc trước khi query: lượt ghi commit sau đó làm state này lệch version
+    conversation = Conversation.objects.filter(pk=conversation_id).values(
+        'user_id', 'role', 'summary', 'summarized_until'
+    ).first()
+    if conversation is None:
+        return None
+    rows = ConversationMessage.objects.filter(
+        conversation_id=conversation_id, id__gt=conversation['summarized_until']
+    ).order_by('-id').values_list('id', 'role', 'content', 'tokens')[:_setting('CHAT_STATE_MAX_MESSAGES', 40) + 1]
+    state = {
+        'user_id': conversation['user_id'],
+        'role': conversation['role'],
+        'summary': conversation['summary'],
+        'messages': [list(row) for row in reversed(rows)],
+    }
+    _save_state(conversation_id, state, version)
+    return state
+
+
+# ----------------------------------------------------------------------------
+# Ghi
+# ----------------------------------------------------------------------------
+def _message(conversation_id, role, content):
+    return ConversationMessage(
+        conversation_id=conversation_id, role=role, content=content, tokens=estimate_tokens(content)
+    )
+
+
+def start(user, role, first_message='', history=None):
+    """
+    Conversation mới. `history` (format cũ [{"user": ..., "ai": ...}]) được nhập
+    làm các tin đầu tiên cho client chưa chuyển sang conversation_id.
+    """
+    with transaction.atomic():
+        conversation = Conversation.objects.create(user=user, role=role, title=first_message[:255])
+        seed = []
+        for hist in (history or []):
+            if not isinstance(hist, dict):
+                continue
+            if hist.get('user'):
+                seed.append(_message(conversation.pk, ConversationMessage.ROLE_USER, str(hist['user'])))
+            if hist.get('ai'):
+                seed.append(_message(conversation.pk, ConversationMessage.ROLE_ASSISTANT, str(hist['ai'])))
+        ConversationMessage.objects.bulk_create(seed)
+    return conversation.pk, load_state(conversation.pk)
+
+
+def record_turn(conversation_id, user_message, reply):
+    """Lưu câu hỏi + câu trả lời của một lượt và cập nhật state trong cache."""
+    with transaction.atomic():
+        created = [
+            ConversationMessage.objects.create(
+                conversation_id=conversation_id, role=role, content=content, tokens=estimate_tokens(content)
+            )
+            for role, content in ((ConversationMessage.ROLE_USER, user_message),
+                                  (ConversationMessage.ROLE_ASSISTANT, reply))
+        ]
+        Conversation.objects.filter(pk=conversation_id).update(updated_at=timezone.now())
+    version = _bump_version(conversation_id)
+    state = cache.get(_state_key(conversation_id))
+    if state is None or state.get('version') != version - 1:
+        return  # lượt khác chen giữa: để lần đọc sau nạp lại từ DB
+    state['messages'].extend([m.pk, m.role, m.content, m.tokens] for m in created)
+    _save_state(conversation_id, state, version)
+
+
+# ----------------------------------------------------------------------------
+# Context theo token budget
+# ----------------------------------------------------------------------------
+def build_messages(conversation_id, state, user_message):
+    """
+    system + (summary) + các tin mới nhất vừa budget + câu hỏi hiện tại.
+    Nếu có tin bị bỏ, xếp job tóm tắt chúng vào summary.
+    """
+    system = {"role": "system", "content": ai_api.role_system_prompt(state['role'])}
+    current = {"role": "user", "content": user_message}
+    budget = _setting('CHAT_CONTEXT_TOKEN_BUDGET', 3000)
+    used = estimate_tokens(system['content']) + estimate_tokens(user_message)
+
+    head = [system]
+    if state['summary']:
+        head.append({"role": "system", "content": f"Summary of the earlier conversation: {state['summary']}"})
+        used += estimate_tokens(state['summary'])
+
+    kept = []
+    rows = state['messages']
+    for index in range(len(rows) - 1, -1, -1):
+        _, role, content, tokens = rows[index]
+        if used + tokens > budget:
+            _request_summary(conversation_id)
+            break
+        used += tokens
+        kept.append({"role": role, "content": content})
+    else:
+        if rows and state.get('truncated'):
+            _request_summary(conversation_id)
+    return head + kept[::-1] + [current]
+
+
+def open_turn(user, conversation_id, user_message, role, history=None):
+    """
+    -> (conversation_id, messages gửi cho model), hoặc None nếu conversation_id
+    là UUID nhưng không phải hội thoại của user. conversation_id rỗng / format
+    cũ ("conv_<user>_<hash>") -> tạo hội thoại mới, nhập `history` nếu có.
+    """
+    parsed = parse_id(conversation_id)
+    state = load_state(parsed) if parsed else None
+    if parsed and (state is None or state['user_id'] != user.pk):
+        return None
+    if state is None:
+        parsed, state = start(user, role, user_message, history)
+    return parsed, build_messages(parsed, state, user_message)
+
+
+def _summary_cut(rows, keep_tokens):
+    """
+    id của tin mới nhất cần tóm tắt sao cho phần giữ nguyên văn <= keep_tokens:
+    tóm tắt dư ra một nửa budget để các lượt sau không phải tóm tắt ngay lại.
+    """
+    total = 0
+    for index in range(len(rows) - 1, -1, -1):
+        total += rows[index][3]
+        if total > keep_tokens:
+            return rows[index][0]
+    return rows[0][0]
+
+
+def _request_summary(conversation_id):
+    """
+    Một job đang chờ cho mỗi hội thoại (các lượt sau dùng lại nó); điểm cắt
+    được tính lúc job chạy từ các tin mới nhất (summary_cut).
+    """
+    from . import jobs
+    jobs.enqueue(
+        'summarize_conversation', {'conversation_id': str(conversation_id)},
+        dedupe_key=f'summarize_conversation:{conversation_id}', dedupe_queued_only=True,
+    )
+
+
+def summary_cut(conversation_id):
+    """
+    id của tin mới nhất cần gộp vào summary (cùng quy tắc với build_messages:
+    giữ nguyên văn tối đa nửa budget và CHAT_STATE_MAX_MESSAGES tin), None nếu
+    chưa cần tóm tắt.
+    """
+    summarized_until = Conversation.objects.filter(pk=conversation_id).values_list(
+        'summarized_until', flat=True
+    ).first()
+    if summarized_until is None:
+        return None
+    limit = _setting('CHAT_STATE_MAX_MESSAGES', 40)
+    rows = list(ConversationMessage.objects.filter(
+        conversation_id=conversation_id, id__gt=summarized_until
+    ).order_by('-id').values_list('id', 'role', 'content', 'tokens')[:limit + 1])[::-1]
+    truncated = len(rows) > limit
+    rows = rows[-limit:]
+    keep_tokens = _setting('CHAT_CONTEXT_TOKEN_BUDGET', 3000) // 2
+    if rows and sum(row[3] for row in rows) > keep_tokens:
+        return _summary_cut(rows, keep_tokens)
+    if rows and truncated:
+        return rows[0][0] - 1
+    return None
+
+
+# ----------------------------------------------------------------------------
+# Tóm tắt (chạy trong job)
+# ----------------------------------------------------------------------------
+def _extractive_summary(previous, rows):
+    """Fallback khi không gọi được LLM: câu đầu của từng tin, giữ phần mới nhất."""
+    parts = [previous] if previous else []
+    for role, content in rows:
+        first = content.strip().split('\n', 1)[0].split('. ', 1)[0][:200]
+        parts.append(f'{role}: {first}')
+    text = ' | '.join(parts)
+    limit = _setting('CHAT_SUMMARY_MAX_TOKENS', 300) * 4
+    return text[-limit:]
+
+
+def summarize(previous, rows):
+    """rows: [(role, content)] theo thứ tự thời gian."""
+    if not ai_api.is_configured():
+        return _extractive_summary(previous, rows)
+    transcript = '\n'.join(f'{role}: {content}' for role, content in rows)
+    max_tokens = _setting('CHAT_SUMMARY_MAX_TOKENS', 300)
+    try:
+        reply, _ = llm_providers.complete(
+            ai_api.MODEL,
+            [
+                {"role": "system", "content": (
+                    "Summarize the conversation for future context in at most "
+                    f"{max_tokens * 3 // 4} words. Keep names, book titles, stated preferences and open questions."
+                )},
+                {"role": "user", "content": f"Earlier summary: {previous or '(none)'}\n\nNew messages:\n{transcript}"},
+            ],
+            temperature=0.2,
+            max_tokens=max_tokens,
+        )
+        return reply.strip()
+    except Exception as e:
+        logger.warning("Conversation summary via LLM failed, using extractive summary: %s", e)
+        return _extractive_summary(previous, rows)
+
+
+def fold_into_summary(conversation_id, until_id):
+    """Gộp các tin id <= until_id (chưa tóm tắt) vào summary. Trả số tin đã gộp."""
+    conversation = Conversation.objects.filter(pk=conversation_id).first()
+    if conversation is None or until_id <= conversation.summarized_until:
+        return 0
+    rows = list(ConversationMessage.objects.filter(
+        conversation_id=conversation_id, id__gt=conversation.summarized_until, id__lte=until_id
+    ).order_by('id').values_list('role', 'content'))
+    if not rows:
+        return 0
+    summary = summarize(conversation.summary, rows)
+    # compare-and-swap: job khác đã gộp trước thì bỏ kết quả này
+    updated = Conversation.objects.filter(
+        pk=conversation_id, summarized_until=conversation.summarized_until
+    ).update(summary=summary, summarized_until=until_id)
+    forget(conversation_id)
+    return len(rows) if updated else 0
@@ -0,0 +1,165 @@
+"""
+Cover image derivatives (resized JPEG + WebP at fixed widths).
+
+generate() chỉ làm việc với file (không đụng DB) nên chạy được trong process
+pool của `manage.py generate_cover_derivatives`; apply() ghi kết quả vào
+cover_derivatives bằng update() (không kích hoạt lại signal).
+Upload / edit_book_fields gọi schedule() -> chạy ở thread nền.
+"""
+import io
+import logging
+import os
+import posixpath
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+from app.models import Book
+from . import response_cache
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'jpeg': ('JPEG', 'jpg'), 'webp': ('WEBP', 'webp')}
+
+
+def _widths():
+    return sorted(getattr(settings, 'COVER_WIDTHS', [160, 320, 640]))
+
+
+def _quality():
+    return getattr(settings, 'COVER_QUALITY', 80)
+
+
+def derivative_name(source_name, width, fmt):
+    directory, filename = posixpath.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    return posixpath.join(directory, 'derivatives', f'{stem}_{width}.{FORMATS[fmt][1]}')
+
+
+def delete_derivatives(source_name):
+    """Xoá mọi derivative của một ảnh gốc (kể cả width không còn trong COVER_WIDTHS)."""
+    directory, filename = posixpath.split(source_name)
+    folder = posixpath.join(directory, 'derivatives')
+    pattern = re.compile(re.escape(os.path.splitext(filename)[0]) + r'_\d+(_\w+)?\.(%s)' % '|'.join(
+        ext for _, ext in FORMATS.values()
+    ))
+    try:
+        files = default_storage.listdir(folder)[1]
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for name in files:
+        if pattern.fullmatch(name):
+            default_storage.delete(posixpath.join(folder, name))
+            removed += 1
+    return removed
+
+
+def generate(storage, source_name):
+    """
+    Tạo derivative cho một ảnh; trả {"source": ..., "sizes": {...}}.
+    Ảnh gốc đọc từ `storage`; derivative ghi bằng default_storage (cùng
+    MEDIA_ROOT) vì chúng không phải blob có refcount.
+    """
+    with storage.open(source_name, 'rb') as fh:
+        image = ImageOps.exif_transpose(Image.open(fh))
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    sizes = {}
+    widths = [w for w in _widths() if w < image.width] or _widths()[:1]
+    for width in widths:
+        # ảnh hẹp hơn width nhỏ nhất: giữ nguyên khổ, key theo width thật (srcset "<w>w")
+        width = min(width, image.width)
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        sizes[str(width)] = {}
+        for fmt, (pil_format, _) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, quality=_quality(), optimize=True)
+            name = derivative_name(source_name, width, fmt)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            sizes[str(width)][fmt] = default_storage.save(name, ContentFile(buffer.getvalue()))
+    return {'source': source_name, 'sizes': sizes}
+
+
+def is_stale(obj):
+    if not obj.cover_image:
+        return bool(obj.cover_derivatives)
+    return (obj.cover_derivatives or {}).get('source') != obj.cover_image.name
+
+
+def apply(model, pk, derivatives):
+    """Ghi kết quả nếu ảnh gốc chưa bị đổi trong lúc xử lý."""
+    updated = model.objects.filter(pk=pk, cover_image=derivatives.get('source', '')).update(
+        cover_derivatives=derivatives
+    )
+    if updated:
+        tags = [response_cache.CATALOG_TAG]
+        if model is Book:
+            tags.append(response_cache.book_tag(pk))
+        response_cache.invalidate(*tags)
+    return bool(updated)
+
+
+def process(model, pk):
+    obj = model.objects.filter(pk=pk).only('id', 'cover_image', 'cover_derivatives').first()
+    if obj is None or not is_stale(obj):
+        return
+    if not obj.cover_image:
+        model.objects.filter(pk=pk).update(cover_derivatives={})
+        return
+    apply(model, pk, generate(obj.cover_image.storage, obj.cover_image.name))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run(model, pk):
+    try:
+        process(model, pk)
+    except Exception:
+        logger.exception("Cover derivatives failed for %s %s", model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule(obj):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cover-derivatives')
+    _executor.submit(_run, type(obj), obj.pk)
+
+
+# ----------------------------------------------------------------------------
+# Serializer helpers
+# ----------------------------------------------------------------------------
+def size_map(derivatives, url):
+    """{"320": {"jpeg": url, "webp": url}} — url: name -> URL."""
+    return {
+        width: {fmt: url(name) for fmt, name in formats.items()}
+        for width, formats in ((derivatives or {}).get('sizes') or {}).items()
+    }
+
+
+def srcset(derivatives, url):
+    """{"webp": "a_160.webp 160w, ...", "jpeg": "..."} dùng cho <picture><source srcset>."""
+    sizes = (derivatives or {}).get('sizes') or {}
+    if not sizes:
+        return None
+    ordered = sorted(sizes.items(), key=lambda kv: int(kv[0]))
+    return {
+        fmt: ', '.join(f'{url(formats[fmt])} {width}w' for width, formats in ordered if fmt in formats)
+        for fmt in FORMATS
+    }
+
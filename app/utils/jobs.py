@@ -0,0 +1,221 @@
+"""
+DB-backed job queue.
+
+enqueue() ghi một dòng Job (sau commit worker mới thấy); `manage.py run_jobs`
+lấy job bằng SELECT ... FOR UPDATE SKIP LOCKED nên chạy nhiều worker song
+song không tranh nhau. Mỗi kind có giới hạn số job chạy đồng thời
+(JOB_CONCURRENCY, tính trên toàn bộ worker; đếm khi đang khoá dòng JobKind của
+kind nên hai worker không cùng lọt qua giới hạn), lỗi được retry với backoff luỹ
+thừa tới max_attempts. Worker làm mới `locked_at` mỗi JOB_HEARTBEAT_INTERVAL
+giây trong lúc job chạy; job "running" không được làm mới quá JOB_LOCK_TIMEOUT
+giây (worker chết) được trả về hàng đợi, hoặc đánh dấu failed nếu đã hết lượt
+thử (job làm chết worker không bị chạy lại mãi).
+
+Handler đăng ký bằng @register('kind') (xem app/tasks.py) và nhận Job; gọi
+report(job, progress, message) để cập nhật tiến độ cho endpoint status.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from app.models import Job, JobKind
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def register(kind, max_attempts=3):
+    def decorator(fn):
+        _handlers[kind] = (fn, max_attempts)
+        return fn
+    return decorator
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def _concurrency(kind):
+    limits = getattr(settings, 'JOB_CONCURRENCY', {})
+    return limits.get(kind, limits.get('default', 2))
+
+
+def _lock_timeout():
+    return getattr(settings, 'JOB_LOCK_TIMEOUT', 600)
+
+
+def _heartbeat_interval():
+    return getattr(settings, 'JOB_HEARTBEAT_INTERVAL', None) or max(_lock_timeout() / 4, 1)
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'JOB_RETRY_BASE_DELAY', 5)
+    return base * (2 ** max(attempts - 1, 0))
+
+
+# ----------------------------------------------------------------------------
+# Producer
+# ----------------------------------------------------------------------------
+def enqueue(kind, payload=None, dedupe_key='', user=None, delay=0, dedupe_queued_only=False):
+    """
+    Job trùng dedupe_key chưa FAILED -> trả job cũ. dedupe_queued_only: chỉ
+    dùng lại job còn QUEUED (việc lặp lại được, vd. tóm tắt hội thoại: job
+    đang chạy / đã xong không bao trùm dữ liệu đến sau).
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    if dedupe_key:
+        existing = Job.objects.filter(dedupe_key=dedupe_key)
+        if dedupe_queued_only:
+            existing = existing.filter(status=Job.STATUS_QUEUED)
+        else:
+            existing = existing.exclude(status=Job.STATUS_FAILED)
+        existing = existing.order_by('-id').first()
+        if existing is not None:
+            return existing
+    return Job.objects.create(
+        kind=kind, payload=payload or {}, dedupe_key=dedupe_key,
+        max_attempts=_handlers[kind][1], created_by=user,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def report(job, progress=None, message=None):
+    fields = {}
+    if progress is not None:
+        job.progress = fields['progress'] = max(0, min(100, int(progress)))
+    if message is not None:
+        job.message = fields['message'] = message[:255]
+    if fields:
+        Job.objects.filter(pk=job.pk).update(updated_at=timezone.now(), **fields)
+
+
+def status_payload(job):
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': job.result,
+        'error': job.last_error.strip().splitlines()[-1] if job.last_error else None,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    }
+
+
+# ----------------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------------
+def requeue_stale():
+    """Trả job mất heartbeat về hàng đợi; job đã hết lượt thử -> failed. Trả số job đã trả về."""
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=now - timedelta(seconds=_lock_timeout()))
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_FAILED, locked_by='', locked_at=None, finished_at=now, updated_at=now,
+        message='lock timeout', last_error='Worker stopped responding (lock timeout) on the last attempt.',
+    )
+    return stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.STATUS_QUEUED, locked_by='', locked_at=None, updated_at=now,
+        message='requeued after lock timeout',
+    )
+
+
+def _lock_kind(kind):
+    """Khoá dòng JobKind (tạo nếu chưa có) tới hết transaction hiện tại."""
+    JobKind.objects.bulk_create([JobKind(kind=kind)], ignore_conflicts=True)
+    JobKind.objects.select_for_update().get(kind=kind)
+
+
+def claim(kinds=None, worker=None):
+    """Lấy một job sẵn sàng (tôn trọng giới hạn concurrency theo kind) hoặc None."""
+    now = timezone.now()
+    # số đếm không khoá chỉ để bỏ sớm các kind đã đầy; giới hạn thật được kiểm tra dưới khoá
+    running = dict(
+        Job.objects.filter(status=Job.STATUS_RUNNING).values_list('kind').annotate(n=Count('id'))
+    )
+    allowed = [k for k in (kinds or _handlers) if k in _handlers and running.get(k, 0) < _concurrency(k)]
+    while allowed:
+        # mỗi lượt một transaction: khoá job (SKIP LOCKED) rồi dòng kind của nó -> không deadlock
+        with transaction.atomic():
+            job = (Job.objects.select_for_update(skip_locked=True)
+                   .filter(status=Job.STATUS_QUEUED, run_after__lte=now, kind__in=allowed)
+                   .order_by('run_after', 'id').first())
+            if job is None:
+                return None
+            _lock_kind(job.kind)
+            if Job.objects.filter(status=Job.STATUS_RUNNING, kind=job.kind).count() < _concurrency(job.kind):
+                job.status = Job.STATUS_RUNNING
+                job.attempts += 1
+                job.locked_by = worker or worker_id()
+                job.locked_at = now
+                job.save(update_fields=['status', 'attempts', 'locked_by', 'locked_at', 'updated_at'])
+                return job
+        allowed.remove(job.kind)  # worker khác vừa lấp đầy kind này
+    return None
+
+
+def _heartbeat(job, stop):
+    """Thread nền: làm mới locked_at tới khi job xong (requeue_stale chỉ nhặt job mất heartbeat)."""
+    try:
+        while not stop.wait(_heartbeat_interval()):
+            Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING, locked_by=job.locked_by).update(
+                locked_at=timezone.now()
+            )
+    except Exception:
+        logger.exception("Heartbeat failed for job %s", job)
+    finally:
+        close_old_connections()
+
+
+def execute(job):
+    fn, _ = _handlers[job.kind]
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job, stop), name=f'job-heartbeat-{job.pk}', daemon=True).start()
+    try:
+        result = fn(job)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s failed (attempt %s/%s)", job, job.attempts, job.max_attempts)
+        if job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.STATUS_QUEUED, locked_by='', locked_at=None, last_error=error,
+                run_after=timezone.now() + timedelta(seconds=_retry_delay(job.attempts)),
+                updated_at=timezone.now(),
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.STATUS_FAILED, locked_by='', locked_at=None, last_error=error,
+                finished_at=timezone.now(), updated_at=timezone.now(),
+            )
+        return False
+    finally:
+        stop.set()
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.STATUS_SUCCEEDED, locked_by='', locked_at=None, progress=100, result=result,
+        finished_at=timezone.now(), updated_at=timezone.now(),
+    )
+    return True
+
+
+def run_pending(kinds=None, limit=None):
+    """Chạy job đến khi hết (dùng cho --once / test). Trả số job đã chạy."""
+    done = 0
+    while limit is None or done < limit:
+        job = claim(kinds)
+        if job is None:
+            break
+        execute(job)
+        done += 1
+    return done
@@ -0,0 +1,305 @@
+"""
+Async provider layer cho chatbot (ASGI).
+
+- Provider lấy từ registry (app/utils/llm_providers.py): fallback theo thứ tự,
+  circuit breaker, hedge khi chậm hơn p95 (request thua bị huỷ ngay) và
+  histogram dùng chung với bản sync. Provider 'fake' cho load test
+  (manage.py chat_loadtest) không tốn token.
+- Một AsyncOpenAI dùng chung cho mỗi provider trên mỗi event loop -> connection
+  pool HTTP/TLS keep-alive được tái sử dụng thay vì bắt tay lại mỗi request.
+- Timeout theo request (LLM_TIMEOUT) và số completion đang chạy bị chặn bởi
+  asyncio.Semaphore(LLM_MAX_CONCURRENCY); tối đa LLM_QUEUE_MAX request chờ slot,
+  chờ quá LLM_QUEUE_TIMEOUT hoặc hàng đợi đầy -> ServiceBusy (view trả 503 +
+  Retry-After).
+- complete(): các request giống hệt nhau (llm_cache.request_key) đang chạy cùng
+  lúc trên một loop chờ chung một completion (single-flight, như llm_guard bản sync).
+
+Client gắn với event loop tạo ra nó, nên được giữ theo loop (uvicorn: một loop
+mỗi process; runserver/async_to_sync: loop mới mỗi request).
+"""
+import asyncio
+import logging
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import llm_cache, llm_providers
+from .llm_guard import ServiceBusy
+from .llm_providers import LLMUnavailable, fake_reply
+from .llm_stream import sse_event
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class _LoopState:
+    def __init__(self):
+        self.limit = _setting('LLM_MAX_CONCURRENCY', 100)
+        self.semaphore = asyncio.Semaphore(self.limit)
+        self.clients = {}  # tên provider -> AsyncOpenAI
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waiting = 0
+        self.flights = {}  # request_key -> Task của completion đang chạy
+        self.counters = {'leaders': 0, 'coalesced': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0}
+
+    def client_for(self, provider):
+        client = self.clients.get(provider.name)
+        if client is None:
+            from openai import AsyncOpenAI
+            client = self.clients[provider.name] = AsyncOpenAI(**provider.client_kwargs())
+        return client
+
+
+_states = weakref.WeakKeyDictionary()
+
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None:
+        state = _states[loop] = _LoopState()
+    return state
+
+
+def admit():
+    """ServiceBusy nếu hết slot và hàng đợi đã đầy (kiểm tra trước khi mở stream SSE)."""
+    state = _state()
+    # đếm cả request đang chờ acquire (semaphore.locked() chưa phản ánh chúng)
+    if state.in_flight + state.waiting >= state.limit + _setting('LLM_QUEUE_MAX', 64):
+        state.counters['rejected_queue_full'] += 1
+        raise ServiceBusy()
+    return state
+
+
+class _Slot:
+    """async with _Slot(): giữ một chỗ trong semaphore của loop hiện tại."""
+
+    async def __aenter__(self):
+        self.state = admit()
+        self.state.waiting += 1
+        try:
+            await asyncio.wait_for(self.state.semaphore.acquire(), _setting('LLM_QUEUE_TIMEOUT', 10))
+        except asyncio.TimeoutError:
+            self.state.counters['rejected_timeout'] += 1
+            raise ServiceBusy()
+        finally:
+            self.state.waiting -= 1
+        self.state.in_flight += 1
+        self.state.peak_in_flight = max(self.state.peak_in_flight, self.state.in_flight)
+        return self.state
+
+    async def __aexit__(self, *exc):
+        self.state.in_flight -= 1
+        self.state.semaphore.release()
+
+
+async def _attempt(state, provider, model, messages, temperature, max_tokens, timeout):
+    started = time.monotonic()
+    try:
+        if provider.kind == 'fake':
+            await asyncio.sleep(provider.fake_latency())
+            provider.fake_check()
+            result = fake_reply(messages), 0
+        else:
+            response = await state.client_for(provider).chat.completions.create(
+                model=provider.model_for(model), messages=messages, temperature=temperature, max_tokens=max_tokens,
+                timeout=timeout or provider.timeout(),
+            )
+            result = response.choices[0].message.content, getattr(response.usage, 'total_tokens', 0)
+    except asyncio.CancelledError:
+        provider.breaker.release_trial()  # hedge thua bị huỷ: không tính là lỗi
+        raise
+    except Exception as exc:
+        provider.record_failure(exc, time.monotonic() - started)
+        raise
+    provider.record_success(time.monotonic() - started)
+    return result
+
+
+async def _hedged(state, primary, candidates, delay, tried, args):
+    tasks = [asyncio.ensure_future(_attempt(state, primary, *args))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        target = None if done else llm_providers.hedge_target(primary, candidates, tried)
+        if target is None:
+            return await tasks[0]
+        tasks.append(asyncio.ensure_future(_attempt(state, target, *args)))
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                if task is not tasks[0]:
+                    primary.record_hedge_win()
+                return task.result()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()  # request thua -> đóng kết nối tới provider, không tốn thêm token
+
+
+async def _call(model, messages, temperature, max_tokens, timeout):
+    """Như llm_providers.complete nhưng async: fallback + breaker + hedge."""
+    async with _Slot() as state:
+        candidates = llm_providers.providers()
+        args = (model, messages, temperature, max_tokens, timeout)
+        tried = set()
+        while True:
+            provider = llm_providers.pick(candidates, tried)
+            if provider is None:
+                raise LLMUnavailable(wait=llm_providers.retry_after(candidates))
+            delay = provider.hedge_delay()
+            try:
+                if delay is None:
+                    return await _attempt(state, provider, *args)
+                return await _hedged(state, provider, candidates, delay, tried, args)
+            except Exception:
+                continue
+
+
+async def _fetch(model, messages, temperature, max_tokens, timeout):
+    started = time.monotonic()
+    reply, tokens = await _call(model, messages, temperature, max_tokens, timeout)
+    llm_cache.store(model, messages, reply, tokens=tokens, latency=time.monotonic() - started)
+    return reply
+
+
+async def complete(model, messages, temperature=0.7, max_tokens=2048, timeout=None):
+    """
+    Câu trả lời (đi qua llm_cache như bản sync). LLMUnavailable (mọi provider
+    lỗi) / ServiceBusy được raise cho view xử lý.
+    """
+    cached = llm_cache.lookup(model, messages)
+    if cached is not None:
+        return cached
+    state = _state()
+    key = llm_cache.request_key(model, messages)
+    task = state.flights.get(key)
+    if task is None:
+        task = state.flights[key] = asyncio.ensure_future(_fetch(model, messages, temperature, max_tokens, timeout))
+
+        def done(finished):
+            if state.flights.get(key) is finished:
+                del state.flights[key]
+            if not finished.cancelled():
+                finished.exception()  # đã xử lý ở các request đang chờ
+        task.add_done_callback(done)
+        state.counters['leaders'] += 1
+    else:
+        state.counters['coalesced'] += 1
+    # shield: client của một request ngắt không huỷ completion mà request khác đang chờ
+    return await asyncio.shield(task)
+
+
+async def _open_stream(state, model, messages, temperature, max_tokens):
+    """(provider, response) của provider đầu tiên mở được stream; 'fake' -> response None."""
+    candidates = llm_providers.providers()
+    tried = set()
+    while True:
+        provider = llm_providers.pick(candidates, tried)
+        if provider is None:
+            raise LLMUnavailable(wait=llm_providers.retry_after(candidates))
+        started = time.monotonic()
+        try:
+            if provider.kind == 'fake':
+                provider.fake_check()
+                response = None
+            else:
+                response = await state.client_for(provider).chat.completions.create(
+                    model=provider.model_for(model), messages=messages, temperature=temperature,
+                    max_tokens=max_tokens, stream=True, timeout=provider.timeout(),
+                )
+        except asyncio.CancelledError:
+            provider.breaker.release_trial()
+            raise
+        except Exception as exc:
+            provider.record_failure(exc, time.monotonic() - started)
+            continue
+        provider.breaker.record_success()
+        return provider, response
+
+
+async def stream(model, messages, temperature=0.7, max_tokens=2048):
+    """Async generator delta text; aclose() (client ngắt) đóng stream phía provider."""
+    async with _Slot() as state:
+        provider, response = await _open_stream(state, model, messages, temperature, max_tokens)
+        if response is None:
+            words = fake_reply(messages).split(' ')
+            for i, word in enumerate(words):
+                await asyncio.sleep(provider.fake_latency() / max(len(words), 1))
+                yield word if i == 0 else ' ' + word
+            return
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.close()
+
+
+async def event_stream(model, messages, on_complete=None, **kwargs):
+    """
+    Bản async của llm_stream.sse_response (cùng format event delta/done/error).
+    on_complete(reply) là hàm sync (thường ghi DB) -> chạy qua sync_to_async.
+    """
+    cached = llm_cache.lookup(model, messages)
+    if cached is not None:
+        yield sse_event('delta', {'content': cached})
+        yield sse_event('done', {'message': cached, 'cached': True})
+        if on_complete:
+            await sync_to_async(on_complete)(cached)
+        return
+
+    started = time.monotonic()
+    parts = []
+    deltas = stream(model, messages, **kwargs)
+    try:
+        async for delta in deltas:
+            parts.append(delta)
+            yield sse_event('delta', {'content': delta})
+    except ServiceBusy:
+        yield sse_event('error', {'error': 'AI service is busy, please retry'})
+        return
+    except asyncio.CancelledError:
+        # client ngắt -> Django huỷ task; finally bên dưới đóng stream provider
+        logger.info("Async chat stream cancelled by client after %d chunks", len(parts))
+        raise
+    except Exception as exc:
+        logger.warning("Async chat stream failed: %s", exc)
+        yield sse_event('error', {'error': 'AI service temporarily unavailable'})
+        return
+    finally:
+        await deltas.aclose()
+
+    message = ''.join(parts)
+    llm_cache.store(model, messages, message, latency=time.monotonic() - started)
+    if on_complete:
+        await sync_to_async(on_complete)(message)
+    yield sse_event('done', {'message': message, 'cached': False})
+
+
+def stats():
+    try:
+        state = _state()
+    except RuntimeError:  # không có loop đang chạy
+        return {}
+    return {
+        'in_flight': state.in_flight, 'peak_in_flight': state.peak_in_flight, 'waiting': state.waiting,
+        'in_flight_prompts': len(state.flights), **state.counters,
+    }
+
+
+async def aclose():
+    """Đóng các client của loop hiện tại (ASGI lifespan shutdown)."""
+    state = _states.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        for client in state.clients.values():
+            await client.close()
@@ -0,0 +1,223 @@
+"""
+Cache câu trả lời LLM (chatbot) trong process.
+
+Key = sha256 của (model, system prompt, context đã cắt, prompt đã chuẩn hoá):
+lowercase, bỏ dấu, gộp khoảng trắng, bỏ dấu câu cuối -> "Recommend a fantasy
+book!" và "recommend a  fantasy book" trùng nhau. Entry hết hạn sau
+LLM_CACHE_TTL giây; vượt LLM_CACHE_MAX_ENTRIES hoặc LLM_CACHE_MAX_BYTES thì bỏ
+entry ít dùng gần đây nhất (LRU).
+
+Tuỳ chọn (LLM_CACHE_SEMANTIC): khi không trùng key, so prompt với các entry
+cùng model/system/context bằng embedding băm (feature hashing unigram + bigram,
+cosine) và dùng lại nếu >= LLM_CACHE_SEMANTIC_THRESHOLD. Không cần model
+embedding ngoài nên không tốn thêm request.
+
+Câu trả lời lỗi không bao giờ được cache. stats() cho endpoint admin.
+
+get_or_call() đi qua llm_guard: cache miss của cùng một key đang được gọi thì
+chờ chung một lời gọi provider (single-flight), và lời gọi phải có slot trong
+giới hạn concurrency của process.
+"""
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import llm_guard
+from .text import fold
+
+EMBEDDING_DIM = 512
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ----------------------------------------------------------------------------
+# Chuẩn hoá + embedding
+# ----------------------------------------------------------------------------
+def normalize(text):
+    return ' '.join(fold(text or '').split()).rstrip(' .!?…')
+
+
+def embed(text, dim=EMBEDDING_DIM):
+    """Vector thưa {chiều: trọng số} đã chuẩn hoá L2 (cũng dùng bởi vector_index)."""
+    words = _WORD_RE.findall(normalize(text))
+    features = words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+    vector = {}
+    for feature in features:
+        digest = hashlib.md5(feature.encode()).digest()
+        index = int.from_bytes(digest[:4], 'little') % dim
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[index] = vector.get(index, 0.0) + sign
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norm for k, v in vector.items()} if norm else {}
+
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+def _scope_and_prompt(model, messages):
+    """(scope, prompt): scope gồm model + system + context (đã cắt), prompt là tin nhắn cuối."""
+    system = [m.get('content', '') for m in messages if m.get('role') == 'system']
+    turns = [m for m in messages if m.get('role') != 'system']
+    prompt = turns[-1].get('content', '') if turns else ''
+    context = [[m.get('role'), normalize(m.get('content', ''))] for m in turns[:-1]]
+    scope = hashlib.sha256(json.dumps([model, system, context], ensure_ascii=False).encode()).hexdigest()
+    return scope, prompt
+
+
+# ----------------------------------------------------------------------------
+# Cache
+# ----------------------------------------------------------------------------
+class _Entry:
+    __slots__ = ('reply', 'scope', 'vector', 'expires_at', 'size', 'tokens', 'latency')
+
+    def __init__(self, reply, scope, vector, expires_at, tokens, latency):
+        self.reply, self.scope, self.vector = reply, scope, vector
+        self.expires_at, self.tokens, self.latency = expires_at, tokens, latency
+        self.size = len(reply.encode('utf-8'))
+
+
+class LLMCache:
+    def __init__(self):
+        self._entries = OrderedDict()  # key -> _Entry, cuối = dùng gần nhất
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.counters = dict.fromkeys(
+            ['hits', 'semantic_hits', 'misses', 'stores', 'evictions', 'expirations',
+             'tokens_saved', 'seconds_saved'], 0
+        )
+
+    def _drop(self, key, counter):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        self.counters[counter] += 1
+
+    def _hit(self, key, entry, counter):
+        self._entries.move_to_end(key)
+        self.counters[counter] += 1
+        self.counters['tokens_saved'] += entry.tokens
+        self.counters['seconds_saved'] += entry.latency
+        return entry.reply
+
+    def get(self, key, scope=None, prompt=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    return self._hit(key, entry, 'hits')
+                self._drop(key, 'expirations')
+            if scope is not None and _setting('LLM_CACHE_SEMANTIC', False):
+                vector = embed(prompt)
+                threshold = _setting('LLM_CACHE_SEMANTIC_THRESHOLD', 0.9)
+                best_key, best_score = None, threshold
+                for other_key, other in list(self._entries.items()):
+                    if other.expires_at <= now:
+                        self._drop(other_key, 'expirations')
+                        continue
+                    if other.scope == scope:
+                        score = cosine(vector, other.vector)
+                        if score >= best_score:
+                            best_key, best_score = other_key, score
+                if best_key is not None:
+                    return self._hit(best_key, self._entries[best_key], 'semantic_hits')
+            self.counters['misses'] += 1
+        return None
+
+    def set(self, key, reply, scope, prompt, tokens=0, latency=0.0):
+        entry = _Entry(reply, scope, embed(prompt) if _setting('LLM_CACHE_SEMANTIC', False) else {},
+                       time.monotonic() + _setting('LLM_CACHE_TTL', 3600), tokens, latency)
+        max_entries = _setting('LLM_CACHE_MAX_ENTRIES', 1000)
+        max_bytes = _setting('LLM_CACHE_MAX_BYTES', 8 * 1024 * 1024)
+        if entry.size > max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self.counters['stores'] += 1
+            while len(self._entries) > max_entries or self._bytes > max_bytes:
+                self._drop(next(iter(self._entries)), 'evictions')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+            data['entries'] = len(self._entries)
+            data['bytes'] = self._bytes
+        lookups = data['hits'] + data['semantic_hits'] + data['misses']
+        data['hit_ratio'] = round((data['hits'] + data['semantic_hits']) / lookups, 4) if lookups else 0
+        data['seconds_saved'] = round(data['seconds_saved'], 3)
+        return data
+
+
+_cache = LLMCache()
+
+
+def _key(scope, prompt):
+    return hashlib.sha256(f'{scope}|{normalize(prompt)}'.encode()).hexdigest()
+
+
+def request_key(model, messages):
+    """Key của messages (không semantic): cũng dùng để gộp các request giống nhau đang chạy."""
+    return _key(*_scope_and_prompt(model, messages))
+
+
+def lookup(model, messages):
+    """Câu trả lời đã cache cho messages này (exact hoặc semantic) hoặc None."""
+    if not _setting('LLM_CACHE_ENABLED', True):
+        return None
+    scope, prompt = _scope_and_prompt(model, messages)
+    return _cache.get(_key(scope, prompt), scope, prompt)
+
+
+def store(model, messages, reply, tokens=0, latency=0.0):
+    if not _setting('LLM_CACHE_ENABLED', True) or not reply:
+        return
+    scope, prompt = _scope_and_prompt(model, messages)
+    _cache.set(_key(scope, prompt), reply, scope, prompt, tokens=tokens or 0, latency=latency)
+
+
+def get_or_call(model, messages, call):
+    """
+    Trả câu trả lời từ cache hoặc gọi `call()` -> (reply, total_tokens); lỗi
+    của call() (vd llm_providers.LLMUnavailable) được raise, không cache.
+    Provider quá tải (hết slot, hàng đợi đầy) -> llm_guard.ServiceBusy.
+    """
+    reply = lookup(model, messages)
+    if reply is not None:
+        return reply
+
+    def fetch():
+        started = time.monotonic()
+        reply, tokens = call()
+        if reply:
+            # lưu trước khi single-flight bỏ key -> request đến sau trúng cache
+            store(model, messages, reply, tokens=tokens, latency=time.monotonic() - started)
+        return reply
+    return llm_guard.call(request_key(model, messages), fetch)
+
+
+def stats():
+    return _cache.stats()
+
+
+def clear():
+    _cache.clear()
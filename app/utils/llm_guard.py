@@ -0,0 +1,167 @@
+"""
+Bảo vệ provider LLM (và worker) khi có spike.
+
+- Single-flight: các request giống hệt nhau (cùng key llm_cache: model + system
+  + context + prompt đã chuẩn hoá) đang chạy cùng lúc chỉ gọi provider một lần;
+  request đến sau chờ và nhận chung kết quả.
+- ConcurrencyLimiter: tối đa LLM_SYNC_MAX_CONCURRENCY lời gọi provider mỗi
+  process; tối đa LLM_QUEUE_MAX request chờ slot, mỗi request chờ tối đa
+  LLM_QUEUE_TIMEOUT giây. Hàng đợi đầy / chờ quá lâu -> ServiceBusy (503 +
+  Retry-After) thay vì giữ thread của worker.
+
+Giới hạn theo user (429) nằm ở app/throttling.py.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ServiceBusy(APIException):
+    """503; DRF exception_handler tự thêm Retry-After từ `wait`."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'AI service is busy, please retry shortly.'
+    default_code = 'service_busy'
+
+    def __init__(self, wait=None, detail=None):
+        super().__init__(detail)
+        self.wait = wait if wait is not None else _setting('LLM_BUSY_RETRY_AFTER', 2)
+
+
+# ----------------------------------------------------------------------------
+# Single-flight
+# ----------------------------------------------------------------------------
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.counters = {'leaders': 0, 'coalesced': 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.counters['leaders'] += 1
+            else:
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            timeout = _setting('LLM_TIMEOUT', 60) + _setting('LLM_QUEUE_TIMEOUT', 10)
+            if not flight.done.wait(timeout):
+                raise ServiceBusy()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+
+# ----------------------------------------------------------------------------
+# Concurrency limiter
+# ----------------------------------------------------------------------------
+class ConcurrencyLimiter:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.counters = {'admitted': 0, 'queued': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0}
+
+    def acquire(self):
+        limit = _setting('LLM_SYNC_MAX_CONCURRENCY', 16)
+        with self._cond:
+            if self.active < limit and not self.waiting:
+                self.active += 1
+                self.counters['admitted'] += 1
+                return
+            if self.waiting >= _setting('LLM_QUEUE_MAX', 64):
+                self.counters['rejected_queue_full'] += 1
+                raise ServiceBusy()
+            self.waiting += 1
+            self.counters['queued'] += 1
+            deadline = time.monotonic() + _setting('LLM_QUEUE_TIMEOUT', 10)
+            try:
+                while self.active >= limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters['rejected_timeout'] += 1
+                        raise ServiceBusy()
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.counters['admitted'] += 1
+
+    def try_acquire(self):
+        """Lấy slot chỉ khi còn trống ngay và không ai đang xếp hàng (dùng cho hedge)."""
+        with self._cond:
+            if self.active >= _setting('LLM_SYNC_MAX_CONCURRENCY', 16) or self.waiting:
+                return False
+            self.active += 1
+            self.counters['admitted'] += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+single_flight = SingleFlight()
+limiter = ConcurrencyLimiter()
+
+
+def call(key, fn):
+    """fn() qua single-flight (theo key) rồi qua limiter; chỉ leader chiếm slot."""
+    def limited():
+        with limiter.slot():
+            return fn()
+    return single_flight.do(key, limited)
+
+
+def stats():
+    return {
+        'active': limiter.active,
+        'waiting': limiter.waiting,
+        'in_flight_prompts': single_flight.in_flight(),
+        **limiter.counters,
+        **single_flight.counters,
+    }
@@ -0,0 +1,469 @@
+"""
+Registry provider LLM (cấu hình trong settings.LLM_PROVIDERS, theo thứ tự ưu tiên).
+
+Mỗi provider:
+    {'name': 'groq', 'kind': 'openai', 'base_url': '...', 'api_key_env': 'GROQ_API_KEY',
+     'models': {'llama-3.1-8b-instant': '...', '*': '...'},   # tuỳ chọn: đổi tên model
+     'timeout': 60}
+    {'name': 'fake', 'kind': 'fake', 'latency': 0.5, 'error_rate': 0.0}
+
+- complete(): thử lần lượt từng provider; lỗi -> provider kế tiếp. Hết provider
+  -> LLMUnavailable (503 + Retry-After).
+- Hedged request: lời gọi chạy lâu hơn p95 latency gần đây của provider thì gửi
+  thêm một request tới một provider KHÁC có circuit đang đóng (không có thì
+  không hedge) và lấy kết quả về trước. Chỉ ~5% request bị gửi hai lần nhưng
+  đuôi latency ngắn hẳn. Lời gọi thêm chiếm một slot của llm_guard.limiter (chỉ
+  hedge khi còn slot trống) cho tới khi cả hai lời gọi thực sự kết thúc.
+- Circuit breaker theo provider: LLM_BREAKER_FAILURES lỗi liên tiếp -> mở
+  trong LLM_BREAKER_COOLDOWN giây (bỏ qua provider, không chờ timeout), rồi
+  cho một request thử (half-open); thành công thì đóng lại.
+- Histogram latency (thành công / lỗi) và số lỗi theo loại cho từng provider:
+  stats() -> endpoint admin llm-cache-stats.
+
+Provider 'fake' chạy trong process (ngủ `latency` giây, lỗi ngẫu nhiên theo
+`error_rate`) cho test, load test và dev không có API key.
+
+Breaker và histogram nằm trong process (mỗi worker tự quan sát provider).
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import llm_guard
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # giây
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class LLMUnavailable(APIException):
+    """Mọi provider đều lỗi hoặc đang mở circuit."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'AI service temporarily unavailable'
+    default_code = 'llm_unavailable'
+
+    def __init__(self, wait=None, detail=None):
+        super().__init__(detail)
+        self.wait = wait if wait is not None else _setting('LLM_BUSY_RETRY_AFTER', 2)
+
+
+class FakeProviderError(Exception):
+    pass
+
+
+def fake_reply(messages):
+    prompt = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+    return f"(fake) You asked: {prompt}. Try 'The Hobbit' by J.R.R. Tolkien."
+
+
+class ProviderStream:
+    """Iterator delta text + close() để huỷ request phía provider."""
+
+    def __init__(self, deltas, close=lambda: None):
+        self._deltas = deltas
+        self._close = close
+
+    def __iter__(self):
+        return self._deltas
+
+    def close(self):
+        self._close()
+
+
+# ----------------------------------------------------------------------------
+# Circuit breaker + histogram
+# ----------------------------------------------------------------------------
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+
+    def allow(self):
+        """True nếu được gửi request; circuit mở quá cooldown -> cho đúng một request thử."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.retry_after() <= 0:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= _setting('LLM_BREAKER_FAILURES', 5):
+                if self.state != self.OPEN:
+                    self.opens += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def retry_after(self):
+        return self.opened_at + _setting('LLM_BREAKER_COOLDOWN', 30) - time.monotonic()
+
+    def release_trial(self):
+        """Request thử (half-open) bị huỷ trước khi có kết quả -> cho request kế tiếp thử."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic() - _setting('LLM_BREAKER_COOLDOWN', 30)
+
+
+class Histogram:
+    """Đếm theo LATENCY_BUCKETS + cửa sổ các giá trị gần nhất để tính quantile."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=_setting('LLM_HEDGE_WINDOW', 200))
+
+    def observe(self, seconds):
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            self.recent.append(seconds)
+
+    def quantile(self, q):
+        """Quantile của cửa sổ gần nhất; None nếu chưa đủ LLM_HEDGE_MIN_SAMPLES mẫu."""
+        with self._lock:
+            values = sorted(self.recent)
+        if not values or len(values) < _setting('LLM_HEDGE_MIN_SAMPLES', 20):
+            return None
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def snapshot(self):
+        with self._lock:
+            counts, count, total, values = list(self.counts), self.count, self.sum, sorted(self.recent)
+        labels = [f'le_{bound}' for bound in LATENCY_BUCKETS] + ['le_inf']
+        data = {'count': count, 'sum': round(total, 3), 'buckets': dict(zip(labels, counts))}
+        for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            data[name] = round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else None
+        return data
+
+
+# ----------------------------------------------------------------------------
+# Provider
+# ----------------------------------------------------------------------------
+class Provider:
+    def __init__(self, config):
+        self.config = config
+        self.name = config['name']
+        self.kind = config.get('kind', 'openai')
+        self.breaker = CircuitBreaker()
+        self.latency = Histogram()
+        self.error_latency = Histogram()
+        self.errors = {}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._client = None
+        self._lock = threading.Lock()
+
+    def model_for(self, model):
+        models = self.config.get('models') or {}
+        return models.get(model, models.get('*', model))
+
+    def api_key(self):
+        return os.getenv(self.config.get('api_key_env', ''), '') if self.config.get('api_key_env') else ''
+
+    def is_configured(self):
+        return self.kind == 'fake' or bool(self.api_key())
+
+    def timeout(self):
+        return self.config.get('timeout', _setting('LLM_TIMEOUT', 60))
+
+    def client_kwargs(self):
+        """Tham số cho OpenAI / AsyncOpenAI (llm_async giữ client async theo event loop)."""
+        return {
+            'api_key': self.api_key() or 'dummy_key',
+            'base_url': self.config['base_url'],
+            'timeout': self.timeout(),
+            'max_retries': _setting('LLM_MAX_RETRIES', 1),
+        }
+
+    @property
+    def client(self):
+        # một client / provider -> connection pool HTTP keep-alive được tái sử dụng
+        with self._lock:
+            if self._client is None:
+                from openai import OpenAI
+                self._client = OpenAI(**self.client_kwargs())
+        return self._client
+
+    # -- fake ----------------------------------------------------------------
+    def fake_latency(self):
+        return self.config.get('latency', 0.5)
+
+    def fake_check(self):
+        if random.random() < self.config.get('error_rate', 0.0):
+            raise FakeProviderError(f"{self.name}: simulated failure")
+
+    # -- kết quả -------------------------------------------------------------
+    def record_success(self, seconds):
+        self.latency.observe(seconds)
+        self.breaker.record_success()
+
+    def record_failure(self, exc, seconds):
+        self.error_latency.observe(seconds)
+        with self._lock:
+            name = type(exc).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+        self.breaker.record_failure()
+        logger.warning("LLM provider %s failed after %.2fs: %s", self.name, seconds, exc)
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedges += 1
+
+    def record_hedge_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def hedge_delay(self):
+        """Chờ bao lâu trước khi gửi hedge; None = không hedge (tắt / chưa đủ mẫu)."""
+        if not _setting('LLM_HEDGE_ENABLED', True):
+            return None
+        return self.latency.quantile(_setting('LLM_HEDGE_QUANTILE', 0.95))
+
+    # -- gọi (sync) ----------------------------------------------------------
+    def complete(self, model, messages, temperature=0.7, max_tokens=2048):
+        """(reply, total_tokens); ghi latency / lỗi vào histogram + breaker."""
+        started = time.monotonic()
+        try:
+            if self.kind == 'fake':
+                time.sleep(self.fake_latency())
+                self.fake_check()
+                result = fake_reply(messages), 0
+            else:
+                response = self.client.chat.completions.create(
+                    model=self.model_for(model), messages=messages, temperature=temperature, max_tokens=max_tokens,
+                )
+                result = response.choices[0].message.content, getattr(response.usage, 'total_tokens', 0)
+        except Exception as exc:
+            self.record_failure(exc, time.monotonic() - started)
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    def stream(self, model, messages, temperature=0.7, max_tokens=2048):
+        """ProviderStream; lỗi khi mở stream được raise (caller thử provider kế tiếp)."""
+        started = time.monotonic()
+        try:
+            if self.kind == 'fake':
+                self.fake_check()
+                return self._fake_stream(messages)
+            response = self.client.chat.completions.create(
+                model=self.model_for(model), messages=messages, temperature=temperature, max_tokens=max_tokens,
+                stream=True,
+            )
+        except Exception as exc:
+            self.record_failure(exc, time.monotonic() - started)
+            raise
+        # latency cả stream không so được với completion -> chỉ cập nhật breaker
+        self.breaker.record_success()
+
+        def deltas():
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        return ProviderStream(deltas(), close=response.close)
+
+    def _fake_stream(self, messages):
+        words = fake_reply(messages).split(' ')
+        delay = self.fake_latency() / max(len(words), 1)
+
+        def deltas():
+            for i, word in enumerate(words):
+                if delay:
+                    time.sleep(delay)
+                yield word if i == 0 else ' ' + word
+        generator = deltas()
+        return ProviderStream(generator, close=generator.close)
+
+    def stats(self):
+        with self._lock:
+            counters = {'errors': dict(self.errors), 'hedges': self.hedges, 'hedge_wins': self.hedge_wins}
+        return {
+            'kind': self.kind,
+            'configured': self.is_configured(),
+            'breaker': self.breaker.state,
+            'breaker_opens': self.breaker.opens,
+            'consecutive_failures': self.breaker.failures,
+            'latency': self.latency.snapshot(),
+            'error_latency': self.error_latency.snapshot(),
+            **counters,
+        }
+
+
+# ----------------------------------------------------------------------------
+# Registry
+# ----------------------------------------------------------------------------
+_registry = None
+_registry_config = None
+_registry_lock = threading.Lock()
+
+
+def providers():
+    """Danh sách Provider theo thứ tự ưu tiên (dựng lại khi LLM_PROVIDERS đổi, vd override_settings)."""
+    global _registry, _registry_config
+    config = _setting('LLM_PROVIDERS', [])
+    with _registry_lock:
+        if _registry is None or config != _registry_config:
+            _registry = [Provider(dict(entry)) for entry in config]
+            _registry_config = [dict(entry) for entry in config]
+        return _registry
+
+
+def is_configured():
+    return any(provider.is_configured() for provider in providers())
+
+
+def pick(candidates, tried):
+    """Provider kế tiếp chưa thử, có cấu hình và circuit cho phép (đánh dấu đã thử); None nếu hết."""
+    for provider in candidates:
+        if provider.name not in tried and provider.is_configured() and provider.breaker.allow():
+            tried.add(provider.name)
+            return provider
+    return None
+
+
+def hedge_target(primary, candidates, tried):
+    """
+    Provider nhận hedge: provider khác chưa thử, có cấu hình và circuit đang đóng
+    (không dùng lượt thử half-open cho hedge); None nếu không có.
+    """
+    for provider in candidates:
+        if (provider is not primary and provider.name not in tried and provider.is_configured()
+                and provider.breaker.state == CircuitBreaker.CLOSED):
+            tried.add(provider.name)
+            primary.record_hedge()
+            return provider
+    return None
+
+
+def retry_after(candidates=None):
+    """Giây tới khi circuit sớm nhất cho thử lại (Retry-After của LLMUnavailable)."""
+    waits = [provider.breaker.retry_after() for provider in (candidates or providers())
+             if provider.breaker.state == CircuitBreaker.OPEN]
+    return max(1, int(min(waits)) + 1) if waits and min(waits) > 0 else None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _submit(fn, *args):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # mỗi request tối đa 2 lời gọi đồng thời (chính + hedge)
+            _executor = ThreadPoolExecutor(
+                max_workers=2 * _setting('LLM_SYNC_MAX_CONCURRENCY', 16), thread_name_prefix='llm-hedge'
+            )
+    return _executor.submit(fn, *args)
+
+
+def _release_when_done(futures):
+    """Trả slot của hedge khi mọi lời gọi đã kết thúc (kể cả lời gọi thua chạy ở thread nền)."""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            llm_guard.limiter.release()
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def _hedged(primary, candidates, delay, tried, args):
+    """Gọi primary; quá `delay` giây chưa xong thì gửi thêm một request, lấy kết quả đầu tiên thành công."""
+    first = _submit(primary.complete, *args)
+    done, _ = wait([first], timeout=delay)
+    if done or not llm_guard.limiter.try_acquire():
+        return first.result()  # xong rồi, hoặc process hết slot -> không gửi thêm
+    target = hedge_target(primary, candidates, tried)
+    if target is None:
+        llm_guard.limiter.release()
+        return first.result()
+    pending = {first, _submit(target.complete, *args)}
+    _release_when_done(list(pending))
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as exc:
+                error = exc
+                continue
+            if future is not first:
+                primary.record_hedge_win()
+            # request còn lại chạy tiếp ở thread nền (client sync không huỷ được); kết quả chỉ vào histogram
+            return result
+    raise error
+
+
+def complete(model, messages, temperature=0.7, max_tokens=2048):
+    """
+    (reply, total_tokens) từ provider đầu tiên thành công (theo thứ tự, bỏ qua
+    circuit đang mở, hedge khi chậm hơn p95). Hết provider -> LLMUnavailable.
+    """
+    candidates = providers()
+    args = (model, messages, temperature, max_tokens)
+    tried = set()
+    while True:
+        provider = pick(candidates, tried)
+        if provider is None:
+            raise LLMUnavailable(wait=retry_after(candidates))
+        delay = provider.hedge_delay()
+        try:
+            if delay is None:
+                return provider.complete(*args)
+            return _hedged(provider, candidates, delay, tried, args)
+        except Exception:
+            continue  # đã log + ghi histogram trong Provider.complete
+
+
+def open_stream(model, messages, **kwargs):
+    """ProviderStream từ provider đầu tiên mở được stream (không hedge: hedge stream tốn gấp đôi token)."""
+    candidates = providers()
+    tried = set()
+    while True:
+        provider = pick(candidates, tried)
+        if provider is None:
+            raise LLMUnavailable(wait=retry_after(candidates))
+        try:
+            return provider.stream(model, messages, **kwargs)
+        except Exception:
+            continue
+
+
+def stats():
+    return {provider.name: provider.stats() for provider in providers()}
@@ -0,0 +1,124 @@
+"""
+Streaming câu trả lời chatbot dưới dạng Server-Sent Events.
+
+Token từ provider được relay ngay khi tới:
+
+    event: delta   data: {"content": "..."}
+    event: done    data: {"message": "<toàn bộ câu trả lời>", "cached": false}
+    event: error   data: {"error": "..."}
+
+Client ngắt kết nối -> WSGI server gọi close() trên iterator -> đóng stream
+HTTP tới provider (không tốn thêm token). Khi stream xong trọn vẹn, câu trả
+lời được lưu vào llm_cache (và on_complete, nếu có); câu hỏi đã cache thì trả
+ngay một delta + done, không gọi provider.
+
+Provider lấy từ registry (app/utils/llm_providers.py): provider đầu tiên mở
+được stream, bỏ qua provider đang mở circuit; provider 'fake' cho test / dev.
+"""
+import json
+import logging
+import time
+
+from django.http import StreamingHttpResponse
+
+from . import llm_cache, llm_guard
+from .llm_providers import open_stream
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------------------------
+# SSE
+# ----------------------------------------------------------------------------
+def sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'.encode('utf-8')
+
+
+def wants_stream(request):
+    flag = request.data.get('stream') if hasattr(request, 'data') else None
+    if isinstance(flag, str):
+        flag = flag.lower() in ('1', 'true', 'yes')
+    return bool(flag) or 'text/event-stream' in request.META.get('HTTP_ACCEPT', '')
+
+
+def _cached_events(cached, on_complete=None):
+    yield sse_event('delta', {'content': cached})
+    yield sse_event('done', {'message': cached, 'cached': True})
+    if on_complete:
+        on_complete(cached)
+
+
+def _provider_events(model, messages, upstream, on_complete=None):
+    started = time.monotonic()
+    parts = []
+    try:
+        for delta in upstream:
+            parts.append(delta)
+            yield sse_event('delta', {'content': delta})
+    except GeneratorExit:
+        logger.info("Chat stream cancelled by client after %d chunks", len(parts))
+        raise
+    except Exception as exc:
+        logger.warning("Chat stream failed: %s", exc)
+        yield sse_event('error', {'error': 'AI service temporarily unavailable'})
+        return
+
+    message = ''.join(parts)
+    llm_cache.store(model, messages, message, latency=time.monotonic() - started)
+    if on_complete:
+        on_complete(message)
+    yield sse_event('done', {'message': message, 'cached': False})
+
+
+class _SlotStream:
+    """
+    Iterator giữ một slot của llm_guard.limiter và stream provider tới khi hết
+    hoặc bị close() (client ngắt -> huỷ request tới provider, kể cả khi chưa đọc chunk nào).
+    """
+
+    def __init__(self, events, upstream):
+        self._events = events
+        self._upstream = upstream
+        self._held = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._events)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        try:
+            self._events.close()
+            self._upstream.close()
+        finally:
+            if self._held:
+                self._held = False
+                llm_guard.limiter.release()
+
+
+def sse_response(model, messages, on_complete=None, **kwargs):
+    """
+    Câu hỏi chưa cache phải có slot trong llm_guard.limiter và một stream provider
+    đã mở trước khi gửi header: quá tải -> ServiceBusy, mọi provider lỗi ->
+    LLMUnavailable (503 + Retry-After) thay vì một stream chỉ có event error.
+    """
+    cached = llm_cache.lookup(model, messages)
+    if cached is not None:
+        events = _cached_events(cached, on_complete)
+    else:
+        llm_guard.limiter.acquire()
+        try:
+            upstream = open_stream(model, messages, **kwargs)
+        except BaseException:
+            llm_guard.limiter.release()
+            raise
+        events = _SlotStream(_provider_events(model, messages, upstream, on_complete), upstream)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: không buffer SSE
+    return response
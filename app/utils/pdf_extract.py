@@ -0,0 +1,25 @@
+"""
+Trích text từng trang của PDF, chạy trong process con (ProcessPoolExecutor).
+
+Module này cố ý không import Django / app.models để process con khởi động
+bằng "spawn" không cần django.setup(). pypdf là optional dependency.
+"""
+import unicodedata
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # optional dependency
+    PdfReader = None
+
+
+def extract_pages(path):
+    """List text (NFC) của từng trang; trang lỗi -> chuỗi rỗng."""
+    reader = PdfReader(path)
+    pages = []
+    for page in reader.pages:
+        try:
+            text = page.extract_text() or ''
+        except Exception:
+            text = ''
+        pages.append(unicodedata.normalize('NFC', text).replace('\x00', ''))
+    return pages
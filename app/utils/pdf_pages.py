@@ -0,0 +1,205 @@
+"""
+Per-page PDF delivery.
+
+Ingest (sau khi upload Book/UserBook) ghi PdfPageIndex (số trang, file đã
+ingest) và điền `pages` trên model. Endpoint /pages/ cắt một
+trang hoặc một khoảng trang thành PDF nhỏ độc lập bằng pypdf; PdfReader được
+mở trên file handle (không đọc cả file vào RAM) và giữ lại trong một LRU nhỏ
+theo process, các khoảng trang "nóng" được lưu trong cache Django.
+
+pypdf là optional dependency: thiếu thì ingest bỏ qua và endpoint trả 503.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from app.models import Book, UserBook, PdfPageIndex
+from . import response_cache
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # optional dependency
+    PdfReader = PdfWriter = None
+
+logger = logging.getLogger(__name__)
+
+READER_CACHE_SIZE = 8
+
+
+class PdfUnavailable(Exception):
+    pass
+
+
+def available():
+    return PdfReader is not None
+
+
+def kind_of(obj):
+    return PdfPageIndex.KIND_USER_BOOK if isinstance(obj, UserBook) else PdfPageIndex.KIND_BOOK
+
+
+# ----------------------------------------------------------------------------
+# Reader LRU (theo process)
+# ----------------------------------------------------------------------------
+class _OpenReader:
+    def __init__(self, path):
+        self.handle = open(path, 'rb')
+        self.reader = PdfReader(self.handle)
+        self.lock = threading.Lock()  # pypdf không thread-safe trên cùng reader
+        self.closed = False
+
+    def close(self):
+        """Gọi khi đang giữ self.lock: không đóng file dưới tay thread đang đọc."""
+        self.closed = True
+        self.handle.close()
+
+
+_readers = OrderedDict()
+_readers_lock = threading.Lock()
+
+
+def _open_reader(path):
+    if not available():
+        raise PdfUnavailable("pypdf is not installed")
+    key = (path, os.stat(path).st_mtime_ns)
+    with _readers_lock:
+        entry = _readers.get(key)
+        if entry is not None:
+            _readers.move_to_end(key)
+            return entry
+    entry = _OpenReader(path)
+    evicted = []
+    with _readers_lock:
+        current = _readers.setdefault(key, entry)
+        while len(_readers) > READER_CACHE_SIZE:
+            evicted.append(_readers.popitem(last=False)[1])
+    if current is not entry:
+        evicted.append(entry)  # thread khác vừa mở cùng file
+    for old in evicted:
+        # đóng ngoài _readers_lock: chờ thread đang đọc old xong mà không chặn các file khác
+        with old.lock:
+            old.close()
+    return current
+
+
+@contextmanager
+def _locked_reader(path):
+    """PdfReader của path, giữ lock của reader trong suốt khối with."""
+    while True:
+        entry = _open_reader(path)
+        entry.lock.acquire()
+        if not entry.closed:
+            break
+        entry.lock.release()  # bị evict giữa lúc lấy ra và lúc khoá -> mở lại
+    try:
+        yield entry.reader
+    finally:
+        entry.lock.release()
+
+
+# ----------------------------------------------------------------------------
+# Ingest
+# ----------------------------------------------------------------------------
+def ingest(obj):
+    """Index trang cho Book/UserBook và điền `pages`. Trả PdfPageIndex hoặc None."""
+    if not obj.pdf_file or not available():
+        return None
+    path = obj.pdf_file.path
+    with _locked_reader(path) as reader:
+        page_count = len(reader.pages)
+    index, _ = PdfPageIndex.objects.update_or_create(
+        kind=kind_of(obj), object_id=obj.pk,
+        defaults={
+            'file_name': obj.pdf_file.name,
+            'file_size': os.path.getsize(path),
+            'page_count': page_count,
+        },
+    )
+    # update() thay vì save() để không kích hoạt lại signal -> tự bump tag response cache
+    type(obj).objects.filter(pk=obj.pk).update(pages=page_count)
+    if isinstance(obj, Book):
+        tags = [response_cache.book_tag(obj.pk), response_cache.CATALOG_TAG]
+        transaction.on_commit(lambda: response_cache.invalidate(*tags))
+    return index
+
+
+def needs_ingest(obj):
+    if not obj.pdf_file or not available():
+        return False
+    return not PdfPageIndex.objects.filter(
+        kind=kind_of(obj), object_id=obj.pk, file_name=obj.pdf_file.name
+    ).exists()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run_ingest(model, pk):
+    try:
+        obj = model.objects.filter(pk=pk).first()
+        if obj is not None and needs_ingest(obj):
+            ingest(obj)
+    except Exception:
+        logger.exception("PDF page ingest failed for %s %s", model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule_ingest(obj):
+    """Chạy ingest ở thread nền để request upload không phải chờ parse PDF."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='pdf-ingest')
+    _executor.submit(_run_ingest, type(obj), obj.pk)
+
+
+# ----------------------------------------------------------------------------
+# Delivery
+# ----------------------------------------------------------------------------
+def page_count(obj):
+    index = PdfPageIndex.objects.filter(
+        kind=kind_of(obj), object_id=obj.pk, file_name=obj.pdf_file.name
+    ).values_list('page_count', flat=True).first()
+    if index is not None:
+        return index
+    with _locked_reader(obj.pdf_file.path) as reader:
+        return len(reader.pages)
+
+
+def _cache_key(path, start, end):
+    stat = os.stat(path)
+    raw = f'{path}|{stat.st_mtime_ns}|{stat.st_size}|{start}|{end}'
+    return 'pdfpages:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def page_etag(obj, start, end):
+    return '"%s"' % _cache_key(obj.pdf_file.path, start, end).split(':', 1)[1]
+
+
+def render_pages(obj, start, end):
+    """PDF độc lập chứa trang start..end (1-based, bao gồm hai đầu)."""
+    path = obj.pdf_file.path
+    key = _cache_key(path, start, end)
+    data = cache.get(key)
+    if data is None:
+        writer = PdfWriter()
+        with _locked_reader(path) as reader:
+            for number in range(start - 1, end):
+                writer.add_page(reader.pages[number])
+            out = io.BytesIO()
+            writer.write(out)
+        data = out.getvalue()
+        if len(data) <= getattr(settings, 'PDF_PAGE_CACHE_MAX_BYTES', 2 * 1024 * 1024):
+            cache.set(key, data, timeout=getattr(settings, 'PDF_PAGE_CACHE_TIMEOUT', 3600))
+    return data
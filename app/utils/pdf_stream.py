@@ -0,0 +1,184 @@
+"""
+Range-capable PDF delivery for /api/books/<id>/stream/.
+
+- URL được ký bằng TimestampSigner và hết hạn sau PDF_STREAM_URL_MAX_AGE giây.
+- Hỗ trợ Range (một khoảng byte) + If-Range; nhiều khoảng -> trả cả file (200).
+- PDF_STREAM_OFFLOAD = 'x-accel' | 'x-sendfile' giao việc gửi byte cho nginx /
+  apache; ngược lại trả FileResponse trên một RangeFile có fileno(), nên
+  wsgi.file_wrapper của gunicorn dùng sendfile() (zero-copy) và chỉ gửi đúng
+  Content-Length byte. Worker Python không bao giờ đọc cả file vào RAM.
+"""
+import io
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+from django.urls import reverse
+from django.utils.http import http_date, parse_http_date_safe
+
+SIGNING_SALT = 'app.pdf_stream'
+
+
+def _max_age():
+    return getattr(settings, 'PDF_STREAM_URL_MAX_AGE', 3600)
+
+
+def make_token(book_id):
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(str(book_id))
+
+
+def token_is_valid(token, book_id):
+    try:
+        value = signing.TimestampSigner(salt=SIGNING_SALT).unsign(token or '', max_age=_max_age())
+    except signing.BadSignature:  # gồm cả SignatureExpired
+        return False
+    return value == str(book_id)
+
+
+def signed_stream_url(request, book_id):
+    path = reverse('book_pdf_stream', args=[book_id]) + '?token=' + quote(make_token(book_id))
+    return request.build_absolute_uri(path)
+
+
+def parse_range(header, size):
+    """
+    'bytes=0-99' -> (0, 99). None nếu không có / không hỗ trợ (nhiều khoảng,
+    sai cú pháp) -> trả cả file. 'unsatisfiable' nếu khoảng nằm ngoài file.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start_s, sep, end_s = header[6:].strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if start_s == '':  # suffix: bytes=-500
+            length = int(end_s)
+            if length <= 0:
+                return 'unsatisfiable'
+            return max(size - length, 0), size - 1
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return 'unsatisfiable'
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+class RangeFile(io.RawIOBase):
+    """File-like giới hạn trong [start, end]; fileno() cho phép sendfile()."""
+
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self.name = path
+        self.start, self.end = start, end
+        self._file.seek(start)
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._file.tell() - self.start
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.tell()
+        elif whence == io.SEEK_END:
+            offset += self.end - self.start + 1
+        offset = min(max(offset, 0), self.end - self.start + 1)
+        self._file.seek(self.start + offset)
+        return offset
+
+    def read(self, size=-1):
+        remaining = self.end + 1 - self._file.tell()
+        if remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _validators(path):
+    stat = os.stat(path)
+    etag = '"%x-%x"' % (stat.st_size, int(stat.st_mtime))
+    return stat.st_size, etag, int(stat.st_mtime)
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag  # so sánh mạnh: ETag yếu không bao giờ khớp
+    since = parse_http_date_safe(if_range)
+    return since is not None and mtime <= since
+
+
+def _offload(response, name, path):
+    mode = getattr(settings, 'PDF_STREAM_OFFLOAD', None)
+    if mode == 'x-accel':
+        prefix = getattr(settings, 'PDF_STREAM_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix + quote(name)
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = path
+    else:
+        return False
+    return True
+
+
+def stream_file(request, fieldfile, filename=None):
+    """Response cho FieldFile (FileField) với Range / If-Range / offload."""
+    try:
+        path = fieldfile.path
+    except NotImplementedError:  # storage không phải local FS -> để storage tự phục vụ
+        return HttpResponseRedirect(fieldfile.url)
+    if not os.path.exists(path):
+        return HttpResponse(status=404)
+
+    size, etag, mtime = _validators(path)
+    filename = filename or os.path.basename(fieldfile.name)
+
+    offloaded = HttpResponse(content_type='application/pdf')
+    if _offload(offloaded, fieldfile.name, path):
+        # proxy tự xử lý Range / If-Range trên file thật
+        offloaded['ETag'] = etag
+        offloaded['Last-Modified'] = http_date(mtime)
+        offloaded['Content-Disposition'] = 'inline; filename="%s"' % quote(filename)
+        return offloaded
+
+    byte_range = None
+    if _if_range_matches(request, etag, mtime):
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type='application/pdf')
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(RangeFile(path, start, end), content_type='application/pdf', filename=filename)
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Cache-Control'] = 'private, max-age=%d' % _max_age()
+    return response
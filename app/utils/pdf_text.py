@@ -0,0 +1,234 @@
+"""
+Full-text search bên trong từng PDF.
+
+Text được trích theo trang trong process pool (app/utils/pdf_extract.py, context
+"spawn") để không chiếm CPU/GIL của web worker; process cha tokenize (cùng
+fold/tokenize với search metadata) và ghi:
+
+- PdfTextPage: text từng trang (để cắt snippet),
+- PdfTextTerm: positional index theo sách, term -> {trang: [vị trí token]},
+- PdfPageIndex.text_file_name: file đã được index (đổi file -> index lại).
+
+Book được duyệt từ UserBook dùng chung blob nên index được copy thay vì trích lại.
+search() hỗ trợ nhiều từ (trang phải chứa đủ các từ) và cụm từ trong "...".
+"""
+import logging
+import multiprocessing
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from app.models import PdfPageIndex, PdfTextPage, PdfTextTerm
+from . import response_cache
+from .pdf_extract import extract_pages
+from .pdf_pages import available, kind_of
+from .text import tokenize
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_SIZE = 500
+SNIPPET_TOKENS = 12  # số token mỗi bên của match
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+# ----------------------------------------------------------------------------
+# Process pool
+# ----------------------------------------------------------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def workers():
+    return getattr(settings, 'PDF_TEXT_WORKERS', 2)
+
+
+def process_pool(max_workers=None):
+    """ProcessPoolExecutor dùng chung trong process; 'spawn' để an toàn với thread."""
+    global _pool
+    if max_workers is not None:
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers(), mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+# ----------------------------------------------------------------------------
+# Index
+# ----------------------------------------------------------------------------
+def build_postings(pages):
+    postings = defaultdict(lambda: defaultdict(list))
+    for number, text in enumerate(pages, start=1):
+        for position, term in enumerate(tokenize(text)):
+            postings[term][str(number)].append(position)
+    return postings
+
+
+def needs_index(obj):
+    if not obj.pdf_file or not available():
+        return False
+    return not PdfPageIndex.objects.filter(
+        kind=kind_of(obj), object_id=obj.pk, text_file_name=obj.pdf_file.name
+    ).exists()
+
+
+def _clear_text(kind, object_id):
+    PdfTextPage.objects.filter(kind=kind, object_id=object_id).delete()
+    PdfTextTerm.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def remove(kind, object_id):
+    """
+    Sau khi xoá Book/UserBook: xoá text + cả dòng PdfPageIndex. Dòng còn lại với
+    text_file_name sẽ bị copy_from_twin chọn làm "twin" khi cùng blob được
+    upload lại (storage theo nội dung -> cùng tên file).
+    """
+    _clear_text(kind, object_id)
+    PdfPageIndex.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def write_index(kind, object_id, file_name, pages):
+    postings = build_postings(pages)
+    with transaction.atomic():
+        _clear_text(kind, object_id)
+        PdfTextPage.objects.bulk_create(
+            [PdfTextPage(kind=kind, object_id=object_id, page=n, text=t) for n, t in enumerate(pages, start=1)],
+            batch_size=WRITE_BATCH_SIZE,
+        )
+        PdfTextTerm.objects.bulk_create(
+            [PdfTextTerm(kind=kind, object_id=object_id, term=term, positions=dict(by_page))
+             for term, by_page in postings.items()],
+            batch_size=WRITE_BATCH_SIZE,
+        )
+        # file_name để trống khi tạo mới: ingest trang (pdf_pages) vẫn coi là chưa chạy
+        PdfPageIndex.objects.update_or_create(
+            kind=kind, object_id=object_id,
+            defaults={'text_file_name': file_name, 'text_indexed_at': timezone.now()},
+            create_defaults={'file_name': '', 'page_count': len(pages),
+                             'text_file_name': file_name, 'text_indexed_at': timezone.now()},
+        )
+        if kind == PdfPageIndex.KIND_BOOK:
+            transaction.on_commit(lambda: response_cache.invalidate(response_cache.book_tag(object_id)))
+    return len(postings)
+
+
+def copy_from_twin(kind, object_id, file_name):
+    """Nếu file này đã được index cho dòng khác (cùng blob, còn text) thì copy index."""
+    has_text = PdfTextPage.objects.filter(kind=OuterRef('kind'), object_id=OuterRef('object_id'))
+    twin = (PdfPageIndex.objects.filter(Exists(has_text), text_file_name=file_name)
+            .exclude(kind=kind, object_id=object_id).values_list('kind', 'object_id').first())
+    if twin is None:
+        return False
+    pages = list(PdfTextPage.objects.filter(kind=twin[0], object_id=twin[1]).order_by('page').values_list('text', flat=True))
+    write_index(kind, object_id, file_name, pages)
+    return True
+
+
+def index_object(obj, pool=None):
+    """Trích + index text của Book/UserBook (chặn tới khi xong, gọi từ thread nền / job)."""
+    if not needs_index(obj):
+        return False
+    kind, file_name = kind_of(obj), obj.pdf_file.name
+    if not copy_from_twin(kind, obj.pk, file_name):
+        pages = (pool or process_pool()).submit(extract_pages, obj.pdf_file.path).result()
+        write_index(kind, obj.pk, file_name, pages)
+    from . import vector_index
+    vector_index.schedule(obj)  # embed lại kèm đoạn đầu text vừa trích
+    return True
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run(model, pk):
+    try:
+        obj = model.objects.filter(pk=pk).first()
+        if obj is not None:
+            index_object(obj)
+    except Exception:
+        logger.exception("PDF text indexing failed for %s %s", model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule(obj):
+    """Index ở thread nền; thread chỉ chờ process pool nên web worker không bị chặn."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers(), thread_name_prefix='pdf-text')
+    _executor.submit(_run, type(obj), obj.pk)
+
+
+# ----------------------------------------------------------------------------
+# Query
+# ----------------------------------------------------------------------------
+def is_indexed(obj):
+    return obj.pdf_file and PdfPageIndex.objects.filter(
+        kind=kind_of(obj), object_id=obj.pk, text_file_name=obj.pdf_file.name
+    ).exists()
+
+
+def _phrase_hits(positions_by_term, terms, page):
+    """Số lần cả cụm `terms` xuất hiện liên tiếp trong trang + vị trí bắt đầu."""
+    first = positions_by_term[terms[0]].get(page, [])
+    others = [set(positions_by_term[t].get(page, [])) for t in terms[1:]]
+    return [p for p in first if all(p + i + 1 in s for i, s in enumerate(others))]
+
+
+def _snippet(text, position, length):
+    spans = [m.span() for m in _TOKEN_RE.finditer(text)]
+    if not spans:
+        return ''
+    position = min(position, len(spans) - 1)
+    first = max(0, position - SNIPPET_TOKENS)
+    last = min(len(spans) - 1, position + length - 1 + SNIPPET_TOKENS)
+    snippet = ' '.join(text[spans[first][0]:spans[last][1]].split())
+    return ('… ' if first > 0 else '') + snippet + (' …' if last < len(spans) - 1 else '')
+
+
+def search(obj, query, limit=20):
+    """
+    -> (results, total) với results = [{"page", "score", "snippet"}], sắp theo
+    score giảm dần. Query trong dấu nháy kép là tìm cụm từ.
+    """
+    query = (query or '').strip()
+    phrase = len(query) > 1 and query.startswith('"') and query.endswith('"')
+    terms = list(dict.fromkeys(tokenize(query))) if not phrase else tokenize(query)
+    if not terms:
+        return [], 0
+    kind = kind_of(obj)
+    rows = dict(PdfTextTerm.objects.filter(kind=kind, object_id=obj.pk, term__in=set(terms)).values_list('term', 'positions'))
+    if any(t not in rows for t in terms):
+        return [], 0
+
+    pages = set.intersection(*(set(rows[t]) for t in terms))
+    scored = []
+    for page in pages:
+        if phrase:
+            starts = _phrase_hits(rows, terms, page)
+            if starts:
+                scored.append((len(starts), int(page), starts[0], len(terms)))
+        else:
+            first = min(rows[t][page][0] for t in terms)
+            scored.append((sum(len(rows[t][page]) for t in terms), int(page), first, 1))
+    scored.sort(key=lambda s: (-s[0], s[1]))
+
+    top = scored[:limit]
+    texts = dict(PdfTextPage.objects.filter(
+        kind=kind, object_id=obj.pk, page__in=[s[1] for s in top]
+    ).values_list('page', 'text'))
+    results = [
+        {'page': page, 'score': score, 'snippet': _snippet(texts.get(page, ''), position, length)}
+        for score, page, position, length in top
+    ]
+    return results, len(scored)
+
@@ -0,0 +1,73 @@
+"""
+Thống kê rating tính sẵn trên Book (rating_count / rating_sum / rating_1..5).
+
+Review signal gọi apply_rating(); mỗi thay đổi là một UPDATE ... SET x = x + 1
+nên an toàn khi nhiều request ghi cùng lúc. reconcile() tính lại từ bảng Review
+để sửa lệch (manage.py reconcile_ratings).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+HISTOGRAM_RANGE = range(1, 6)
+RATING_FIELDS = ['rating_count', 'rating_sum'] + [f'rating_{i}' for i in HISTOGRAM_RANGE]
+
+
+def _rating_delta(rating, sign):
+    if rating is None:
+        return {}
+    delta = {'rating_count': F('rating_count') + sign, 'rating_sum': F('rating_sum') + sign * rating}
+    if rating in HISTOGRAM_RANGE:
+        field = f'rating_{rating}'
+        delta[field] = F(field) + sign
+    return delta
+
+
+def apply_rating(book_id, rating, sign):
+    """sign = +1 khi thêm review, -1 khi xoá (sửa = -1 cũ, +1 mới)."""
+    from app.models import Book
+    delta = _rating_delta(rating, sign)
+    if book_id and delta:
+        Book.objects.filter(pk=book_id).update(**delta)
+
+
+def compute_aggregates(Review, book_ids):
+    """{book_id: {field: value}} tính từ bảng Review cho các book_ids."""
+    out = defaultdict(lambda: dict.fromkeys(RATING_FIELDS, 0))
+    rows = (Review.objects.filter(book_id__in=book_ids, rating__isnull=False)
+            .values('book_id', 'rating').annotate(n=Count('id'), total=Sum('rating')))
+    for row in rows:
+        agg = out[row['book_id']]
+        agg['rating_count'] += row['n']
+        agg['rating_sum'] += row['total']
+        if row['rating'] in HISTOGRAM_RANGE:
+            agg[f"rating_{row['rating']}"] += row['n']
+    return out
+
+
+def reconcile(Book, Review, batch_size=1000, stdout=None):
+    """Tính lại toàn bộ theo lô id; chỉ ghi những Book bị lệch. Trả số Book đã sửa."""
+    fields = RATING_FIELDS
+    fixed = 0
+    last_id = 0
+    while True:
+        books = list(Book.objects.filter(pk__gt=last_id).order_by('pk').only('pk', *fields)[:batch_size])
+        if not books:
+            break
+        last_id = books[-1].pk
+        with transaction.atomic():
+            aggs = compute_aggregates(Review, [b.pk for b in books])
+            dirty = []
+            for book in books:
+                agg = aggs[book.pk]
+                if any(getattr(book, f) != agg[f] for f in fields):
+                    for f in fields:
+                        setattr(book, f, agg[f])
+                    dirty.append(book)
+            if dirty:
+                Book.objects.bulk_update(dirty, fields)
+                fixed += len(dirty)
+        if stdout:
+            stdout.write(f"Checked books up to id {last_id}, fixed {fixed}")
+    return fixed
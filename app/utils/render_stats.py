@@ -0,0 +1,57 @@
+"""
+Thống kê encode / nén theo endpoint (trong process hiện tại).
+
+Renderer ghi thời gian encode + số byte, middleware nén ghi số byte sau nén;
+/api/admin/render-stats/ trả snapshot.
+"""
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_stats = defaultdict(lambda: {
+    'responses': 0,
+    'encode_seconds': 0.0,
+    'encoded_bytes': 0,
+    'compressed_responses': 0,
+    'bytes_before_compression': 0,
+    'bytes_after_compression': 0,
+})
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.view_name:
+        return match.view_name
+    return getattr(request, 'path', 'unknown')
+
+
+def record_encode(endpoint, seconds, size):
+    with _lock:
+        row = _stats[endpoint]
+        row['responses'] += 1
+        row['encode_seconds'] += seconds
+        row['encoded_bytes'] += size
+
+
+def record_compression(endpoint, before, after):
+    with _lock:
+        row = _stats[endpoint]
+        row['compressed_responses'] += 1
+        row['bytes_before_compression'] += before
+        row['bytes_after_compression'] += after
+
+
+def snapshot():
+    with _lock:
+        out = {}
+        for endpoint, row in _stats.items():
+            data = dict(row)
+            data['bytes_saved'] = row['bytes_before_compression'] - row['bytes_after_compression']
+            data['avg_encode_ms'] = round(row['encode_seconds'] * 1000 / row['responses'], 3) if row['responses'] else 0
+            out[endpoint] = data
+        return out
+
+
+def reset():
+    with _lock:
+        _stats.clear()
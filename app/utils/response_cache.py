@@ -0,0 +1,201 @@
+"""
+View-level response cache with tag-based invalidation.
+
+Entries live in the default Django cache. Each entry remembers the version of
+every tag it depends on (e.g. "book:12", "author:rowling", "catalog"); a save
+bumps the versions of the affected tags only, and an entry whose recorded
+versions no longer match is treated as evicted on the next read. No key
+scanning is needed, so invalidation cost does not depend on cache size.
+
+Responses carry ETag / Last-Modified and conditional GETs get a 304.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+from .text import tokenize
+
+KEY_PREFIX = 'respcache'
+STATS_KEYS = ('hits', 'misses', 'not_modified', 'evictions', 'stores')
+
+
+def _timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+# ----------------------------------------------------------------------------
+# Tags
+# ----------------------------------------------------------------------------
+def book_tag(book_id):
+    return f'book:{book_id}'
+
+
+def author_tags(author):
+    """Tag cho tên tác giả đầy đủ + từng từ (books_by_author dùng icontains)."""
+    tokens = tokenize(author)
+    if not tokens:
+        return []
+    return list(dict.fromkeys([f"author:{' '.join(tokens)}"] + [f'author:{t}' for t in tokens]))
+
+
+def author_change_tags(author):
+    """
+    Tag cần bump khi một sách của `author` thêm / xoá / đổi tác giả: author_tags
+    cộng mọi tiền tố của từng từ, để danh sách theo một phần tên ("row" ->
+    "Rowling") cũng hết hạn. Khớp giữa từ ("owl") chỉ hết hạn theo timeout.
+    """
+    tokens = tokenize(author)
+    prefixes = [f'author:{t[:i]}' for t in tokens for i in range(1, len(t))]
+    return list(dict.fromkeys(author_tags(author) + prefixes))
+
+
+CATALOG_TAG = 'catalog'
+
+
+def _tag_key(tag):
+    # tag có thể chứa khoảng trắng / unicode -> băm cho hợp lệ với memcached/redis
+    return f'{KEY_PREFIX}:tag:' + hashlib.md5(tag.encode()).hexdigest()
+
+
+def _tag_versions(tags):
+    keys = {_tag_key(t): t for t in tags}
+    found = cache.get_many(list(keys))
+    return {tag: found.get(key, 0) for key, tag in keys.items()}
+
+
+def invalidate(*tags):
+    """Tăng version của tag -> mọi entry phụ thuộc tag đó hết hiệu lực."""
+    for tag in set(tags):
+        key = _tag_key(tag)
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:  # key vừa bị xoá giữa add và incr
+                cache.set(key, 1, timeout=None)
+
+
+# ----------------------------------------------------------------------------
+# Stats
+# ----------------------------------------------------------------------------
+def _count(name):
+    key = f'{KEY_PREFIX}:stats:{name}'
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def stats():
+    found = cache.get_many([f'{KEY_PREFIX}:stats:{n}' for n in STATS_KEYS])
+    data = {n: found.get(f'{KEY_PREFIX}:stats:{n}', 0) for n in STATS_KEYS}
+    lookups = data['hits'] + data['not_modified'] + data['misses']
+    data['hit_ratio'] = round((data['hits'] + data['not_modified']) / lookups, 4) if lookups else 0
+    return data
+
+
+# ----------------------------------------------------------------------------
+# Decorator
+# ----------------------------------------------------------------------------
+def _cache_key(request, vary_on_user):
+    if vary_on_user:
+        user = getattr(request, 'user', None)
+        auth = f'user:{user.pk}' if user is not None and user.is_authenticated else 'anon'
+    else:
+        auth = 'auth' if request.META.get('HTTP_AUTHORIZATION') else 'anon'
+    query = '&'.join(sorted(request.GET.urlencode().split('&')))
+    raw = '|'.join([
+        request.scheme, request.get_host(), request.path, query, auth,
+        request.META.get('HTTP_ACCEPT', ''),
+    ])
+    return f'{KEY_PREFIX}:entry:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        candidates = [t.strip() for t in if_none_match.split(',')]
+        return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and int(last_modified) <= since
+
+
+def _build_response(request, entry):
+    if _not_modified(request, entry['etag'], entry['last_modified']):
+        _count('not_modified')
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['content'], status=entry['status'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    for header, value in entry['headers'].items():
+        response[header] = value
+    return response
+
+
+def cache_response(tags, timeout=None, vary_on_user=False):
+    """
+    Cache response GET 200 của view. `tags(request, response_data, **view_kwargs)`
+    trả list tag mà response phụ thuộc (response_data là response.data của DRF).
+
+    `tags` được gọi hai lần: với response_data=None TRƯỚC khi chạy view, và
+    version của các tag đó được chụp lúc này -> ghi xảy ra trong lúc view đang
+    đọc DB làm entry hết hạn ngay, không lưu dữ liệu cũ với version mới. Tag chỉ
+    biết được từ response_data (vd. id từng sách) thì đọc version sau view, nên
+    view như vậy phải có thêm một tag biết trước bao trùm chúng (CATALOG_TAG).
+
+    Đặt decorator NGOÀI @api_view:
+
+        @cache_response(tags=lambda request, data, book_id: [book_tag(book_id)])
+        @api_view(['GET'])
+        def book_detail_view(request, book_id): ...
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not getattr(settings, 'RESPONSE_CACHE_ENABLED', True):
+                return view(request, *args, **kwargs)
+
+            key = _cache_key(request, vary_on_user)
+            entry = cache.get(key)
+            if entry is not None:
+                if _tag_versions(entry['tags']) == entry['tag_versions']:
+                    _count('hits')
+                    return _build_response(request, entry)
+                _count('evictions')
+                cache.delete(key)
+            _count('misses')
+
+            known_versions = _tag_versions(list(dict.fromkeys(tags(request, None, *args, **kwargs))))
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+
+            entry_tags = list(dict.fromkeys([
+                *known_versions, *tags(request, getattr(response, 'data', None), *args, **kwargs),
+            ]))
+            tag_versions = _tag_versions([t for t in entry_tags if t not in known_versions])
+            tag_versions.update(known_versions)
+            content = response.content
+            entry = {
+                'content': content,
+                'status': response.status_code,
+                'content_type': response['Content-Type'],
+                'headers': {h: response[h] for h in ('Vary', 'Allow') if response.has_header(h)},
+                'etag': '"%s"' % hashlib.md5(content).hexdigest(),
+                'last_modified': time.time(),
+                'tags': entry_tags,
+                'tag_versions': tag_versions,
+            }
+            cache.set(key, entry, timeout=timeout if timeout is not None else _timeout())
+            _count('stores')
+            return _build_response(request, entry)
+        return wrapper
+    return decorator
@@ -0,0 +1,252 @@
+"""
+Inverted index + BM25 ranking for the book catalog.
+
+Documents are Book rows and approved UserBook rows. Every document is split
+into accent-folded tokens (title/author/description, weighted per field) and
+stored as postings in SearchPosting; SearchTerm keeps the document frequency
+of each term so a query only touches the posting lists of its own terms.
+"""
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from app.models import Book, UserBook, SearchDocument, SearchTerm, SearchPosting
+from .text import tokenize
+
+FIELD_WEIGHTS = {'title': 3, 'author': 2, 'description': 1}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STATS_CACHE_KEY = 'search_index_stats'
+STATS_CACHE_TIMEOUT = 60
+
+
+def _max_postings_per_term():
+    return getattr(settings, 'SEARCH_MAX_POSTINGS_PER_TERM', 5000)
+
+
+# ----------------------------------------------------------------------------
+# Indexing
+# ----------------------------------------------------------------------------
+def document_terms(obj):
+    """Counter term -> weighted tf cho một Book/UserBook."""
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(getattr(obj, field, None)):
+            counts[token] += weight
+    return counts
+
+
+def kind_of(obj):
+    return SearchDocument.KIND_USER_BOOK if isinstance(obj, UserBook) else SearchDocument.KIND_BOOK
+
+
+def is_indexable(obj):
+    return not isinstance(obj, UserBook) or obj.is_approved
+
+
+def _adjust_df(terms, delta):
+    if not terms:
+        return
+    if delta > 0:
+        SearchTerm.objects.bulk_create(
+            [SearchTerm(term=t, df=0) for t in terms], ignore_conflicts=True
+        )
+    SearchTerm.objects.filter(term__in=terms).update(df=F('df') + delta)
+
+
+@transaction.atomic
+def index_object(obj):
+    """Thêm / cập nhật một tài liệu; chỉ ghi những term thật sự thay đổi."""
+    if not is_indexable(obj):
+        remove_object(obj)
+        return
+
+    kind = kind_of(obj)
+    terms = document_terms(obj)
+    doc, _ = SearchDocument.objects.get_or_create(kind=kind, object_id=obj.pk)
+
+    old = dict(doc.postings.values_list('term', 'tf'))
+    added = [t for t in terms if t not in old]
+    removed = [t for t in old if t not in terms]
+    changed = [t for t in terms if t in old and old[t] != terms[t]]
+
+    if removed:
+        doc.postings.filter(term__in=removed).delete()
+    for t in changed:
+        doc.postings.filter(term=t).update(tf=terms[t])
+    SearchPosting.objects.bulk_create(
+        [SearchPosting(term=t, document=doc, tf=terms[t]) for t in added]
+    )
+    _adjust_df(added, 1)
+    _adjust_df(removed, -1)
+
+    length = sum(terms.values())
+    if doc.length != length:
+        doc.length = length
+        doc.save(update_fields=['length'])
+    cache.delete(STATS_CACHE_KEY)
+
+
+def remove_object(obj):
+    remove_document(kind_of(obj), obj.pk)
+
+
+@transaction.atomic
+def remove_document(kind, object_id):
+    doc = SearchDocument.objects.filter(kind=kind, object_id=object_id).first()
+    if doc is None:
+        return
+    _adjust_df(list(doc.postings.values_list('term', flat=True)), -1)
+    doc.delete()
+    cache.delete(STATS_CACHE_KEY)
+
+
+def _sources():
+    return [
+        (SearchDocument.KIND_BOOK, Book.objects.only('id', 'title', 'author')),
+        (SearchDocument.KIND_USER_BOOK,
+         UserBook.objects.filter(is_approved=True).only('id', 'title', 'author', 'description')),
+    ]
+
+
+def rebuild(batch_size=1000, stdout=None):
+    """
+    Dựng lại index theo lô (dùng bởi manage.py rebuild_search_index).
+
+    Mỗi lô là một transaction ngắn thay bản cũ của đúng những tài liệu trong lô
+    -> search luôn thấy index đầy đủ (bản cũ hoặc mới của từng tài liệu), và
+    index_object() của signal chỉ phải chờ lô đang ghi chứ không chờ cả catalog.
+    Sau đó xoá tài liệu không còn nguồn và tính lại df từ posting (một UPDATE
+    mỗi lô term, không ghi đè thay đổi của signal chạy cùng lúc).
+    """
+    terms = set()
+    total = 0
+    for kind, qs in _sources():
+        last = 0
+        while True:
+            # đọc lại dòng trong transaction của lô: sửa đổi commit sau đó thì
+            # index_object() của nó chạy sau lô và ghi đè bản của lô
+            done = _replace_batch(kind, qs.filter(pk__gt=last).order_by('id')[:batch_size], terms)
+            if done is None:
+                break
+            last, count = done
+            total += count
+        if stdout:
+            stdout.write(f"Indexed {kind}: {total} documents so far")
+
+    _drop_orphans(batch_size)
+    _recount_df(terms, batch_size)
+    cache.delete(STATS_CACHE_KEY)
+    return total
+
+
+@transaction.atomic
+def _replace_batch(kind, qs, terms):
+    """Thay tài liệu của một lô; trả (pk cuối, số dòng) hoặc None khi hết."""
+    batch = [(obj.pk, document_terms(obj)) for obj in qs]
+    if not batch:
+        return None
+    SearchDocument.objects.filter(kind=kind, object_id__in=[pk for pk, _ in batch]).delete()
+    docs = SearchDocument.objects.bulk_create([
+        SearchDocument(kind=kind, object_id=pk, length=sum(doc_terms.values()))
+        for pk, doc_terms in batch
+    ])
+    # MySQL không trả pk sau bulk_create -> đọc lại theo object_id
+    ids = dict(SearchDocument.objects.filter(
+        kind=kind, object_id__in=[d.object_id for d in docs]
+    ).values_list('object_id', 'id'))
+    postings = []
+    for pk, doc_terms in batch:
+        for term, tf in doc_terms.items():
+            postings.append(SearchPosting(term=term, document_id=ids[pk], tf=tf))
+            terms.add(term)
+    SearchPosting.objects.bulk_create(postings, batch_size=5000)
+    return batch[-1][0], len(batch)
+
+
+def _drop_orphans(batch_size):
+    """Xoá SearchDocument của sách đã xoá / UserBook bị bỏ duyệt."""
+    for kind, qs in _sources():
+        last = 0
+        while True:
+            chunk = list(SearchDocument.objects.filter(kind=kind, id__gt=last)
+                         .order_by('id').values_list('id', 'object_id')[:batch_size])
+            if not chunk:
+                break
+            last = chunk[-1][0]
+            alive = set(qs.filter(pk__in=[oid for _, oid in chunk]).values_list('pk', flat=True))
+            orphans = [doc_id for doc_id, oid in chunk if oid not in alive]
+            if orphans:
+                SearchDocument.objects.filter(id__in=orphans).delete()
+
+
+def _recount_df(terms, batch_size):
+    """df = số posting của term; term mới (chưa có dòng) được tạo trước."""
+    new_terms = sorted(terms)
+    for i in range(0, len(new_terms), batch_size):
+        SearchTerm.objects.bulk_create(
+            [SearchTerm(term=t, df=0) for t in new_terms[i:i + batch_size]], ignore_conflicts=True
+        )
+    postings = (SearchPosting.objects.filter(term=OuterRef('term')).order_by()
+                .values('term').annotate(n=Count('id')).values('n'))
+    last = 0
+    while True:
+        ids = list(SearchTerm.objects.filter(id__gt=last).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        last = ids[-1]
+        SearchTerm.objects.filter(id__in=ids).update(df=Coalesce(Subquery(postings), 0))
+
+
+# ----------------------------------------------------------------------------
+# Query
+# ----------------------------------------------------------------------------
+def _collection_stats():
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        agg = SearchDocument.objects.aggregate(total=Sum('length'))
+        n = SearchDocument.objects.count()
+        stats = (n, (agg['total'] or 0) / n if n else 0.0)
+        cache.set(STATS_CACHE_KEY, stats, timeout=STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def search(query, offset=0, limit=20):
+    """
+    Trả (hits, total). hits = [(kind, object_id, score)] đã sắp theo BM25 giảm dần.
+
+    Mỗi posting list chỉ đọc tối đa SEARCH_MAX_POSTINGS_PER_TERM dòng có tf cao
+    nhất (index (term, -tf)), nên chi phí truy vấn không tăng theo kích thước catalog.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return [], 0
+
+    n_docs, avgdl = _collection_stats()
+    if not n_docs:
+        return [], 0
+
+    dfs = dict(SearchTerm.objects.filter(term__in=terms, df__gt=0).values_list('term', 'df'))
+    scores = Counter()
+    cap = _max_postings_per_term()
+    for term, df in dfs.items():
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        rows = (SearchPosting.objects.filter(term=term).order_by('-tf')
+                .values_list('document_id', 'tf', 'document__length')[:cap])
+        for doc_id, tf, length in rows:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (avgdl or 1))
+            scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+    total = len(scores)
+    ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[offset:offset + limit]
+    docs = SearchDocument.objects.in_bulk([doc_id for doc_id, _ in ranked])
+    hits = [(docs[doc_id].kind, docs[doc_id].object_id, round(score, 4))
+            for doc_id, score in ranked if doc_id in docs]
+    return hits, total
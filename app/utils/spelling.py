@@ -0,0 +1,240 @@
+"""
+"Did you mean" corrections built from the catalog vocabulary.
+
+Vocabulary = words of Book.title_folded / Book.author_folded (already
+accent-folded, so "dac nhan tam" and "Đắc Nhân Tâm" share keys). Lookups use
+a symmetric-delete index: every word is stored under all strings obtainable by
+deleting up to MAX_EDIT_DISTANCE characters, and a query word only has to
+generate its own deletes and intersect — no scan over the vocabulary.
+
+The index is built once per process on first use and patched by the Book
+save/delete signals of this process. Every change also bumps a version in the
+shared cache; a worker that sees a version it has not applied (checked at most
+every SPELLING_INDEX_CHECK_SECONDS) rebuilds in a background thread and swaps
+the new index in, so requests never wait for a reload.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from app.models import Book
+from .text import tokenize
+
+logger = logging.getLogger(__name__)
+
+MAX_EDIT_DISTANCE = 2
+MIN_WORD_LENGTH = 2
+MAX_CANDIDATES_PER_TOKEN = 3
+MAX_CORRECTED_TOKENS = 8   # token lạ sau giới hạn này được giữ nguyên
+VERSION_KEY = 'spelling:version'
+
+
+def _max_distance(word):
+    return 1 if len(word) <= 4 else MAX_EDIT_DISTANCE
+
+
+def _deletes(word, distance):
+    out = {word}
+    frontier = {word}
+    for _ in range(distance):
+        nxt = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein (optimal string alignment); trả limit + 1 nếu vượt ngưỡng."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        best = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if (prev2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+            best = min(best, cur[j])
+        if best > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SpellingIndex:
+    def __init__(self):
+        self.freq = Counter()              # word -> số lần xuất hiện trong catalog
+        self._deletes = defaultdict(set)   # delete-variant -> {word}
+        self._lock = threading.Lock()
+        self.version = 0                   # version (cache) mà index này đã phản ánh
+
+    def _add_word(self, word):
+        if len(word) < MIN_WORD_LENGTH:
+            return
+        if word not in self.freq:
+            for d in _deletes(word, _max_distance(word)):
+                self._deletes[d].add(word)
+        self.freq[word] += 1
+
+    def add_text(self, *texts):
+        with self._lock:
+            for text in texts:
+                for word in tokenize(text):
+                    self._add_word(word)
+
+    def remove_text(self, *texts):
+        # giữ lại delete-variant; từ có freq 0 bị bỏ qua khi tra cứu
+        with self._lock:
+            for text in texts:
+                for word in tokenize(text):
+                    if self.freq.get(word, 0) > 0:
+                        self.freq[word] -= 1
+
+    def known(self, word):
+        return self.freq.get(word, 0) > 0
+
+    def candidates(self, word, limit=MAX_CANDIDATES_PER_TOKEN):
+        """[(word, distance)] gần nhất, ưu tiên khoảng cách nhỏ rồi tần suất cao."""
+        if self.known(word):
+            return [(word, 0)]
+        max_d = _max_distance(word)
+        found = {}
+        for d in _deletes(word, max_d):
+            for cand in self._deletes.get(d, ()):
+                if cand in found or not self.known(cand):
+                    continue
+                dist = edit_distance(word, cand, max_d)
+                if dist <= max_d:
+                    found[cand] = dist
+        ranked = sorted(found.items(), key=lambda kv: (kv[1], -self.freq[kv[0]], kv[0]))
+        return ranked[:limit]
+
+    def correct_query(self, query, max_queries=3):
+        """
+        Các query đã sửa (khác query gốc), tốt nhất trước. Beam search qua từng
+        token, giữ max_queries + 1 tổ hợp tốt nhất (chi phí tuyến tính theo số
+        token); tối đa MAX_CORRECTED_TOKENS token lạ được sửa.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        width = max_queries + 1  # + 1: một tổ hợp có thể chính là query gốc
+        beam = [(0, 0, [])]      # (tổng khoảng cách, -tổng tần suất, words)
+        corrected = 0
+        for token in tokens:
+            options = [(token, 0)]
+            if corrected < MAX_CORRECTED_TOKENS:
+                options = self.candidates(token) or options
+                if options[0] != (token, 0):
+                    corrected += 1
+            beam = sorted(
+                ((cost + d, neg_freq - self.freq.get(w, 0), words + [w])
+                 for cost, neg_freq, words in beam for w, d in options),
+                key=lambda item: (item[0], item[1], item[2]),
+            )[:width]
+        original = ' '.join(tokens)
+        out = []
+        for _, _, words in beam:
+            text = ' '.join(words)
+            if text != original and text not in out:
+                out.append(text)
+            if len(out) >= max_queries:
+                break
+        return out
+
+
+_index = None
+_index_lock = threading.Lock()
+_reloading = False
+_checked_at = 0.0
+
+
+def _check_seconds():
+    return getattr(settings, 'SPELLING_INDEX_CHECK_SECONDS', 30)
+
+
+def _build():
+    index = SpellingIndex()
+    index.version = cache.get(VERSION_KEY, 0)  # đọc trước khi quét: thay đổi trong lúc quét -> reload lần sau
+    rows = Book.objects.values_list('title_folded', 'author_folded')
+    for title, author in rows.iterator(chunk_size=5000):
+        index.add_text(title, author)
+    return index
+
+
+def _reload():
+    global _index, _reloading
+    try:
+        _index = _build()
+    except Exception:
+        logger.exception("Spelling index reload failed")
+    finally:
+        _reloading = False
+        close_old_connections()
+
+
+def _maybe_reload(index):
+    """Worker khác đã đổi catalog -> dựng lại ở thread nền, request vẫn dùng index cũ."""
+    global _reloading, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < _check_seconds():
+        return
+    with _index_lock:
+        if _reloading or now - _checked_at < _check_seconds():
+            return
+        _checked_at = now
+        if cache.get(VERSION_KEY, 0) == index.version:
+            return
+        _reloading = True
+    threading.Thread(target=_reload, name='spelling-reload', daemon=True).start()
+
+
+def get_index():
+    global _index, _checked_at
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index = _build()
+                _checked_at = time.monotonic()
+            return _index
+    _maybe_reload(index)
+    return index
+
+
+def _bump_version():
+    if cache.add(VERSION_KEY, 1, timeout=None):
+        return 1
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:  # key vừa bị xoá giữa add và incr
+        cache.set(VERSION_KEY, 1, timeout=None)
+        return 1
+
+
+def book_changed(old_texts, new_texts):
+    """Gọi từ signal: old_texts/new_texts là (title_folded, author_folded) hoặc None."""
+    version = _bump_version()
+    index = _index
+    if index is None:
+        return
+    if old_texts:
+        index.remove_text(*old_texts)
+    if new_texts:
+        index.add_text(*new_texts)
+    if version == index.version + 1:
+        index.version = version  # không có thay đổi nào của worker khác bị bỏ lỡ
@@ -0,0 +1,182 @@
+"""
+In-memory prefix index for typeahead (/api/books/suggest/).
+
+Each worker process keeps a sorted list of (key, book_id, field) tuples, where
+key is the accent-folded title/author starting at each of its first few word
+boundaries ("harry potter" is reachable from "har" and from "pot"). A lookup is
+one bisect plus a short forward scan, so it never touches the database.
+
+The index is loaded lazily on first use, patched by the Book save/delete
+signals of this process (copy-on-write, so readers never see a half-applied
+change) and rebuilt in a background thread every SUGGEST_INDEX_REFRESH_SECONDS
+so other workers' writes show up too; requests keep using the old index until
+the new one is swapped in.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from app.models import Book
+from .text import fold
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('title', 'author')
+
+
+def _keys_for(text, max_word_starts):
+    folded = ' '.join(fold(text).split())
+    if not folded:
+        return []
+    keys = [folded]
+    pos = 0
+    while len(keys) < max_word_starts:
+        pos = folded.find(' ', pos) + 1
+        if not pos:
+            break
+        keys.append(folded[pos:])
+    return keys
+
+
+class PrefixIndex:
+    """
+    Trạng thái (entries, books) nằm trong một tuple duy nhất; ghi luôn dựng
+    list / dict mới rồi gán lại một lần -> suggest() đọc một tham chiếu là có
+    bản nhất quán, không cần lock. Ghi (hiếm: theo signal Book) tốn O(n).
+    """
+
+    def __init__(self, max_word_starts=4):
+        self.max_word_starts = max_word_starts
+        self._state = ([], {})  # (sorted [(key, book_id, field)], book_id -> (title, author))
+        self._lock = threading.Lock()  # chỉ tuần tự hoá các lần ghi
+        self.loaded_at = None
+
+    def __len__(self):
+        return len(self._state[0])
+
+    def _entries_for(self, book_id, title, author):
+        out = []
+        for field, text in zip(FIELDS, (title, author)):
+            for key in _keys_for(text, self.max_word_starts):
+                out.append((key, book_id, field))
+        return out
+
+    def load(self, rows):
+        """rows: iterable (id, title, author). Dựng lại toàn bộ index."""
+        entries, books = [], {}
+        for book_id, title, author in rows:
+            books[book_id] = (title, author)
+            entries.extend(self._entries_for(book_id, title, author))
+        entries.sort()
+        with self._lock:
+            self._state = (entries, books)
+            self.loaded_at = time.monotonic()
+
+    def _replace_locked(self, book_id, row):
+        entries, books = self._state
+        old = books.get(book_id)
+        if old is None and row is None:
+            return
+        stale = set(self._entries_for(book_id, *old)) if old is not None else set()
+        entries = [e for e in entries if e not in stale] if stale else list(entries)
+        books = dict(books)
+        books.pop(book_id, None)
+        if row is not None:
+            books[book_id] = row
+            for entry in self._entries_for(book_id, *row):
+                insort(entries, entry)
+        self._state = (entries, books)
+
+    def upsert(self, book_id, title, author):
+        with self._lock:
+            self._replace_locked(book_id, (title, author))
+
+    def remove(self, book_id):
+        with self._lock:
+            self._replace_locked(book_id, None)
+
+    def suggest(self, prefix, limit=10):
+        prefix = ' '.join(fold(prefix).split())
+        if not prefix:
+            return []
+        entries, books = self._state
+        out, seen = [], set()
+        i = bisect_left(entries, (prefix,))
+        while i < len(entries) and len(out) < limit:
+            key, book_id, field = entries[i]
+            if not key.startswith(prefix):
+                break
+            i += 1
+            if (book_id, field) in seen or book_id not in books:
+                continue
+            seen.add((book_id, field))
+            title, author = books[book_id]
+            out.append({
+                'id': book_id,
+                'title': title,
+                'author': author,
+                'field': field,
+                'text': title if field == 'title' else author,
+            })
+        return out
+
+
+_index = None
+_index_lock = threading.Lock()
+_reloading = False
+
+
+def _refresh_seconds():
+    return getattr(settings, 'SUGGEST_INDEX_REFRESH_SECONDS', 300)
+
+
+def _build():
+    index = PrefixIndex(getattr(settings, 'SUGGEST_MAX_WORD_STARTS', 4))
+    index.load(Book.objects.values_list('id', 'title', 'author').iterator(chunk_size=5000))
+    return index
+
+
+def _reload():
+    global _index, _reloading
+    try:
+        _index = _build()
+    except Exception:
+        logger.exception("Suggest index reload failed")
+    finally:
+        _reloading = False
+        close_old_connections()
+
+
+def get_index():
+    """
+    Index của process hiện tại. Lần đầu nạp đồng bộ từ DB; quá hạn refresh thì
+    dựng bản mới ở thread nền và thay tham chiếu một lần, request vẫn dùng bản cũ.
+    """
+    global _index, _reloading
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index = _build()
+            return _index
+    if time.monotonic() - index.loaded_at >= _refresh_seconds() and not _reloading:
+        with _index_lock:
+            if _reloading or _index is not index:
+                return _index
+            _reloading = True
+        threading.Thread(target=_reload, name='suggest-reload', daemon=True).start()
+    return index
+
+
+def book_saved(book):
+    if _index is not None:
+        _index.upsert(book.pk, book.title, book.author)
+
+
+def book_deleted(book_id):
+    if _index is not None:
+        _index.remove(book_id)
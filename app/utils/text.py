@@ -0,0 +1,20 @@
+"""Chuẩn hoá văn bản dùng chung cho search / typeahead / spelling."""
+import re
+import unicodedata
+
+MAX_TERM_LENGTH = 64
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fold(text):
+    """Lowercase + bỏ dấu tiếng Việt ("Đắc Nhân Tâm" -> "dac nhan tam")."""
+    if not text:
+        return ''
+    text = text.lower().replace('đ', 'd')
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    return [t[:MAX_TERM_LENGTH] for t in _TOKEN_RE.findall(fold(text))]
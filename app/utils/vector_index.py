@@ -0,0 +1,656 @@
+"""
+Vector index cho catalog (RAG của chatbot "book advisor").
+
+Book và UserBook đã duyệt được embed (title, author, description + đoạn đầu
+text PDF nếu đã trích) bằng feature hashing như llm_cache.embed, rồi lưu trong
+các file NumPy memory-mapped dưới VECTOR_INDEX_DIR:
+
+    meta.json              {"epoch", "dim", "count", "capacity", "nlist", "sorted"}
+    <epoch>/vectors.f32    (capacity, dim) float32, đã chuẩn hoá L2
+    <epoch>/keys.i64       key = pk * 2 + kind; -1 = đã xoá / bị thay
+    <epoch>/lists.i32      cụm IVF của từng dòng (-1 khi chưa train)
+    <epoch>/centroids.npy  (nlist, dim) — chỉ có sau khi train
+    <epoch>/bounds.npy     dòng [0, sorted) xếp theo cụm: cụm c = [bounds[c], bounds[c+1])
+
+Cập nhật tăng dần: upsert() đánh dấu -1 dòng cũ của key rồi append dòng mới
+(ghi dưới file lock); process khác thấy meta.json đổi thì chỉ nạp phần dòng mới.
+`manage.py build_vector_index` dựng lại toàn bộ vào epoch mới, train k-means
+(IVF) khi đủ lớn rồi đổi meta.json một lần.
+
+Mỗi process mở index ở thread nền (warm_up, gọi từ AppConfig.ready); trong lúc
+đó retrieve() trả rỗng thay vì bắt request đầu tiên chờ mmap + dựng lists.
+
+Truy vấn top-k cosine theo lô: dưới VECTOR_INDEX_IVF_MIN_VECTORS -> quét hết
+bằng một phép nhân ma trận (chính xác, vài ms); lớn hơn -> chỉ chấm các dòng
+thuộc VECTOR_INDEX_NPROBE cụm gần nhất (~nprobe/nlist dữ liệu, mỗi cụm là một
+khoảng dòng liên tục), giữ độ trễ vài ms ở 1M vector
+(`manage.py build_vector_index --bench 1000000`).
+
+NumPy là optional dependency: thiếu thì available() = False và chatbot chạy
+không có RAG.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from app.models import Book, UserBook, PdfPageIndex, PdfTextPage
+from .llm_cache import cosine, embed
+from .text import fold
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: chỉ khoá trong process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+KIND_BOOK = 0
+KIND_USER_BOOK = 1
+EXACT_CHUNK_ROWS = 1 << 18
+MIN_ROWS_PER_LIST = 40  # mỗi cụm IVF có trung bình ít nhất 40 vector
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def available():
+    return np is not None and _setting('RAG_ENABLED', True)
+
+
+def index_dir():
+    return _setting('VECTOR_INDEX_DIR', os.path.join(settings.BASE_DIR, 'vector_index'))
+
+
+def dim():
+    return _setting('VECTOR_INDEX_DIM', 256)
+
+
+# ----------------------------------------------------------------------------
+# Keys + embedding
+# ----------------------------------------------------------------------------
+def key_for(obj):
+    return obj.pk * 2 + (KIND_USER_BOOK if isinstance(obj, UserBook) else KIND_BOOK)
+
+
+def split_key(key):
+    return int(key) % 2, int(key) // 2
+
+
+def is_indexable(obj):
+    return not isinstance(obj, UserBook) or obj.is_approved
+
+
+def document_text(obj):
+    """Title nhân đôi trọng số + author + description + đầu text PDF."""
+    parts = [obj.title, obj.title, obj.author or '', getattr(obj, 'description', None) or '']
+    limit = _setting('VECTOR_INDEX_TEXT_CHARS', 2000)
+    if limit:
+        kind = PdfPageIndex.KIND_USER_BOOK if isinstance(obj, UserBook) else PdfPageIndex.KIND_BOOK
+        text = []
+        for page_text in PdfTextPage.objects.filter(kind=kind, object_id=obj.pk).order_by('page') \
+                .values_list('text', flat=True)[:5]:
+            text.append(page_text)
+            if sum(map(len, text)) >= limit:
+                break
+        parts.append(' '.join(text)[:limit])
+    return ' '.join(p for p in parts if p)
+
+
+def embed_texts(texts):
+    """(n, dim) float32, mỗi dòng đã chuẩn hoá L2 (dòng rỗng = vector 0)."""
+    d = dim()
+    out = np.zeros((len(texts), d), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for index, weight in embed(text, d).items():
+            out[row, index] = weight
+    return out
+
+
+# ----------------------------------------------------------------------------
+# Files
+# ----------------------------------------------------------------------------
+def _meta_path(root):
+    return os.path.join(root, 'meta.json')
+
+
+def _read_meta(root):
+    try:
+        with open(_meta_path(root)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(root, meta):
+    tmp = _meta_path(root) + '.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(meta, fh)
+    os.replace(tmp, _meta_path(root))
+
+
+def _array_path(root, epoch, name):
+    return os.path.join(root, epoch, name)
+
+
+ARRAYS = {'vectors.f32': 'float32', 'keys.i64': 'int64', 'lists.i32': 'int32'}
+
+
+def _open_arrays(root, meta, mode='r'):
+    d, capacity = meta['dim'], meta['capacity']
+    shapes = {'vectors.f32': (capacity, d), 'keys.i64': (capacity,), 'lists.i32': (capacity,)}
+    return {
+        name: np.memmap(_array_path(root, meta['epoch'], name), dtype=dtype, mode=mode, shape=shapes[name])
+        for name, dtype in ARRAYS.items()
+    }
+
+
+def _grow(root, meta, needed):
+    """Tăng capacity (gấp đôi) bằng cách nới file; dòng mới chưa dùng tới."""
+    capacity = max(meta['capacity'], 1024)
+    while capacity < needed:
+        capacity *= 2
+    if capacity == meta['capacity']:
+        return
+    item = {'vectors.f32': 4 * meta['dim'], 'keys.i64': 8, 'lists.i32': 4}
+    for name, size in item.items():
+        path = _array_path(root, meta['epoch'], name)
+        with open(path, 'ab') as fh:
+            fh.truncate(capacity * size)
+    meta['capacity'] = capacity
+
+
+def _load_centroids(root, meta):
+    if not meta.get('nlist'):
+        return None
+    return np.load(_array_path(root, meta['epoch'], 'centroids.npy'))
+
+
+_thread_lock = threading.Lock()
+
+
+@contextmanager
+def _write_lock(root):
+    os.makedirs(root, exist_ok=True)
+    with _thread_lock, open(os.path.join(root, 'lock'), 'a') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _new_meta(root, d, capacity=0, nlist=0):
+    epoch = uuid.uuid4().hex
+    os.makedirs(os.path.join(root, epoch))
+    meta = {'epoch': epoch, 'dim': d, 'count': 0, 'capacity': 0, 'nlist': nlist}
+    for name in ARRAYS:
+        open(_array_path(root, epoch, name), 'wb').close()
+    _grow(root, meta, capacity)
+    return meta
+
+
+def _nearest_lists(centroids, vectors):
+    return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+
+# ----------------------------------------------------------------------------
+# Ghi
+# ----------------------------------------------------------------------------
+def _append(root, meta, keys, vectors, centroids=None):
+    """Đánh dấu -1 dòng cũ của các key rồi append (gọi khi đang giữ write lock)."""
+    count = meta['count']
+    _grow(root, meta, count + len(keys))
+    arrays = _open_arrays(root, meta, mode='r+')
+    stale = np.isin(arrays['keys.i64'][:count], keys)
+    arrays['keys.i64'][:count][stale] = -1
+    arrays['vectors.f32'][count:count + len(keys)] = vectors
+    arrays['keys.i64'][count:count + len(keys)] = keys
+    arrays['lists.i32'][count:count + len(keys)] = (
+        _nearest_lists(centroids, vectors) if centroids is not None else -1
+    )
+    for array in arrays.values():
+        array.flush()
+    meta['count'] = count + len(keys)
+
+
+def upsert(keys, vectors, root=None):
+    """Thêm / thay vector cho các key (dòng cũ bị đánh dấu -1, dòng mới append)."""
+    root = root or index_dir()
+    with _write_lock(root):
+        meta = _read_meta(root)
+        if meta is None or meta['dim'] != vectors.shape[1]:
+            meta = _new_meta(root, vectors.shape[1])
+        _append(root, meta, np.asarray(keys, dtype=np.int64), vectors, _load_centroids(root, meta))
+        _write_meta(root, meta)
+
+
+def delete(keys, root=None):
+    root = root or index_dir()
+    with _write_lock(root):
+        meta = _read_meta(root)
+        if meta is None or not meta['count']:
+            return
+        arrays = _open_arrays(root, meta, mode='r+')
+        stale = np.isin(arrays['keys.i64'][:meta['count']], np.asarray(keys, dtype=np.int64))
+        if stale.any():
+            arrays['keys.i64'][:meta['count']][stale] = -1
+            arrays['keys.i64'].flush()
+
+
+def train(vectors, nlist, iterations=10, seed=0):
+    """Spherical k-means trên mẫu -> centroids (nlist, dim) đã chuẩn hoá."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest_lists(centroids, vectors)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]  # cụm rỗng -> điểm ngẫu nhiên
+        norms[empty] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+def build(batches, root=None, total_hint=0, max_lists=None):
+    """
+    Dựng index mới từ iterator các lô (keys, vectors) vào epoch mới, train IVF
+    nếu đủ dữ liệu, rồi đổi meta.json (reader thấy index mới ở truy vấn sau).
+    Vector được upsert vào index cũ trong lúc build được chép sang index mới.
+    """
+    root = root or index_dir()
+    os.makedirs(root, exist_ok=True)
+    start = _read_meta(root)
+    meta = _new_meta(root, dim(), capacity=total_hint)
+    for keys, vectors in batches:
+        _grow(root, meta, meta['count'] + len(keys))
+        arrays = _open_arrays(root, meta, mode='r+')
+        arrays['vectors.f32'][meta['count']:meta['count'] + len(keys)] = vectors
+        arrays['keys.i64'][meta['count']:meta['count'] + len(keys)] = keys
+        arrays['lists.i32'][meta['count']:meta['count'] + len(keys)] = -1
+        for array in arrays.values():
+            array.flush()
+        meta['count'] += len(keys)
+
+    count = meta['count']
+    nlist = min(max_lists or _setting('VECTOR_INDEX_LISTS', 1024), count // MIN_ROWS_PER_LIST)
+    centroids = None
+    if count >= _setting('VECTOR_INDEX_IVF_MIN_VECTORS', 50000) and nlist >= 16:
+        staging = meta
+        arrays = _open_arrays(root, staging)
+        sample = np.sort(np.random.default_rng(0).choice(count, min(count, nlist * 64), replace=False))
+        centroids = train(np.asarray(arrays['vectors.f32'][sample]), nlist)
+        assign = np.empty(count, dtype=np.int32)
+        for first in range(0, count, EXACT_CHUNK_ROWS):
+            last = min(first + EXACT_CHUNK_ROWS, count)
+            assign[first:last] = _nearest_lists(centroids, arrays['vectors.f32'][first:last])
+
+        # ghi lại theo thứ tự cụm: mỗi cụm là một khoảng dòng liên tục -> truy vấn
+        # đọc slice thay vì gather từng dòng
+        order = np.argsort(assign, kind='stable')
+        meta = _new_meta(root, staging['dim'], capacity=count, nlist=nlist)
+        sorted_arrays = _open_arrays(root, meta, mode='r+')
+        for first in range(0, count, EXACT_CHUNK_ROWS):
+            rows = order[first:first + EXACT_CHUNK_ROWS]
+            last = first + len(rows)
+            sorted_arrays['vectors.f32'][first:last] = arrays['vectors.f32'][rows]
+            sorted_arrays['keys.i64'][first:last] = arrays['keys.i64'][rows]
+            sorted_arrays['lists.i32'][first:last] = assign[rows]
+        for array in sorted_arrays.values():
+            array.flush()
+        np.save(_array_path(root, meta['epoch'], 'centroids.npy'), centroids)
+        np.save(_array_path(root, meta['epoch'], 'bounds.npy'),
+                np.searchsorted(assign[order], np.arange(nlist + 1)).astype(np.int64))
+        meta['count'] = meta['sorted'] = count
+        del arrays
+        shutil.rmtree(os.path.join(root, staging['epoch']), ignore_errors=True)
+
+    with _write_lock(root):
+        old = _read_meta(root)
+        if old is not None and start is not None and old['epoch'] == start['epoch'] \
+                and old['count'] > start['count'] and old['dim'] == meta['dim']:
+            arrays = _open_arrays(root, old)
+            keys = np.asarray(arrays['keys.i64'][start['count']:old['count']])
+            live = keys >= 0
+            if live.any():
+                vectors = np.asarray(arrays['vectors.f32'][start['count']:old['count']])[live]
+                _append(root, meta, keys[live], vectors, centroids)
+        _write_meta(root, meta)
+    if old is not None and old['epoch'] != meta['epoch']:
+        # reader đang mmap file cũ vẫn đọc được tới khi đóng (POSIX)
+        shutil.rmtree(os.path.join(root, old['epoch']), ignore_errors=True)
+    return meta
+
+
+# ----------------------------------------------------------------------------
+# Đọc
+# ----------------------------------------------------------------------------
+_Snapshot = namedtuple('_Snapshot', 'meta arrays centroids bounds lists')
+
+
+class _Reader:
+    """
+    View của index trong process; nạp lại tăng dần khi meta.json đổi.
+
+    refresh() không sửa trạng thái cũ mà dựng _Snapshot mới (lists copy-on-write)
+    rồi gán một lần -> search chỉ giữ lock lúc refresh, phần chấm điểm chạy song
+    song trên snapshot đã lấy.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.snapshot = None
+        self.loaded = 0
+        self.warm = False  # đã refresh ít nhất một lần (mở memmap, dựng lists)
+        self._warming = False
+
+    def refresh(self):
+        try:
+            stat = os.stat(_meta_path(self.root))
+        except OSError:
+            self.snapshot = None
+            self.warm = True
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp == self.stamp:
+            return
+        meta = _read_meta(self.root)
+        if meta is None:
+            self.warm = True  # meta.json đang được ghi dở: lần search sau đọc lại
+            return
+        old = self.snapshot
+        if old is None or meta['epoch'] != old.meta['epoch']:
+            centroids = _load_centroids(self.root, meta)
+            bounds = (np.load(_array_path(self.root, meta['epoch'], 'bounds.npy'))
+                      if centroids is not None else None)
+            # dòng append sau lần build (ngoài các khoảng `bounds`) theo từng cụm
+            lists = [np.empty(0, dtype=np.int64) for _ in range(meta['nlist'])]
+            self.loaded = meta.get('sorted', 0)
+            arrays = None
+        else:
+            centroids, bounds, lists, arrays = old.centroids, old.bounds, list(old.lists), old.arrays
+        if arrays is None or meta['capacity'] != old.meta['capacity']:
+            arrays = _open_arrays(self.root, meta) if meta['capacity'] else None
+        if centroids is not None and meta['count'] > self.loaded:
+            new = np.asarray(arrays['lists.i32'][self.loaded:meta['count']])
+            order = np.argsort(new, kind='stable')
+            cluster_bounds = np.searchsorted(new[order], np.arange(meta['nlist'] + 1))
+            for cluster in np.nonzero(np.diff(cluster_bounds))[0]:
+                rows = order[cluster_bounds[cluster]:cluster_bounds[cluster + 1]].astype(np.int64) + self.loaded
+                lists[cluster] = np.concatenate([lists[cluster], rows])
+        self.loaded = meta['count']
+        self.snapshot = _Snapshot(meta, arrays, centroids, bounds, lists)
+        self.stamp = stamp
+        self.warm = True
+
+    def _warm_up(self):
+        try:
+            with self.lock:
+                self.refresh()
+        except Exception:
+            logger.exception("Vector index warm-up failed")
+        finally:
+            self._warming = False
+
+    def warm_up(self):
+        """Mở index ở thread nền (một lần); request không phải chờ mmap + dựng lists."""
+        with self.lock:
+            if self.warm or self._warming:
+                return
+            self._warming = True
+        threading.Thread(target=self._warm_up, name='vector-index-warmup', daemon=True).start()
+
+    def _top(self, scores, rows, k):
+        if len(scores) > k:
+            best = np.argpartition(scores, -k)[-k:]
+            scores, rows = scores[best], rows[best]
+        order = np.argsort(-scores)
+        return scores[order], rows[order]
+
+    def _exact(self, snapshot, queries, k):
+        count = snapshot.meta['count']
+        vectors, keys = snapshot.arrays['vectors.f32'], snapshot.arrays['keys.i64']
+        best = [(np.empty(0, np.float32), np.empty(0, np.int64)) for _ in range(len(queries))]
+        for start in range(0, count, EXACT_CHUNK_ROWS):
+            end = min(start + EXACT_CHUNK_ROWS, count)
+            scores = vectors[start:end] @ queries.T  # (rows, b)
+            scores[keys[start:end] < 0] = -np.inf
+            rows = np.arange(start, end)
+            for q in range(len(queries)):
+                merged_scores = np.concatenate([best[q][0], scores[:, q]])
+                merged_rows = np.concatenate([best[q][1], rows])
+                best[q] = self._top(merged_scores, merged_rows, k)
+        return best
+
+    def _ivf(self, snapshot, queries, k):
+        nprobe = min(_setting('VECTOR_INDEX_NPROBE', 16), len(snapshot.lists))
+        vectors, keys = snapshot.arrays['vectors.f32'], snapshot.arrays['keys.i64']
+        probes = np.argpartition(queries @ snapshot.centroids.T, -nprobe, axis=1)[:, -nprobe:]
+        best = []
+        for q, query in enumerate(queries):
+            all_scores, all_rows = [], []
+            for cluster in probes[q]:
+                first, last = snapshot.bounds[cluster], snapshot.bounds[cluster + 1]
+                if last > first:
+                    all_scores.append(vectors[first:last] @ query)
+                    all_rows.append(np.arange(first, last))
+                extra = snapshot.lists[cluster]
+                if len(extra):
+                    all_scores.append(vectors[extra] @ query)
+                    all_rows.append(extra)
+            if not all_rows:
+                best.append((np.empty(0, np.float32), np.empty(0, np.int64)))
+                continue
+            scores, rows = np.concatenate(all_scores), np.concatenate(all_rows)
+            scores[keys[rows] < 0] = -np.inf
+            best.append(self._top(scores, rows, k))
+        return best
+
+    def search(self, queries, k):
+        with self.lock:
+            self.refresh()
+            snapshot = self.snapshot
+        if snapshot is None or not snapshot.meta['count'] or snapshot.arrays is None:
+            return [[] for _ in range(len(queries))]
+        queries = np.asarray(queries, dtype=np.float32)
+        if snapshot.centroids is not None:
+            best = self._ivf(snapshot, queries, k)
+        else:
+            best = self._exact(snapshot, queries, k)
+        keys = snapshot.arrays['keys.i64']
+        return [
+            [(int(keys[row]), float(score)) for score, row in zip(scores, rows) if np.isfinite(score)]
+            for scores, rows in best
+        ]
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def _reader(root=None):
+    root = root or index_dir()
+    with _readers_lock:
+        if root not in _readers:
+            _readers[root] = _Reader(root)
+        return _readers[root]
+
+
+def warm_up(root=None):
+    """Mở index của process ở thread nền (AppConfig.ready gọi khi VECTOR_INDEX_WARMUP bật)."""
+    if available():
+        _reader(root).warm_up()
+
+
+def search(queries, k=10, root=None):
+    """queries: (b, dim) -> [[(key, score), ...] cho từng query], score giảm dần."""
+    return _reader(root).search(queries, k)
+
+
+def stats(root=None):
+    meta = _read_meta(root or index_dir())
+    if meta is None:
+        return {'count': 0}
+    return {'count': meta['count'], 'dim': meta['dim'], 'capacity': meta['capacity'], 'nlist': meta['nlist']}
+
+
+# ----------------------------------------------------------------------------
+# Catalog
+# ----------------------------------------------------------------------------
+def index_objects(objs):
+    objs = [o for o in objs if is_indexable(o)]
+    if objs:
+        upsert([key_for(o) for o in objs], embed_texts([document_text(o) for o in objs]))
+
+
+def remove_object(obj):
+    delete([key_for(obj)])
+
+
+CATALOG_SOURCES = [
+    (Book, {}, ('id', 'title', 'author')),
+    (UserBook, {'is_approved': True}, ('id', 'title', 'author', 'description', 'is_approved')),
+]
+
+
+def _catalog_batches(batch_size):
+    for model, filters, fields in CATALOG_SOURCES:
+        last = 0
+        while True:
+            batch = list(model.objects.filter(id__gt=last, **filters).order_by('id').only(*fields)[:batch_size])
+            if not batch:
+                break
+            last = batch[-1].pk
+            yield (np.asarray([key_for(o) for o in batch], dtype=np.int64),
+                   embed_texts([document_text(o) for o in batch]))
+
+
+def rebuild(batch_size=1000, max_lists=None):
+    total = Book.objects.count() + UserBook.objects.filter(is_approved=True).count()
+    return build(_catalog_batches(batch_size), total_hint=total, max_lists=max_lists)
+
+
+RERANK_DIM = 1 << 20  # embedding thưa gần như không va chạm băm, chỉ dùng để rerank
+RERANK_DENSE_WEIGHT = 0.3
+
+
+def retrieve(texts, k=None, min_score=None):
+    """
+    Top-k sách trong catalog cho từng câu hỏi:
+    [[{"kind", "id", "title", "author", "score"}, ...], ...].
+
+    Vector VECTOR_INDEX_DIM chiều có va chạm băm (văn bản ngắn như tiêu đề có
+    thể "trùng" nhầm), nên index chỉ dùng để lấy ứng viên (RAG_CANDIDATES) rồi
+    chấm lại: RERANK_DENSE_WEIGHT * cosine của index + phần còn lại * cosine thưa
+    RERANK_DIM chiều trên title/author/description.
+    Bản ghi trùng title+author (UserBook đã duyệt và Book tạo từ nó) chỉ giữ một.
+    """
+    if not available() or not texts:
+        return [[] for _ in texts]
+    reader = _reader()
+    if not reader.warm:
+        # process mới: mở index ở thread nền, câu hỏi này trả lời không kèm catalog
+        reader.warm_up()
+        return [[] for _ in texts]
+    k = k or _setting('RAG_TOP_K', 5)
+    min_score = _setting('RAG_MIN_SCORE', 0.2) if min_score is None else min_score
+    results = search(embed_texts(texts), max(k, _setting('RAG_CANDIDATES', 50)))
+
+    wanted = {KIND_BOOK: set(), KIND_USER_BOOK: set()}
+    for hits in results:
+        for key, _ in hits:
+            kind, pk = split_key(key)
+            wanted[kind].add(pk)
+    rows = {
+        (KIND_BOOK, pk): (title, author, '')
+        for pk, title, author in Book.objects.filter(pk__in=wanted[KIND_BOOK]).values_list('id', 'title', 'author')
+    }
+    rows.update({
+        (KIND_USER_BOOK, pk): (title, author, description)
+        for pk, title, author, description in UserBook.objects.filter(
+            pk__in=wanted[KIND_USER_BOOK], is_approved=True
+        ).values_list('id', 'title', 'author', 'description')
+    })
+
+    out = []
+    for text, hits in zip(texts, results):
+        query = embed(text, RERANK_DIM)
+        scored = []
+        for key, dense in hits:
+            kind, pk = split_key(key)
+            row = rows.get((kind, pk))
+            if row is None:
+                continue
+            exact = cosine(query, embed(' '.join([row[0], row[0], row[1] or '', row[2] or '']), RERANK_DIM))
+            scored.append((RERANK_DENSE_WEIGHT * dense + (1 - RERANK_DENSE_WEIGHT) * exact, kind, pk, row))
+        scored.sort(key=lambda item: -item[0])
+
+        seen, books = set(), []
+        for score, kind, pk, row in scored:
+            ident = (fold(row[0]), fold(row[1] or ''))
+            if score < min_score or ident in seen:
+                continue
+            seen.add(ident)
+            books.append({'kind': 'user_book' if kind == KIND_USER_BOOK else 'book', 'id': pk,
+                          'title': row[0], 'author': row[1], 'score': round(score, 4)})
+            if len(books) == k:
+                break
+        out.append(books)
+    return out
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run(model, pk):
+    try:
+        obj = model.objects.filter(pk=pk).first()
+        if obj is not None and is_indexable(obj):
+            index_objects([obj])
+        else:
+            delete([pk * 2 + (KIND_USER_BOOK if model is UserBook else KIND_BOOK)])
+    except Exception:
+        logger.exception("Vector index update failed for %s %s", model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def _submit(model, pk):
+    global _executor
+    if not available():
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vector-index')
+    _executor.submit(_run, model, pk)
+
+
+def schedule(obj):
+    """Cập nhật vector của một Book/UserBook ở thread nền (sau save / duyệt / trích text)."""
+    _submit(type(obj), obj.pk)
+
+
+def schedule_removal(model, pk):
+    """Sau delete (instance.pk đã bị xoá về None khi on_commit chạy)."""
+    _submit(model, pk)
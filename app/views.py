@@ -1,7 +1,13 @@
+from datetime import timedelta
+
 from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
-from django.db.models import Avg, Q, Count
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_http_methods
+from django.db import transaction
+from django.db.models import Avg, Q, Count, Sum
+from django.urls import reverse
+from django.utils import timezone
 from django.core.mail import send_mail
 from django.core.cache import cache
 from django.contrib.auth import authenticate
@@ -14,12 +20,18 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Book, FavoriteBook, ReadingHistory, UserBook, Review
+from .models import Book, FavoriteBook, ReadingHistory, UserBook, Review, SearchDocument, ChunkedUpload, Job
 from .serializers import (
     BookSerializer, ReviewSerializer, FavoriteBookSerializer,
     ReadingHistorySerializer, ResetPasswordSerializer, ChangePasswordSerializer,
-    UserBookSerializer
+    UserBookSerializer, shape_from_request, parse_csv_param
+)
+from .pagination import CatalogCursorPagination, ModerationQueuePagination, paginate
+from . import fast_serializers
+from .utils import (
+    search_index, suggest_index, spelling, render_stats, response_cache, pdf_stream, pdf_pages, pdf_text, chunked_upload, jobs, blobs, llm_cache, llm_guard, llm_providers
 )
+from .utils.response_cache import cache_response
 
 import random, string
 from rest_framework.response import Response
@@ -132,36 +144,117 @@ def admin_dashboard(request):
     return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
 
 # ================= BOOK APIs =================
+def _page_params(request, default_size, max_size):
+    try:
+        page = max(int(request.query_params.get('page', 1)), 1)
+    except (TypeError, ValueError):
+        page = 1
+    try:
+        page_size = int(request.query_params.get('page_size', default_size))
+    except (TypeError, ValueError):
+        page_size = default_size
+    return page, min(max(page_size, 1), max_size)
+
+def _serialize_search_hits(hits, shape):
+    """Nạp Book / UserBook theo lô rồi giữ nguyên thứ tự xếp hạng."""
+    book_ids = [oid for kind, oid, _ in hits if kind == SearchDocument.KIND_BOOK]
+    user_book_ids = [oid for kind, oid, _ in hits if kind == SearchDocument.KIND_USER_BOOK]
+    books = BookSerializer.setup_queryset(Book.objects.all(), **shape).in_bulk(book_ids)
+    user_books = UserBookSerializer.setup_queryset(UserBook.objects.all(), **shape).in_bulk(user_book_ids)
+    results = []
+    for kind, oid, score in hits:
+        if kind == SearchDocument.KIND_BOOK and oid in books:
+            data = BookSerializer(books[oid], **shape).data
+        elif kind == SearchDocument.KIND_USER_BOOK and oid in user_books:
+            data = UserBookSerializer(user_books[oid], **shape).data
+        else:
+            continue  # index đang trễ so với DB
+        data['type'] = kind
+        data['score'] = score
+        results.append(data)
+    return results
+
 @api_view(['GET'])
 def search_books(request):
+    """Tìm kiếm full-text (BM25) trên title/author/description, có phân trang ?page=&page_size=."""
     q = request.query_params.get('q', '').strip()
     if not q:
         return Response({'error': 'Query parameter "q" is required.'}, status=400)
-    books = Book.objects.filter(Q(title__icontains=q) | Q(author__icontains=q))
-    if not books.exists():
-        return Response({'message': 'No books found matching your query.'}, status=404)
-    return Response(BookSerializer(books, many=True).data, status=200)
+    page, page_size = _page_params(request, settings.SEARCH_PAGE_SIZE, settings.SEARCH_MAX_PAGE_SIZE)
+    hits, total = search_index.search(q, offset=(page - 1) * page_size, limit=page_size)
+    extra = {}
+    if not total:
+        # Không khớp -> thử các query đã sửa chính tả ("did you mean")
+        corrections = spelling.get_index().correct_query(q)
+        for corrected in corrections:
+            hits, total = search_index.search(corrected, offset=(page - 1) * page_size, limit=page_size)
+            if total:
+                extra = {'corrected_query': corrected, 'did_you_mean': corrections}
+                break
+        if not total:
+            return Response({'message': 'No books found matching your query.',
+                             'did_you_mean': corrections}, status=404)
+    return Response({
+        'count': total,
+        'page': page,
+        'page_size': page_size,
+        **extra,
+        'results': _serialize_search_hits(hits, shape_from_request(request)),
+    }, status=200)
 
 @api_view(['GET'])
-def all_books(request):
-    return Response(BookSerializer(Book.objects.all(), many=True).data)
+def suggest_books(request):
+    """Gợi ý typeahead theo prefix của title/author (đọc từ index trong RAM, không query DB)."""
+    q = request.query_params.get('q', '').strip()
+    try:
+        limit = int(request.query_params.get('limit', settings.SUGGEST_DEFAULT_LIMIT))
+    except (TypeError, ValueError):
+        limit = settings.SUGGEST_DEFAULT_LIMIT
+    limit = min(max(limit, 1), settings.SUGGEST_MAX_LIMIT)
+    if not q:
+        return Response({'query': q, 'suggestions': []})
+    return Response({'query': q, 'suggestions': suggest_index.get_index().suggest(q, limit)})
 
+@cache_response(tags=lambda request, data: [response_cache.CATALOG_TAG])
+@api_view(['GET'])
+def all_books(request):
+    """Danh sách catalog, phân trang cursor (?cursor=&page_size=), hỗ trợ ?fields=&expand=reviews."""
+    shape = shape_from_request(request)
+    if fast_serializers.enabled() and fast_serializers.book_shape_supported(shape['expand']):
+        columns, row_fn = fast_serializers.compile_book_shape(**shape)
+        paginator = CatalogCursorPagination()
+        rows = paginator.paginate_queryset(Book.objects.values_list(*columns, named=True), request)
+        return paginator.get_paginated_response(fast_serializers.serialize_books(rows, row_fn))
+    books = BookSerializer.setup_queryset(Book.objects.all(), **shape)
+    return paginate(books, request, BookSerializer, **shape)
+
+@cache_response(tags=lambda request, data, book_id: [response_cache.book_tag(book_id)])
 @api_view(['GET'])
 def book_detail_view(request, book_id):
-    book = get_object_or_404(Book, id=book_id)
-    avg = book.reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-    data = BookSerializer(book).data
-    data['average_rating'] = round(avg, 1)
-    return Response(data)
-
+    shape = shape_from_request(request, default_expand=['reviews'])
+    book = get_object_or_404(BookSerializer.setup_queryset(Book.objects.all(), **shape), id=book_id)
+    return Response(BookSerializer(book, **shape).data)  # average_rating lấy từ aggregate trên Book
+
+def _books_by_author_tags(request, data, author_name):
+    # không phụ thuộc CATALOG_TAG (mọi sách / review đều bump): Book, UserBook và
+    # Review chỉ bump author_change_tags của tác giả liên quan (gồm tiền tố từng từ
+    # -> "row" khớp "Rowling"), book tag bắt thay đổi của từng sách trong danh sách
+    tags = list(response_cache.author_tags(author_name))
+    for item in data or []:
+        if 'id' in item:
+            tags.append(response_cache.book_tag(item['id']))
+    return tags
+
+@cache_response(tags=_books_by_author_tags)
 @api_view(['GET'])
 def books_by_author(request, author_name):
-    books = Book.objects.filter(author__icontains=author_name)
-    return Response(BookSerializer(books, many=True).data)
+    shape = shape_from_request(request)
+    books = BookSerializer.setup_queryset(Book.objects.filter(author__icontains=author_name), **shape)
+    return Response(BookSerializer(books, many=True, **shape).data)
 
 @api_view(['GET'])
 def book_content_by_id(request, book_id):
-    """Trả URL file PDF (local)."""
+    """Trả URL file PDF (local) + stream_url đã ký (hỗ trợ Range, hết hạn sau PDF_STREAM_URL_MAX_AGE)."""
     book = get_object_or_404(Book, id=book_id)
     if not book.pdf_file:
         return Response({'error': 'No PDF available for this book.'}, status=404)
@@ -169,8 +262,86 @@ def book_content_by_id(request, book_id):
         'title': book.title,
         'author': book.author,
         'pdf_url': request.build_absolute_uri(book.pdf_file.url),
+        'stream_url': pdf_stream.signed_stream_url(request, book.id),
     })
 
+@require_http_methods(['GET', 'HEAD'])
+def book_pdf_stream(request, book_id):
+    """Stream PDF theo Range/If-Range; URL phải có ?token= hợp lệ (xem book_content_by_id)."""
+    if not pdf_stream.token_is_valid(request.GET.get('token'), book_id):
+        return JsonResponse({'error': 'Invalid or expired link.'}, status=403)
+    book = get_object_or_404(Book.objects.only('id', 'pdf_file'), id=book_id)
+    if not book.pdf_file:
+        return JsonResponse({'error': 'No PDF available for this book.'}, status=404)
+    return pdf_stream.stream_file(request, book.pdf_file)
+
+def _pdf_pages_response(request, obj, start):
+    if not obj.pdf_file:
+        return JsonResponse({'error': 'No PDF available for this book.'}, status=404)
+    if not pdf_pages.available():
+        return JsonResponse({'error': 'PDF page delivery is not available.'}, status=503)
+    try:
+        end = int(request.GET.get('end', start))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': '"end" must be an integer.'}, status=400)
+    try:
+        total = pdf_pages.page_count(obj)
+    except FileNotFoundError:
+        return JsonResponse({'error': 'PDF file is missing.'}, status=404)
+    if not 1 <= start <= end <= total:
+        return JsonResponse({'error': f'Pages must be within 1..{total}.', 'page_count': total}, status=400)
+    if end - start + 1 > settings.PDF_PAGE_MAX_RANGE:
+        return JsonResponse({'error': f'At most {settings.PDF_PAGE_MAX_RANGE} pages per request.'}, status=400)
+
+    try:
+        # page_count có thể lấy từ DB; etag / render mới chạm tới file
+        etag = pdf_pages.page_etag(obj, start, end)
+        if etag in [t.strip() for t in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(pdf_pages.render_pages(obj, start, end), content_type='application/pdf')
+    except FileNotFoundError:
+        return JsonResponse({'error': 'PDF file is missing.'}, status=404)
+    response['ETag'] = etag
+    response['X-Page-Count'] = str(total)
+    response['Cache-Control'] = 'public, max-age=%d' % settings.PDF_PAGE_CACHE_TIMEOUT
+    return response
+
+@require_http_methods(['GET'])
+def book_pdf_pages(request, book_id, start):
+    """Trang start (hoặc start..?end=) của PDF, dạng PDF nhỏ độc lập."""
+    book = get_object_or_404(Book.objects.only('id', 'pdf_file'), id=book_id)
+    return _pdf_pages_response(request, book, start)
+
+@require_http_methods(['GET'])
+def user_book_pdf_pages(request, user_book_id, start):
+    """Như book_pdf_pages nhưng cho UserBook đã duyệt."""
+    user_book = get_object_or_404(UserBook.objects.only('id', 'pdf_file'), id=user_book_id, is_approved=True)
+    return _pdf_pages_response(request, user_book, start)
+
+@cache_response(tags=lambda request, data, book_id: [response_cache.book_tag(book_id)])
+@api_view(['GET'])
+def book_text_search(request, book_id):
+    """Tìm trong nội dung PDF: ?q=từ khoá | "cụm từ" &limit= -> trang + snippet."""
+    book = get_object_or_404(Book.objects.only('id', 'pdf_file'), id=book_id)
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response({"error": "q is required."}, status=400)
+    if not book.pdf_file:
+        return Response({"error": "Book has no PDF."}, status=404)
+    if not pdf_text.is_indexed(book):
+        if pdf_text.needs_index(book):
+            pdf_text.schedule(book)
+        response = Response({"error": "Book text is being indexed, try again shortly."}, status=503)
+        response['Retry-After'] = '30'
+        return response
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), settings.PDF_TEXT_SEARCH_MAX_RESULTS)
+    except ValueError:
+        limit = 20
+    results, total = pdf_text.search(book, query, limit=limit)
+    return Response({"book_id": book.id, "query": query, "count": total, "results": results})
+
 # ================= REVIEW =================
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -183,6 +354,7 @@ def add_review(request, book_id):
         return Response(s.data, status=201)
     return Response(s.errors, status=400)
 
+@cache_response(tags=lambda request, data, book_id: [response_cache.book_tag(book_id)])
 @api_view(['GET'])
 def get_book_reviews(request, book_id):
     book = get_object_or_404(Book, id=book_id)
@@ -244,9 +416,9 @@ def add_to_favorites(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_favorites(request):
-    favorites = FavoriteBook.objects.filter(user=request.user)
-    books = [f.book for f in favorites]
-    return Response(BookSerializer(books, many=True).data)
+    shape = shape_from_request(request)
+    books = BookSerializer.setup_queryset(Book.objects.filter(favoritebook__user=request.user), **shape)
+    return Response(BookSerializer(books.order_by('favoritebook__id'), many=True, **shape).data)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -274,26 +446,41 @@ def add_to_reading_history(request):
 @permission_classes([IsAuthenticated])
 def get_reading_history(request):
     history = ReadingHistory.objects.filter(user=request.user).order_by('-read_at')
-    return Response(ReadingHistorySerializer(history, many=True).data)
+    if fast_serializers.enabled():
+        return Response(fast_serializers.serialize_reading_history(history))
+    return Response(ReadingHistorySerializer(history.select_related('book'), many=True).data)
 
 # ================= ADMIN LISTS =================
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def list_users(request):
-    users = User.objects.all()
-    data = [{'id': u.id, 'username': u.username, 'email': u.email, 'is_staff': u.is_staff} for u in users]
-    return Response(data)
+    return Response(fast_serializers.serialize_admin_users(User.objects.all()))
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def list_books(request):
-    books = Book.objects.all()
-    data = [{
-        'id': b.id, 'title': b.title, 'author': b.author,
-        'pdf_url': (request.build_absolute_uri(b.pdf_file.url) if b.pdf_file else None),
-        'pages': b.pages,
-    } for b in books]
-    return Response(data)
+    return Response(fast_serializers.serialize_admin_books(Book.objects.all(), request))
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def render_stats_view(request):
+    """Thời gian encode + byte tiết kiệm nhờ nén, theo endpoint (process hiện tại)."""
+    return Response(render_stats.snapshot())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def response_cache_stats(request):
+    """Hit ratio / eviction của response cache catalog."""
+    return Response(response_cache.stats())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def llm_cache_stats(request):
+    """
+    Hit / miss / eviction + token ước tính tiết kiệm của cache chatbot, trạng thái
+    llm_guard và histogram / circuit của từng provider (process hiện tại).
+    """
+    return Response({**llm_cache.stats(), 'guard': llm_guard.stats(), 'providers': llm_providers.stats()})
+
 # --- STATS: users ---
 @api_view(['GET'])
 def rating_statistics(request):
@@ -302,10 +489,14 @@ def rating_statistics(request):
       - rates: {rating_value: count}
       - average_rating: trung bình cộng (2 chữ số)
     """
-    counts = Review.objects.values('rating').annotate(count=Count('id')).order_by('rating')
-    rates = {row['rating']: row['count'] for row in counts if row['rating'] is not None}
-    total = sum(rates.values())
-    avg = round(sum((k or 0) * v for k, v in rates.items()) / total, 2) if total else 0
+    # cộng các histogram tính sẵn trên Book thay vì quét bảng Review
+    sums = Book.objects.aggregate(
+        count=Sum('rating_count'), total=Sum('rating_sum'),
+        **{str(i): Sum(f'rating_{i}') for i in range(1, 6)}
+    )
+    rates = {i: sums[str(i)] for i in range(1, 6) if sums[str(i)]}
+    count = sums['count'] or 0
+    avg = round((sums['total'] or 0) / count, 2) if count else 0
     return Response({"rates": rates, "average_rating": avg})
 @api_view(['GET'])
 # @permission_classes([IsAdminUser])  # Bật nếu muốn chỉ admin xem
@@ -381,43 +572,221 @@ class CreateUserBookView(APIView):
         return Response({'message': 'Book created successfully and awaits admin approval!',
                          'book_id': user_book.id}, status=201)
 
+# ----- Chunked, resumable upload (app/utils/chunked_upload.py) -----
+def _upload_error(exc):
+    return Response({'error': str(exc), **exc.extra}, status=exc.status)
+
+
+class ChunkedUploadInitView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    def post(self, request):
+        title = request.data.get('title')
+        filename = request.data.get('filename')
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            size = None
+        if not title or not filename or size is None:
+            return Response({'error': 'title, filename and size are required.'}, status=400)
+        try:
+            upload = chunked_upload.create(
+                request.user, filename, size, title,
+                description=request.data.get('description'),
+                expected_sha256=request.data.get('sha256', ''),
+            )
+        except chunked_upload.UploadError as exc:
+            return _upload_error(exc)
+        return Response(chunked_upload.status_payload(upload), status=201)
+
+
+class ChunkedUploadView(APIView):
+    """GET: trạng thái / offset để resume. PUT: một chunk, body là byte thô + Content-Range."""
+    permission_classes = [permissions.IsAuthenticated]
+    def get(self, request, upload_id):
+        upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+        return Response(chunked_upload.status_payload(upload))
+
+    def put(self, request, upload_id):
+        # Không đụng request.data: đọc stream từng block, không buffer cả chunk
+        try:
+            upload = chunked_upload.write_chunk(
+                upload_id, request.user, request.stream, request.META.get('HTTP_CONTENT_RANGE')
+            )
+        except chunked_upload.UploadError as exc:
+            return _upload_error(exc)
+        return Response(chunked_upload.status_payload(upload))
+
+
+class ChunkedUploadCompleteView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    def post(self, request, upload_id):
+        try:
+            upload, user_book = chunked_upload.complete(
+                upload_id, request.user, cover_image=request.FILES.get('cover_image')
+            )
+        except chunked_upload.UploadError as exc:
+            return _upload_error(exc)
+        return Response({'message': 'Book created successfully and awaits admin approval!',
+                         'book_id': user_book.id if user_book else None,
+                         'sha256': upload.sha256}, status=201)
+
+def _pending_user_books(params):
+    """
+    UserBook chờ duyệt theo filter: user=<id>, older_than / newer_than=<giờ>.
+    Lọc trên index is_approved / user; trả None nếu tham số sai.
+    """
+    books = UserBook.objects.filter(is_approved=False)
+    try:
+        if params.get('user'):
+            books = books.filter(user_id=int(params['user']))
+        if params.get('older_than'):
+            books = books.filter(created_at__lte=timezone.now() - timedelta(hours=float(params['older_than'])))
+        if params.get('newer_than'):
+            books = books.filter(created_at__gte=timezone.now() - timedelta(hours=float(params['newer_than'])))
+    except (TypeError, ValueError, OverflowError):  # OverflowError: older_than=1e9 / inf
+        return None
+    return books
+
+
 class ListUserBooksView(APIView):
+    """Hàng đợi duyệt, keyset pagination (cũ nhất trước): ?cursor=&page_size=&user=&older_than=&newer_than="""
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    pagination_class = ModerationQueuePagination
     def get(self, request):
-        books = UserBook.objects.filter(is_approved=False)
-        return Response(UserBookSerializer(books, many=True).data)
+        shape = shape_from_request(request)
+        books = _pending_user_books(request.query_params)
+        if books is None:
+            return Response({'error': 'user must be an id; older_than / newer_than are hours.'}, status=400)
+        books = UserBookSerializer.setup_queryset(books, **shape)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(books, request, view=self)
+        return paginator.get_paginated_response(UserBookSerializer(page, many=True, **shape).data)
 
 class ListApprovedBooksView(APIView):
+    pagination_class = CatalogCursorPagination
     def get(self, request):
-        approved = UserBook.objects.filter(is_approved=True)
-        return Response(UserBookSerializer(approved, many=True).data)
+        shape = shape_from_request(request)
+        approved = UserBookSerializer.setup_queryset(UserBook.objects.filter(is_approved=True), **shape)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(approved, request, view=self)
+        return paginator.get_paginated_response(UserBookSerializer(page, many=True, **shape).data)
 
 class RejectAndDeleteBookView(APIView):
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
     def delete(self, request, book_id, *args, **kwargs):
         user_book = get_object_or_404(UserBook, id=book_id)
         if not user_book.is_approved:
-            user_book.delete()
+            with blobs.deferred_collection(user=request.user):
+                user_book.delete()
             return Response({"message": f"The book '{user_book.title}' has been rejected and deleted."}, status=200)
         return Response({"error": "Only unapproved books can be rejected and deleted."}, status=400)
 
+
+class BulkRejectUserBooksView(APIView):
+    """
+    Xoá nhiều UserBook chưa duyệt: body {"ids": [...]} hoặc filter như hàng đợi
+    ({"user": id, "older_than": giờ}). Mỗi call xoá tối đa JOB_BULK_MAX_IDS dòng
+    (filter: cũ nhất trước, `remaining` = số dòng còn khớp filter -> gọi lại).
+    Xoá theo từng lô BULK_REJECT_CHUNK_SIZE dòng, mỗi lô một transaction; file
+    được dọn bởi job collect_blobs.
+    """
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    def post(self, request):
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not ids:
+                return Response({"error": "ids must be a non-empty list."}, status=400)
+            try:
+                ids = list(dict.fromkeys(int(i) for i in ids))
+            except (TypeError, ValueError):
+                return Response({"error": "ids must be integers."}, status=400)
+            if len(ids) > settings.JOB_BULK_MAX_IDS:
+                return Response({"error": f"At most {settings.JOB_BULK_MAX_IDS} ids per call."}, status=400)
+            books = UserBook.objects.filter(is_approved=False, id__in=ids)
+        elif request.data.get('user') or request.data.get('older_than'):
+            books = _pending_user_books(request.data)
+            if books is None:
+                return Response({'error': 'user must be an id; older_than is hours.'}, status=400)
+        else:
+            return Response({"error": "Provide ids, user or older_than."}, status=400)
+
+        pending_ids = list(books.order_by('id').values_list('id', flat=True)[:settings.JOB_BULK_MAX_IDS + 1])
+        remaining = 0
+        if ids is None and len(pending_ids) > settings.JOB_BULK_MAX_IDS:
+            # filter rộng (vd older_than=0) không xoá cả hàng đợi trong một call
+            pending_ids = pending_ids[:settings.JOB_BULK_MAX_IDS]
+            remaining = books.count() - len(pending_ids)
+        chunk = settings.BULK_REJECT_CHUNK_SIZE
+        rejected = 0
+        with blobs.deferred_collection(user=request.user) as cleanup:
+            for start in range(0, len(pending_ids), chunk):
+                with transaction.atomic():
+                    # is_approved=False lần nữa: bỏ qua dòng vừa được duyệt giữa chừng
+                    rejected += UserBook.objects.filter(
+                        id__in=pending_ids[start:start + chunk], is_approved=False
+                    ).delete()[1].get(UserBook._meta.label, 0)
+        skipped = sorted(set(ids) - set(pending_ids)) if ids is not None else []
+        return Response({"rejected": rejected, "skipped": skipped, "remaining": remaining,
+                         "cleanup_job_id": cleanup.job.pk if cleanup.job else None}, status=200)
+
+
+def _enqueue_approval(user_book_id, user):
+    return jobs.enqueue(
+        'approve_user_book', {'user_book_id': user_book_id},
+        dedupe_key=f'approve_user_book:{user_book_id}', user=user,
+    )
+
+
+def _job_status_url(request, job):
+    return request.build_absolute_uri(reverse('job_status', args=[job.pk]))
+
+
 class ApproveUserBookView(APIView):
+    """Duyệt chạy ở worker (manage.py run_jobs); trả 202 + job để admin UI poll."""
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
     def put(self, request, user_book_id):
-        try:
-            ub = UserBook.objects.get(id=user_book_id)
-        except UserBook.DoesNotExist:
+        if not UserBook.objects.filter(id=user_book_id).exists():
             return Response({"message": "User book not found."}, status=404)
-        ub.is_approved = True
-        ub.save(update_fields=['is_approved'])
-        b = Book.objects.create(
-            title=ub.title, author=ub.author, pages=ub.pages,
-            cover_image=ub.cover_image if ub.cover_image else None,
-        )
-        if ub.pdf_file:
-            b.pdf_file = ub.pdf_file
-            b.save(update_fields=['pdf_file'])
-        return Response({"message": "Book approved and published.", "book_id": b.id}, status=200)
+        job = _enqueue_approval(user_book_id, request.user)
+        return Response({"message": "Approval queued.", "job_id": job.pk, "status": job.status,
+                         "status_url": _job_status_url(request, job)}, status=202)
+
+
+class BulkApproveUserBooksView(APIView):
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    def post(self, request):
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({"error": "ids must be a non-empty list."}, status=400)
+        try:
+            ids = list(dict.fromkeys(int(i) for i in ids))
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be integers."}, status=400)
+        if len(ids) > settings.JOB_BULK_MAX_IDS:
+            return Response({"error": f"At most {settings.JOB_BULK_MAX_IDS} ids per call."}, status=400)
+        existing = set(UserBook.objects.filter(id__in=ids).values_list('id', flat=True))
+        with transaction.atomic():
+            queued = [{"user_book_id": i, "job_id": _enqueue_approval(i, request.user).pk}
+                      for i in ids if i in existing]
+        return Response({"queued": queued, "missing": [i for i in ids if i not in existing]}, status=202)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def job_status(request, job_id):
+    job = get_object_or_404(Job, pk=job_id)
+    return Response(jobs.status_payload(job))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def job_status_many(request):
+    """?ids=1,2,3 -> trạng thái nhiều job một lần (poll cho bulk approve)."""
+    try:
+        ids = [int(i) for i in parse_csv_param(request.GET.get('ids'))][:settings.JOB_BULK_MAX_IDS]
+    except ValueError:
+        return Response({"error": "ids must be integers."}, status=400)
+    return Response({"results": [jobs.status_payload(job) for job in Job.objects.filter(pk__in=ids).order_by('id')]})
 
 # ================= CRUD users =================
 
@@ -466,7 +835,7 @@ def delete_user(request, user_id):
     return Response({"message": "User deleted successfully"}, status=status.HTTP_200_OK)
 
 # ================= CRUD books =================
-api_view(['PUT'])  # hoặc ['PATCH'] nếu muốn cập nhật từng phần
+@api_view(['PUT'])  # hoặc ['PATCH'] nếu muốn cập nhật từng phần
 def edit_book_fields(request, pk):
     """
     Cập nhật các trường hợp lệ của Book theo schema mới:
@@ -476,18 +845,23 @@ def edit_book_fields(request, pk):
     book = get_object_or_404(Book, pk=pk)
 
     # Trường text/number
+    changed = []
     for field in ['title', 'author', 'pages']:
         if field in request.data:
             setattr(book, field, request.data.get(field))
+            changed.append(field)
 
     # Trường file
     if 'cover_image' in request.FILES:
         book.cover_image = request.FILES['cover_image']
+        changed.append('cover_image')
     if 'pdf_file' in request.FILES:
         book.pdf_file = request.FILES['pdf_file']
+        changed.append('pdf_file')
 
     try:
-        book.save()
+        # chỉ ghi field đã đổi để không ghi đè rating_* đang được cập nhật bằng F()
+        book.save(update_fields=changed + ['title_folded', 'author_folded'])
     except Exception as e:
         return Response({"error": f"Failed to update book: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -497,15 +871,12 @@ def edit_book_fields(request, pk):
 @api_view(['DELETE'])
 def delete_book(request, book_id):
     """
-    Xoá sách và dọn file (cover/pdf) ra khỏi storage.
+    Xoá sách. File (cover/pdf) được giải phóng qua refcount của blob
+    (app/utils/blobs.py): chỉ bị xoá khỏi storage khi không còn Book/UserBook
+    nào dùng chung.
     """
     book = get_object_or_404(Book, id=book_id)
     try:
-        # Xoá file vật lý (nếu có) trước
-        if book.cover_image:
-            book.cover_image.delete(save=False)
-        if book.pdf_file:
-            book.pdf_file.delete(save=False)
         book.delete()
         return Response({"message": "Book deleted successfully"}, status=status.HTTP_200_OK)
     except Exception as e:
@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Chạy các endpoint chatbot async (/api/async/chatbot/...):
+
+    uvicorn book_web.asgi:application --workers 2
+
+Lifespan shutdown đóng HTTP client dùng chung của app/utils/llm_async.py.
 """
 
 import os
@@ -13,4 +19,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'book_web.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+
+    from app.utils import llm_async
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await llm_async.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+import importlib.util
 import os
 
 # Load environment variables from .env file
@@ -33,8 +34,13 @@ SECRET_KEY = 'django-insecure-&c_d7vk&@#urpyq#@_vq1ju@(4hn6&y-_rq&3p*+2!wbc#t!yr
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
-DATA_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024
-FILE_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024
+# Upload: file lớn hơn FILE_UPLOAD_MAX_MEMORY_SIZE được ghi ra file tạm thay vì giữ trong RAM.
+# PDF lớn nên dùng chunked upload (/api/uploads/), RAM mỗi upload ~ một block 64KB.
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB (mặc định của Django)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024     # chunk tối đa mỗi PUT
+UPLOAD_MAX_SIZE = 200 * 1024 * 1024     # kích thước file tối đa
+UPLOAD_EXPIRY_HOURS = 24                # upload dở dang lâu hơn thì bị purge_uploads xoá
 
 ALLOWED_HOSTS = []
 
@@ -58,6 +64,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'app.middleware.ResponseCompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,6 +81,8 @@ CORS_ALLOWED_ORIGINS = [
 ROOT_URLCONF = 'book_web.urls'
 MEDIA_URL = '/media/'  # URL để truy cập file media
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Thư mục thực tế để lưu file media
+# Media (pdf/cover) lưu theo hash ở media/blobs/ab/cd/<sha256>.<ext>; số cấp thư mục con:
+MEDIA_SHARD_DEPTH = 2
 
 
 
@@ -161,8 +170,66 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # orjson nếu có; msgpack khi client gửi Accept: application/x-msgpack
+    'DEFAULT_RENDERER_CLASSES': [
+        'app.renderers.FastJSONRenderer',
+        *(['app.renderers.MsgPackRenderer'] if importlib.util.find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Nén response (app/middleware.py): brotli nếu có package `brotli`, ngược lại gzip
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+}
+
+# Cursor pagination cho catalog (app/pagination.py)
+CATALOG_PAGE_SIZE = 50
+CATALOG_MAX_PAGE_SIZE = 200
+
+# values_list + hàm build dict sinh sẵn cho endpoint đọc nhiều (app/fast_serializers.py)
+FAST_READ_SERIALIZERS = True
+
+# PDF streaming (app/utils/pdf_stream.py)
+PDF_STREAM_URL_MAX_AGE = 3600  # giây, hạn của stream_url đã ký
+# None: Django gửi file (sendfile qua wsgi.file_wrapper); 'x-accel' (nginx) | 'x-sendfile' (apache/lighttpd)
+PDF_STREAM_OFFLOAD = os.getenv('PDF_STREAM_OFFLOAD') or None
+PDF_STREAM_ACCEL_PREFIX = '/protected-media/'  # location internal trong nginx trỏ tới MEDIA_ROOT
+
+# PDF theo trang (app/utils/pdf_pages.py, cần package `pypdf`)
+PDF_PAGE_MAX_RANGE = 20                      # số trang tối đa mỗi request
+PDF_PAGE_CACHE_TIMEOUT = 3600
+PDF_PAGE_CACHE_MAX_BYTES = 2 * 1024 * 1024   # khoảng trang lớn hơn thì không cache
+PDF_TEXT_WORKERS = 2                         # process trích text PDF (full-text trong sách)
+PDF_TEXT_SEARCH_MAX_RESULTS = 100
+
+# Ảnh bìa: derivative JPEG + WebP theo các chiều rộng này (px)
+COVER_WIDTHS = [160, 320, 640]
+COVER_QUALITY = 80
+
+# Job queue trong DB (app/utils/jobs.py), worker: python manage.py run_jobs
+JOB_CONCURRENCY = {'default': 2, 'approve_user_book': 4}  # số job chạy đồng thời mỗi kind (mọi worker)
+JOB_RETRY_BASE_DELAY = 5      # giây; lần retry thứ n chờ base * 2^(n-1)
+JOB_LOCK_TIMEOUT = 600        # job "running" không có heartbeat quá lâu (worker chết) -> trả về hàng đợi / failed
+JOB_HEARTBEAT_INTERVAL = 60   # worker làm mới locked_at của job đang chạy mỗi N giây (< JOB_LOCK_TIMEOUT)
+JOB_POLL_INTERVAL = 1.0       # worker ngủ bao lâu khi hàng đợi rỗng
+JOB_BULK_MAX_IDS = 500        # số id tối đa mỗi request bulk approve / poll
+BULK_REJECT_CHUNK_SIZE = 200  # số UserBook xoá mỗi transaction khi bulk reject
+
+# Full-text search (app/utils/search_index.py)
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_MAX_POSTINGS_PER_TERM = 5000  # chỉ đọc N posting có tf cao nhất cho mỗi term
+
+# Typeahead (app/utils/suggest_index.py)
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_MAX_WORD_STARTS = 4           # số vị trí đầu từ được index cho mỗi title/author
+SUGGEST_INDEX_REFRESH_SECONDS = 300   # nạp lại toàn bộ để thấy thay đổi từ worker khác
+SPELLING_INDEX_CHECK_SECONDS = 30     # chu kỳ kiểm tra version (cache) của spelling index; đổi -> dựng lại nền
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),  # Thời gian sống của access token
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),  # Thời gian sống của refresh token
@@ -183,4 +250,67 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
     }
-}
\ No newline at end of file
+}
+# Nhiều worker cần cache dùng chung để invalidation (response cache, reset code...) thấy nhau
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
+# Provider LLM theo thứ tự ưu tiên (app/utils/llm_providers.py): lỗi / circuit mở -> provider kế tiếp
+LLM_DEFAULT_MODEL = 'llama-3.1-8b-instant'
+LLM_CUSTOM_ROLE_MODEL = 'mistral-saba-24b'
+LLM_PROVIDERS = [
+    {'name': 'groq', 'kind': 'openai', 'base_url': 'https://api.groq.com/openai/v1', 'api_key_env': 'GROQ_API_KEY'},
+    # {'name': 'openai', 'kind': 'openai', 'base_url': 'https://api.openai.com/v1',
+    #  'api_key_env': 'OPENAI_API_KEY', 'models': {'*': 'gpt-4o-mini'}},
+]
+# provider giả trong process (test / load test / dev không có API key): LLM_PROVIDER=fake
+LLM_FAKE_PROVIDER = {'name': 'fake', 'kind': 'fake', 'latency': 0.5, 'error_rate': 0.0}
+if os.getenv('LLM_PROVIDER') == 'fake':
+    LLM_PROVIDERS = [LLM_FAKE_PROVIDER]
+# Hedge chỉ gửi tới provider KHÁC trong LLM_PROVIDERS: với cấu hình mặc định (chỉ groq)
+# không có đích để hedge -> các tuỳ chọn LLM_HEDGE_* không có tác dụng tới khi thêm provider.
+LLM_HEDGE_ENABLED = True      # gửi thêm request khi lời gọi chậm hơn quantile latency gần đây
+LLM_HEDGE_QUANTILE = 0.95
+LLM_HEDGE_MIN_SAMPLES = 20    # chưa đủ mẫu latency thì không hedge
+LLM_HEDGE_WINDOW = 200        # số latency gần nhất dùng để tính quantile
+LLM_BREAKER_FAILURES = 5      # lỗi liên tiếp để mở circuit của provider
+LLM_BREAKER_COOLDOWN = 30     # giây bỏ qua provider trước khi cho một request thử
+
+# Chatbot async (app/utils/llm_async.py, chạy qua book_web/asgi.py)
+LLM_MAX_CONCURRENCY = 100   # completion đang chạy tối đa mỗi process
+LLM_QUEUE_TIMEOUT = 10      # giây chờ slot trước khi trả 503
+LLM_TIMEOUT = 60            # giây, timeout mỗi request tới provider
+LLM_MAX_RETRIES = 1
+
+# Chống quá tải provider LLM (app/utils/llm_guard.py, app/throttling.py)
+LLM_SYNC_MAX_CONCURRENCY = 16  # lời gọi provider đồng thời tối đa mỗi process (view sync / WSGI)
+LLM_QUEUE_MAX = 64             # request chờ slot tối đa; đầy -> 503 ngay
+LLM_BUSY_RETRY_AFTER = 2       # giây, Retry-After của 503
+LLM_THROTTLE_RATE = '20/min'   # token bucket theo user (cache dùng chung); None để tắt
+LLM_THROTTLE_BURST = 5         # số request liên tiếp tối đa khi bucket đầy
+
+# Hội thoại chatbot lưu phía server (app/utils/conversations.py)
+CHAT_CONTEXT_TOKEN_BUDGET = 3000   # token (ước lượng) cho system + summary + history + câu hỏi
+CHAT_SUMMARY_MAX_TOKENS = 300      # độ dài summary của các lượt cũ
+CHAT_STATE_MAX_MESSAGES = 40       # số tin gần nhất giữ trong cache mỗi hội thoại
+CHAT_STATE_CACHE_TIMEOUT = 3600
+
+# RAG cho chatbot: vector index của catalog (app/utils/vector_index.py, cần numpy)
+RAG_ENABLED = True
+RAG_TOP_K = 5
+RAG_CANDIDATES = 50                   # ứng viên lấy từ vector index trước khi rerank
+RAG_MIN_SCORE = 0.2                   # score (sau rerank) tối thiểu để đưa sách vào prompt
+VECTOR_INDEX_DIR = os.path.join(BASE_DIR, 'vector_index')
+VECTOR_INDEX_DIM = 256
+VECTOR_INDEX_IVF_MIN_VECTORS = 50000  # nhỏ hơn thì quét toàn bộ (chính xác); lớn hơn thì IVF
+VECTOR_INDEX_LISTS = 1024             # số cụm IVF tối đa (train bởi manage.py build_vector_index)
+VECTOR_INDEX_NPROBE = 16              # số cụm được quét mỗi truy vấn
+VECTOR_INDEX_TEXT_CHARS = 2000        # số ký tự text PDF đầu sách đưa vào embedding
+VECTOR_INDEX_WARMUP = True            # mở index ở thread nền khi process web server khởi động (không cho migrate / lệnh khác)
+
+# Response cache cho catalog (app/utils/response_cache.py)
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_TIMEOUT = 300  # giây; chặn trên cho entry nếu invalidation bị lỡ
\ No newline at end of file